@@ -1,21 +1,31 @@
 """
 Lambda Function: calculateIndicators (ADVANCED VERSION)
 Indicadores: SMA, EMA, RSI, MACD, Stochastic, Bollinger Bands, Volatilidad
+Con CHUNK_STORAGE los precios de ventanas cerradas se decodifican de chunks binarios (financial_common.chunks)
 """
 
 import json
 import boto3
-from boto3.dynamodb.conditions import Key
 from decimal import Decimal
 from datetime import datetime, timedelta
 import os
 from statistics import mean, stdev
 
+# Lambda Layer common-layer
+from financial_common.chunks import CHUNK_STORAGE
+from financial_common.demand import record_demand
+from financial_common.history import query_partition, read_packed
+
 # Cliente DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_NAME', 'FinancialData')
 table = dynamodb.Table(table_name)
 
+# Demanda de lecturas por símbolo (la usa el planificador de fetchRealTimePrice)
+state_table = dynamodb.Table(os.environ.get('STATE_TABLE_NAME', 'FinancialDataState'))
+
+MAX_HISTORY_POINTS = 200
+
 def decimal_to_float(obj):
     if isinstance(obj, Decimal):
         return float(obj)
@@ -25,27 +35,39 @@ def fetch_historical_data(symbol, days=60):
     """Obtener más datos para RSI y MACD (necesitan más historia)"""
     start_date = datetime.now() - timedelta(days=days)
     start_timestamp = int(start_date.timestamp())
+    end_timestamp = int(datetime.now().timestamp())
     
     print(f"📊 Consultando {days} días de datos para {symbol}...")
     
-    response = table.query(
-        KeyConditionExpression=Key('symbol').eq(symbol) & Key('timestamp').gte(start_timestamp),
-        ScanIndexForward=False,
-        Limit=200
-    )
+    # Con chunks: cola cruda reciente + ventanas empaquetadas (solo arrays, sin items por punto)
+    columns, head, tail_start = None, [], start_timestamp
+    if CHUNK_STORAGE:
+        columns, head, tail_start, chunks_read = read_packed(table, symbol, start_timestamp, end_timestamp)
     
-    if response['Count'] == 0:
-        return None
+    items = query_partition(table, symbol, tail_start, end_timestamp, newest_first=True, limit=MAX_HISTORY_POINTS)
     
-    prices = [float(item['price']) for item in response['Items']]
-    timestamps = [int(item['timestamp']) for item in response['Items']]
+    prices = [float(item['price']) for item in items]
+    timestamps = [int(item['timestamp']) for item in items]
+    
+    if columns is not None and len(prices) < MAX_HISTORY_POINTS:
+        packed_timestamps, packed_prices, _ = columns
+        take = min(MAX_HISTORY_POINTS - len(prices), len(packed_prices))
+        if take:
+            prices.extend(float(price) for price in packed_prices[::-1][:take])
+            timestamps.extend(int(timestamp) for timestamp in packed_timestamps[::-1][:take])
+        prices.extend(float(item['price']) for item in head[:MAX_HISTORY_POINTS - len(prices)])
+        timestamps.extend(int(item['timestamp']) for item in head[:MAX_HISTORY_POINTS - len(timestamps)])
+        print(f"🗜️ {chunks_read} chunks, {len(packed_prices)} puntos empaquetados")
+    
+    if not prices:
+        return None
     
     print(f"✅ {len(prices)} registros encontrados")
     
     return {
         'prices': prices,
         'timestamps': timestamps,
-        'items': response['Items']
+        'items': items
     }
 
 # ============ INDICADORES BÁSICOS ============
@@ -353,6 +375,8 @@ def lambda_handler(event, context):
                 })
             }
         
+        record_demand(state_table, symbol, 'indicators')
+        
         print(f"📊 Calculando indicadores AVANZADOS para: {symbol}")
         
         # Obtener más datos para RSI y MACD
@@ -0,0 +1,253 @@
+"""
+Backfill histórico reanudable (TIME_SERIES_DAILY) con checkpoints
+"""
+
+from decimal import Decimal
+from datetime import datetime, timezone
+import os
+
+# Lambda Layer common-layer
+from financial_common.batch_writer import BatchWriter
+
+import resources
+from deadline import has_time_left
+from rate_limiter import provider_rate_limiter
+from symbol_universe import validate_symbol
+from providers import provider
+from persistence import after_batch_write
+
+# ==================== CONFIGURACIÓN ====================
+# Backfill histórico (TIME_SERIES_DAILY)
+BACKFILL_CHUNK_SIZE = int(os.environ.get('BACKFILL_CHUNK_SIZE', '250'))
+BACKFILL_CLOSE_HOUR_UTC = 21  # Cierre de NYSE (16:00 ET) aproximado en UTC
+
+# ==================== BACKFILL ====================
+
+def checkpoint_key(symbol):
+    return {'pk': f'BACKFILL#{symbol}', 'sk': 'CHECKPOINT'}
+
+def get_backfill_checkpoint(symbol):
+    """
+    Leer el checkpoint de backfill de un símbolo
+    
+    Returns:
+        dict or None: {'newest_written', 'oldest_written', 'status', 'rows_written'}
+    """
+    if resources.state_table is None:
+        return None
+    
+    response = resources.state_table.get_item(Key=checkpoint_key(symbol))
+    return response.get('Item')
+
+def save_backfill_checkpoint(symbol, newest_written, oldest_written, status, rows_written):
+    """Guardar el progreso del backfill de un símbolo (rango contiguo de días escritos)"""
+    if resources.state_table is None:
+        return
+    
+    resources.state_table.put_item(Item=dict(
+        checkpoint_key(symbol),
+        newest_written=newest_written,
+        oldest_written=oldest_written,
+        status=status,
+        rows_written=rows_written,
+        updated_at=datetime.now().isoformat()
+    ))
+
+def build_daily_item(symbol, candle, previous_close):
+    """Construir item de FinancialData para una vela diaria"""
+    close = Decimal(str(candle['close']))
+    day = datetime.strptime(candle['date'], '%Y-%m-%d')
+    timestamp = int(day.replace(hour=BACKFILL_CLOSE_HOUR_UTC, tzinfo=timezone.utc).timestamp())
+    
+    item = {
+        'symbol': symbol,
+        'timestamp': timestamp,
+        'price': close,
+        'open': Decimal(str(candle['open'])),
+        'high': Decimal(str(candle['high'])),
+        'low': Decimal(str(candle['low'])),
+        'volume': int(candle['volume']),
+        'date': datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(),
+        'source': f'{provider.name}_daily',
+        'latest_trading_day': candle['date']
+    }
+    
+    if previous_close:
+        change = close - previous_close
+        item['change'] = change
+        item['change_percent'] = (change / previous_close * 100).quantize(Decimal('0.0001'))
+    
+    return item
+
+def with_older_close(candles):
+    """Emparejar cada vela (orden descendente) con el cierre del día anterior"""
+    current = None
+    for candle in candles:
+        if current is not None:
+            yield current, candle['close']
+        current = candle
+    if current is not None:
+        yield current, None
+
+def backfill_symbol(symbol, context=None, outputsize='full'):
+    """
+    Descargar TIME_SERIES_DAILY de un símbolo y escribirlo con BatchWriteItem
+    
+    Las velas llegan en streaming, más reciente primero. El checkpoint guarda
+    el rango contiguo ya escrito [oldest_written, newest_written]: al retomar
+    se escriben solo los días más nuevos que el rango y los más antiguos que
+    él. Si el backfill completo ya se hizo, solo se pide la serie compact.
+    
+    Returns:
+        dict: Resultado {'symbol', 'status', 'written', 'skipped', ...}
+    """
+    checkpoint = get_backfill_checkpoint(symbol) or {}
+    newest = checkpoint.get('newest_written', '')
+    oldest = checkpoint.get('oldest_written', '')
+    rows_written = int(checkpoint.get('rows_written', 0))
+    
+    if checkpoint.get('status') == 'complete':
+        outputsize = 'compact'
+    
+    provider_rate_limiter.acquire()
+    candles = provider.get_daily_series(symbol, outputsize=outputsize)
+    
+    if isinstance(candles, dict) and 'error' in candles:
+        return {
+            'symbol': symbol,
+            'status': 'error',
+            'error': candles['error'],
+            'message': candles['message']
+        }
+    
+    writer = BatchWriter(resources.table, on_written=after_batch_write)
+    chunk = []
+    written = 0
+    skipped = 0
+    top = None
+    # Sin checkpoint no hay rango previo que alcanzar
+    reached_range = not newest
+    
+    def result(status, **extra):
+        return dict({
+            'symbol': symbol,
+            'status': status,
+            'written': written,
+            'skipped': skipped,
+            'newest_written': newest,
+            'oldest_written': oldest
+        }, **extra)
+    
+    def flush_chunk():
+        """Escribir el chunk y extender el rango contiguo; devuelve el error si algo falló"""
+        nonlocal newest, oldest, rows_written, written
+        results = writer.flush()
+        
+        for item in chunk:
+            success, error_msg = results.get(BatchWriter.item_key(item), (False, 'Item was not written'))
+            if not success:
+                chunk.clear()
+                save_backfill_checkpoint(symbol, newest, oldest, 'partial', rows_written)
+                return error_msg
+            
+            written += 1
+            rows_written += 1
+            day = item['latest_trading_day']
+            if not newest:
+                newest = oldest = day
+            elif reached_range and day < oldest:
+                oldest = day
+        
+        chunk.clear()
+        save_backfill_checkpoint(symbol, newest, oldest, 'partial', rows_written)
+        return None
+    
+    try:
+        for candle, older_close in with_older_close(candles):
+            day = candle['date']
+            if top is None:
+                top = day
+            
+            if not reached_range and day <= newest:
+                # Días nuevos escritos: el rango contiguo sube hasta el primero del stream
+                error_msg = flush_chunk()
+                if error_msg:
+                    return result('error', error='database_error', message=error_msg)
+                newest = top
+                reached_range = True
+                save_backfill_checkpoint(symbol, newest, oldest, 'partial', rows_written)
+            
+            if reached_range and oldest <= day <= newest:
+                skipped += 1
+                continue
+            
+            previous_close = Decimal(str(older_close)) if older_close else None
+            item = build_daily_item(symbol, candle, previous_close)
+            writer.add(item)
+            chunk.append(item)
+            
+            if len(chunk) >= BACKFILL_CHUNK_SIZE:
+                error_msg = flush_chunk()
+                if error_msg:
+                    return result('error', error='database_error', message=error_msg)
+                
+                if not has_time_left(context):
+                    return result('partial')
+    
+    except Exception as e:
+        flush_chunk()
+        return result('error', error='stream_error', message=str(e))
+    
+    error_msg = flush_chunk()
+    if error_msg:
+        return result('error', error='database_error', message=error_msg)
+    
+    if not reached_range:
+        # La serie compact no llegó al rango guardado: hay hueco, pedir full la próxima vez
+        save_backfill_checkpoint(symbol, newest, oldest, 'partial', rows_written)
+        return result('partial', message='Gap between stored range and compact series')
+    
+    save_backfill_checkpoint(symbol, newest, oldest, 'complete', rows_written)
+    print(f"📚 Backfill {symbol}: {written} written, {skipped} already stored")
+    
+    return result('complete')
+
+def run_backfill(symbols, context=None, outputsize='full'):
+    """
+    Backfill histórico de una lista de símbolos
+    
+    Se detiene antes del timeout de Lambda; los símbolos sin terminar vuelven
+    en 'remaining' para reinvocar con ellos (el checkpoint evita repetir trabajo).
+    
+    Returns:
+        dict: Resumen {'mode', 'results', 'remaining'}
+    """
+    summary = {
+        'mode': 'backfill',
+        'results': [],
+        'remaining': []
+    }
+    
+    for index, symbol in enumerate(symbols):
+        is_valid, result = validate_symbol(symbol)
+        if not is_valid:
+            summary['results'].append({
+                'symbol': symbol,
+                'status': 'error',
+                'error': 'validation_error',
+                'message': result
+            })
+            continue
+        
+        if not has_time_left(context):
+            summary['remaining'] = list(symbols[index:])
+            break
+        
+        symbol_result = backfill_symbol(result, context, outputsize)
+        summary['results'].append(symbol_result)
+        
+        if symbol_result['status'] == 'partial':
+            summary['remaining'] = list(symbols[index:])
+            break
+    
+    return summary
@@ -0,0 +1,195 @@
+"""
+Circuit breaker del proveedor y símbolos diferidos mientras está abierto
+"""
+
+from datetime import datetime, timezone
+import os
+import threading
+import time
+
+import resources
+
+# ==================== CONFIGURACIÓN ====================
+# Circuit breaker del proveedor: abre ante rate limit o fallos consecutivos
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get('BREAKER_COOLDOWN_SECONDS', '60'))
+BREAKER_MAX_COOLDOWN_SECONDS = float(os.environ.get('BREAKER_MAX_COOLDOWN_SECONDS', '900'))
+
+# ==================== CIRCUIT BREAKER ====================
+
+class CircuitBreaker:
+    """
+    Circuit breaker thread-safe alrededor de las llamadas al proveedor
+    
+    closed: las llamadas pasan. Un rate limit, o failure_threshold fallos de
+    red/HTTP seguidos, lo abren. open: las llamadas se cortan sin gastar
+    cuota hasta retry_at. half_open: pasa una sola llamada de prueba; si
+    sale bien se cierra, si no vuelve a abrir con el doble de cooldown
+    (hasta max_cooldown_seconds).
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    # Errores que abren el circuito de inmediato / que cuentan como fallo
+    TRIP_ERRORS = frozenset(['rate_limit'])
+    FAILURE_ERRORS = frozenset(['timeout', 'connection_error', 'http_error', 'request_error'])
+    
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown_seconds=BREAKER_COOLDOWN_SECONDS,
+                 max_cooldown_seconds=BREAKER_MAX_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.consecutive_trips = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.last_error = None
+        self.stats = {'trips': 0, 'short_circuited': 0}
+        self.lock = threading.Lock()
+    
+    def is_open(self):
+        """True si el circuito está abierto y el cooldown no terminó (no cambia el estado)"""
+        with self.lock:
+            return self.state == self.OPEN and time.time() < self.retry_at
+    
+    def allow(self):
+        """
+        Decidir si una llamada puede ir al proveedor
+        
+        Returns:
+            bool: False si el circuito la corta
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            
+            if self.state == self.OPEN and time.time() >= self.retry_at:
+                self.state = self.HALF_OPEN
+                self.probing = False
+            
+            if self.state == self.HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            
+            return False
+    
+    def reject(self):
+        """Contar una llamada cortada por el circuito"""
+        with self.lock:
+            self.stats['short_circuited'] += 1
+    
+    def record(self, result):
+        """Registrar el resultado de una llamada (stock_data, dict bulk o error dict)"""
+        error = result.get('error') if isinstance(result, dict) else None
+        
+        with self.lock:
+            if self.state == self.OPEN:
+                # Respuesta tardía de una llamada emitida antes de abrir
+                return
+            
+            if error in self.TRIP_ERRORS:
+                self._open(error)
+            elif error in self.FAILURE_ERRORS:
+                self.failures += 1
+                if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                    self._open(error)
+            else:
+                # El proveedor respondió (aunque sea "símbolo inválido")
+                self.state = self.CLOSED
+                self.failures = 0
+                self.consecutive_trips = 0
+                self.probing = False
+    
+    def _open(self, reason):
+        self.consecutive_trips += 1
+        cooldown = min(self.max_cooldown_seconds, self.cooldown_seconds * 2 ** (self.consecutive_trips - 1))
+        self.state = self.OPEN
+        self.retry_at = time.time() + cooldown
+        self.failures = 0
+        self.probing = False
+        self.last_error = reason
+        self.stats['trips'] += 1
+        print(f"🔌 Circuit breaker OPEN ({reason}), retry in {round(cooldown)}s")
+    
+    def open_until(self, retry_at, reason):
+        """Abrir el circuito hasta retry_at (estado compartido leído de otra instancia)"""
+        with self.lock:
+            if retry_at > time.time() and retry_at > self.retry_at:
+                self.state = self.OPEN
+                self.retry_at = retry_at
+                self.last_error = reason
+    
+    def retry_after(self):
+        """Segundos hasta que el circuito admita una llamada de prueba"""
+        return max(0, round(self.retry_at - time.time())) if self.state != self.CLOSED else 0
+    
+    def snapshot(self):
+        with self.lock:
+            return dict(
+                self.stats,
+                state=self.state,
+                consecutive_failures=self.failures,
+                last_error=self.last_error,
+                retry_at=(datetime.fromtimestamp(self.retry_at, tz=timezone.utc).isoformat()
+                          if self.state != self.CLOSED else None)
+            )
+
+# Compartido entre invocaciones warm, como el token bucket
+provider_breaker = CircuitBreaker()
+
+DEFERRED_KEY = {'pk': 'DEFERRED', 'sk': 'INGESTION'}
+
+def save_deferred_symbols(symbols, retry_at, reason):
+    """
+    Agregar símbolos diferidos por el circuit breaker para un run posterior
+    
+    ADD sobre un string set: workers de fan-out concurrentes no se pisan.
+    """
+    if resources.state_table is None or not symbols:
+        return
+    
+    try:
+        resources.state_table.update_item(
+            Key=DEFERRED_KEY,
+            UpdateExpression='ADD symbols :symbols SET retry_at = :retry_at, reason = :reason',
+            ExpressionAttributeValues={
+                ':symbols': set(symbols),
+                ':retry_at': int(retry_at),
+                ':reason': reason or 'circuit_open'
+            }
+        )
+    except Exception as e:
+        print(f"⚠️ Could not save deferred symbols: {str(e)}")
+
+def take_deferred_symbols():
+    """
+    Retomar los símbolos diferidos si su retry_at ya pasó
+    
+    Si el circuito sigue abierto en otra instancia, abre el breaker local
+    hasta ese momento y deja los símbolos guardados.
+    
+    Returns:
+        list: Símbolos a procesar primero (orden alfabético)
+    """
+    if resources.state_table is None:
+        return []
+    
+    try:
+        item = resources.state_table.get_item(Key=DEFERRED_KEY, ConsistentRead=True).get('Item')
+        if not item:
+            return []
+        
+        retry_at = int(item.get('retry_at', 0))
+        if retry_at > time.time():
+            provider_breaker.open_until(retry_at, item.get('reason'))
+            return []
+        
+        # DeleteItem con ALL_OLD: solo un run se queda con la lista
+        old = resources.state_table.delete_item(Key=DEFERRED_KEY, ReturnValues='ALL_OLD').get('Attributes') or {}
+        return sorted(old.get('symbols', []))
+    except Exception as e:
+        print(f"⚠️ Could not read deferred symbols: {str(e)}")
+        return []
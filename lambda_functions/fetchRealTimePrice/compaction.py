@@ -0,0 +1,177 @@
+"""
+Empaquetado de ventanas cerradas de puntos crudos en chunks ('<SYMBOL>#CHUNK')
+"""
+
+from boto3.dynamodb.conditions import Key
+from decimal import Decimal
+from datetime import datetime
+import os
+import time
+
+# Lambda Layer common-layer
+from financial_common.batch_writer import BatchWriter
+from financial_common.chunks import (chunk_bytes, chunk_points, chunk_window_start, CHUNK_PRICE_SCALE, CHUNK_SUFFIX,
+                                     CHUNK_VERSION, CHUNK_WINDOWS, pack_chunk)
+
+import resources
+from deadline import has_time_left
+
+# ==================== CONFIGURACIÓN ====================
+# Chunks: una ventana cerrada (día o semana) de puntos crudos en un solo item binario
+# (formato v1 en financial_common.chunks, compartido con los lectores)
+CHUNK_STORAGE = os.environ.get('CHUNK_STORAGE', 'false').lower() == 'true'
+CHUNK_WINDOW = os.environ.get('CHUNK_WINDOW', 'day').lower()  # day | week
+CHUNK_COMPRESS = os.environ.get('CHUNK_COMPRESS', 'true').lower() == 'true'
+CHUNK_GRACE_SECONDS = int(os.environ.get('CHUNK_GRACE_SECONDS', '3600'))
+# Borrar los puntos crudos de una ventana una vez verificado su chunk
+CHUNK_PRUNE_RAW = os.environ.get('CHUNK_PRUNE_RAW', 'false').lower() == 'true'
+
+# ==================== CHUNKS ====================
+
+PRICE_STEP = Decimal(1) / CHUNK_PRICE_SCALE
+
+def build_chunk_item(symbol, window_start, timestamps, prices, volumes, window=CHUNK_WINDOW):
+    """Item '<SYMBOL>#CHUNK' de una ventana cerrada"""
+    return {
+        'symbol': f'{symbol}{CHUNK_SUFFIX}',
+        'timestamp': window_start,
+        'window': window,
+        'window_seconds': CHUNK_WINDOWS[window][0],
+        'encoding': f'v{CHUNK_VERSION}',
+        'count': len(timestamps),
+        'first_ts': timestamps[0],
+        'last_ts': timestamps[-1],
+        'data': pack_chunk(timestamps, prices, volumes, CHUNK_COMPRESS),
+        'packed_at': datetime.now().isoformat()
+    }
+
+def read_chunk(symbol, window_start):
+    """Puntos del chunk de una ventana ({timestamp: (price, volume)}), con lectura consistente"""
+    response = resources.table.get_item(
+        Key={'symbol': f'{symbol}{CHUNK_SUFFIX}', 'timestamp': window_start},
+        ConsistentRead=True
+    )
+    item = response.get('Item')
+    return chunk_points(chunk_bytes(item['data'])) if item else {}
+
+def raw_packed(raw, packed):
+    """True si todos los puntos crudos están en el chunk con el mismo precio y volumen"""
+    return all(packed.get(timestamp) == point for timestamp, point in raw.items())
+
+def compact_symbol(symbol, days=None, force=False, window=CHUNK_WINDOW, now=None, prune=CHUNK_PRUNE_RAW):
+    """
+    Empaquetar las ventanas cerradas de un símbolo (las que terminaron hace
+    más de CHUNK_GRACE_SECONDS, para dejar llegar los puntos tardíos)
+    
+    Lee los puntos crudos paginados (timestamp, price, volume) y escribe un
+    chunk por ventana con BatchWriteItem. Las ventanas ya empaquetadas se
+    saltean salvo con force o prune: ahí los puntos crudos se combinan con los
+    del chunk existente (gana el crudo, así un re-empaquetado no pierde puntos
+    ya borrados) y solo se reescribe si cambió algo. Con prune, los puntos
+    crudos de una ventana se borran después de releer su chunk (lectura
+    consistente) y comprobar que los trae todos.
+    
+    Returns:
+        dict: {'symbol', 'points', 'chunks', 'skipped', 'bytes', 'failed', 'pruned'}
+    """
+    now = int(now or time.time())
+    closed_before = chunk_window_start(now - CHUNK_GRACE_SECONDS, window)
+    start = chunk_window_start(now - int(days) * 86400, window) if days else 0
+    
+    # Chunks existentes: solo la key para saltearlos, o el item completo para combinarlos
+    existing = {}
+    query = {'KeyConditionExpression': Key('symbol').eq(f'{symbol}{CHUNK_SUFFIX}') & Key('timestamp').between(start, closed_before)}
+    if not (force or prune):
+        query.update(ProjectionExpression='#ts', ExpressionAttributeNames={'#ts': 'timestamp'})
+    while True:
+        response = resources.table.query(**query)
+        existing.update((int(item['timestamp']), item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    stats = {'symbol': symbol, 'points': 0, 'chunks': 0, 'skipped': 0, 'bytes': 0, 'failed': 0, 'pruned': 0}
+    writer = BatchWriter(resources.table)
+    current = None
+    raw = {}
+    to_prune = []  # (window_start, puntos crudos) a verificar y borrar
+    
+    def flush_window():
+        if current is None or not raw:
+            return
+        if current in existing and not (force or prune):
+            stats['skipped'] += 1
+            return
+        
+        packed = {}
+        if current in existing:
+            packed = chunk_points(chunk_bytes(existing[current]['data']))
+        points = {**packed, **raw}
+        
+        if points == packed:
+            stats['skipped'] += 1
+        else:
+            timestamps = sorted(points)
+            item = build_chunk_item(symbol, current, timestamps, [points[ts][0] for ts in timestamps],
+                                    [points[ts][1] for ts in timestamps], window=window)
+            stats['chunks'] += 1
+            stats['bytes'] += len(item['data'])
+            writer.add(item)
+        
+        if prune:
+            to_prune.append((current, dict(raw)))
+    
+    query = {
+        'KeyConditionExpression': Key('symbol').eq(symbol) & Key('timestamp').between(start, closed_before - 1),
+        'ProjectionExpression': '#ts, price, volume',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'}
+    }
+    while True:
+        response = resources.table.query(**query)
+        for item in response.get('Items', []):
+            timestamp = int(item['timestamp'])
+            window_start = chunk_window_start(timestamp, window)
+            if window_start != current:
+                flush_window()
+                current, raw = window_start, {}
+            # Misma precisión que el chunk (CHUNK_PRICE_SCALE) para comparar con sus puntos
+            raw[timestamp] = (Decimal(str(item['price'])).quantize(PRICE_STEP), int(item.get('volume') or 0))
+            stats['points'] += 1
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    flush_window()
+    
+    results = writer.flush()
+    stats['failed'] = sum(1 for success, _ in results.values() if not success)
+    
+    # Borrar los crudos solo de las ventanas cuyo chunk escrito trae todos sus puntos
+    pruner = BatchWriter(resources.table)
+    for window_start, points in to_prune:
+        if not results.get((f'{symbol}{CHUNK_SUFFIX}', window_start), (True, None))[0]:
+            continue
+        if not raw_packed(points, read_chunk(symbol, window_start)):
+            print(f"⚠️ Chunk {symbol}@{window_start} does not match its raw points, keeping them")
+            continue
+        for timestamp in points:
+            pruner.delete({'symbol': symbol, 'timestamp': timestamp})
+    deleted = pruner.flush()
+    stats['pruned'] = sum(1 for success, _ in deleted.values() if success)
+    stats['failed'] += len(deleted) - stats['pruned']
+    
+    print(f"🗜️ Packed {stats['points']} points of {symbol} into {stats['chunks']} {window} chunks "
+          f"({stats['bytes']} bytes, {stats['skipped']} already packed, {stats['pruned']} raw points pruned)")
+    return stats
+
+def compact_recent_windows(symbols, context=None, days=7):
+    """Empaquetar las ventanas cerradas recientes de la watchlist (run de cierre, best effort)"""
+    results = []
+    for symbol in symbols:
+        if not has_time_left(context):
+            break
+        try:
+            results.append(compact_symbol(symbol, days))
+        except Exception as e:
+            print(f"⚠️ Compaction failed for {symbol}: {str(e)}")
+            results.append({'symbol': symbol, 'error': str(e)})
+    return results
@@ -0,0 +1,142 @@
+"""
+Deadline de la invocación y continuación de la ingesta antes del timeout
+"""
+
+from datetime import datetime
+import os
+import time
+
+import resources
+from http_client import HTTP_CONNECT_TIMEOUT, HTTP_MAX_RETRIES, HTTP_READ_TIMEOUT
+
+# ==================== CONFIGURACIÓN ====================
+# Deadline de la ingesta: margen antes del timeout de Lambda
+INGESTION_SAFETY_MS = int(os.environ.get('INGESTION_SAFETY_MS', '5000'))
+INGESTION_RESERVE_MS = int(os.environ.get('INGESTION_RESERVE_MS', '1000'))
+MIN_CALL_BUDGET_MS = int(os.environ.get('MIN_CALL_BUDGET_MS', '500'))
+
+# Margen de los modos largos (backfill, rebuilds, compactación) antes del timeout
+BACKFILL_SAFETY_MS = int(os.environ.get('BACKFILL_SAFETY_MS', '15000'))
+
+# ==================== DEADLINE ====================
+
+class Deadline:
+    """
+    Tiempo restante de la invocación, propagado por la ingesta
+    
+    Dos cortes a partir de context.get_remaining_time_in_millis():
+    - stop (safety_ms antes del timeout): no se empieza trabajo nuevo
+      (esperas de token ni llamadas al proveedor).
+    - hard (reserve_ms antes del timeout): límite de los reintentos de
+      escritura; lo que queda es para la continuación y el resumen.
+    Sin context (tests, load_test.py) no hay límite.
+    """
+    
+    def __init__(self, remaining_ms=None, safety_ms=INGESTION_SAFETY_MS, reserve_ms=INGESTION_RESERVE_MS):
+        now = time.monotonic()
+        self.unbounded = remaining_ms is None
+        if not self.unbounded:
+            self.stop_at = now + (remaining_ms - safety_ms) / 1000.0
+            self.hard_at = now + (remaining_ms - reserve_ms) / 1000.0
+    
+    @classmethod
+    def from_context(cls, context, safety_ms=INGESTION_SAFETY_MS):
+        if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+            return cls()
+        return cls(context.get_remaining_time_in_millis(), safety_ms)
+    
+    def remaining(self):
+        """Segundos hasta el corte de trabajo nuevo"""
+        if self.unbounded:
+            return float('inf')
+        return max(0.0, self.stop_at - time.monotonic())
+    
+    def write_budget(self):
+        """Segundos disponibles para escrituras (hasta el corte hard)"""
+        if self.unbounded:
+            return float('inf')
+        return max(0.0, self.hard_at - time.monotonic())
+    
+    def can_start(self, min_ms=MIN_CALL_BUDGET_MS):
+        return self.remaining() * 1000 >= min_ms
+    
+    def wait_budget(self, min_ms=MIN_CALL_BUDGET_MS):
+        """Espera máxima por un token dejando min_ms para la llamada (None = sin límite)"""
+        if self.unbounded:
+            return None
+        return max(0.0, self.remaining() - min_ms / 1000.0)
+    
+    def http_timeout(self, connect=HTTP_CONNECT_TIMEOUT, read=HTTP_READ_TIMEOUT, retries=HTTP_MAX_RETRIES):
+        """
+        Timeout (connect, read) de una llamada al proveedor
+        
+        El tiempo restante se reparte entre el intento y los reintentos de
+        urllib3, para que la llamada completa no pase del corte; el primer
+        intento tiene al menos MIN_CALL_BUDGET_MS (los reintentos pueden
+        usar el margen de seguridad).
+        
+        Returns:
+            tuple or None: None = timeout por defecto del cliente
+        """
+        if self.unbounded:
+            return None
+        remaining = self.remaining()
+        per_attempt = max(remaining / (retries + 1), min(remaining, MIN_CALL_BUDGET_MS / 1000.0))
+        return (min(connect, per_attempt), min(read, per_attempt))
+    
+    def snapshot(self):
+        if self.unbounded:
+            return {'bounded': False}
+        return {
+            'bounded': True,
+            'remaining_ms': round(self.remaining() * 1000),
+            'write_budget_ms': round(self.write_budget() * 1000)
+        }
+
+NO_DEADLINE = Deadline()
+
+CONTINUATION_KEY = {'pk': 'CONTINUATION', 'sk': 'INGESTION'}
+
+def save_continuation(symbols):
+    """Guardar los símbolos que no alcanzaron a procesarse antes del deadline (ADD sobre un string set)"""
+    if resources.state_table is None or not symbols:
+        return
+    
+    try:
+        resources.state_table.update_item(
+            Key=CONTINUATION_KEY,
+            UpdateExpression='ADD symbols :symbols SET updated_at = :updated_at',
+            ExpressionAttributeValues={
+                ':symbols': set(symbols),
+                ':updated_at': datetime.now().isoformat()
+            }
+        )
+    except Exception as e:
+        print(f"⚠️ Could not save continuation: {str(e)}")
+
+def take_continuation():
+    """
+    Retomar la continuación del run anterior (DeleteItem con ALL_OLD: la toma un solo run)
+    
+    Returns:
+        list: Símbolos pendientes (orden alfabético)
+    """
+    if resources.state_table is None:
+        return []
+    
+    try:
+        old = resources.state_table.delete_item(Key=CONTINUATION_KEY, ReturnValues='ALL_OLD').get('Attributes') or {}
+        return sorted(old.get('symbols', []))
+    except Exception as e:
+        print(f"⚠️ Could not read continuation: {str(e)}")
+        return []
+
+def elapsed_ms(start):
+    """Milisegundos transcurridos desde start (time.perf_counter)"""
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def has_time_left(context, margin_ms=BACKFILL_SAFETY_MS):
+    """True si queda tiempo de Lambda por encima del margen (siempre True sin context)"""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return True
+    return context.get_remaining_time_in_millis() > margin_ms
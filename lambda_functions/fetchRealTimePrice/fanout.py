@@ -0,0 +1,381 @@
+"""
+Fan-out de la watchlist en workers por shard y resumen combinado del run
+"""
+
+import json
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import time
+import uuid
+
+# Lambda Layer common-layer
+from financial_common.batch_writer import BatchWriter
+
+import resources
+from resources import get_lambda_client, WORKER_FUNCTION_NAME
+from deadline import Deadline, elapsed_ms, has_time_left, INGESTION_SAFETY_MS
+from rate_limiter import PROVIDER_CALLS_PER_MINUTE, provider_rate_limiter, QuotaLedger, scheduled_quota, TokenBucket
+from persistence import after_batch_write, BATCH_WRITES
+from ingestion import CONCURRENT_INGESTION, finalize_batch_writes, ingest_symbols, new_results
+from retries import settle_retry_queue
+
+# ==================== CONFIGURACIÓN ====================
+# Fan-out de la watchlist en shards (0 = sin fan-out)
+FANOUT_SHARD_SIZE = int(os.environ.get('FANOUT_SHARD_SIZE', '0'))
+FANOUT_MODE = os.environ.get('FANOUT_MODE', 'lambda')  # lambda | local
+# Espera del coordinador por los workers (0 = devolver al despachar; el último
+# worker guarda el resumen combinado). El loop corta antes del timeout de Lambda
+FANOUT_WAIT_SECONDS = float(os.environ.get('FANOUT_WAIT_SECONDS', '0'))
+RUN_SUMMARY_TTL_DAYS = 7
+
+# ==================== FAN-OUT ====================
+
+# Buckets de los workers sin ledger, reusados entre invocaciones warm: un bucket
+# nuevo por invocación arrancaría lleno y repetiría la ráfaga en cada run
+worker_buckets = {}
+
+def effective_shard_size(symbol_count, shard_size=FANOUT_SHARD_SIZE):
+    """
+    Símbolos por shard del run
+    
+    Sin ledger compartido cada worker tiene su propio bucket, así que como
+    mucho se arman PROVIDER_CALLS_PER_MINUTE shards: cada uno recibe al menos
+    1 call/min y la suma de las ráfagas no pasa el límite de la API key.
+    """
+    if isinstance(scheduled_quota, QuotaLedger):
+        return shard_size
+    return max(shard_size, math.ceil(symbol_count / PROVIDER_CALLS_PER_MINUTE))
+
+def worker_rate_limiter(calls_per_minute):
+    """Rate limiter de un worker: el ledger compartido o el bucket de su parte del presupuesto"""
+    if isinstance(scheduled_quota, QuotaLedger):
+        # El ledger ya es global: todos los shards descuentan del mismo item
+        return provider_rate_limiter
+    
+    bucket = worker_buckets.get(calls_per_minute)
+    if bucket is None:
+        bucket = worker_buckets[calls_per_minute] = TokenBucket(rate=calls_per_minute / 60.0, capacity=calls_per_minute)
+    return bucket
+
+def split_shards(symbols, shard_size):
+    """Partir la watchlist en shards de shard_size símbolos, manteniendo el orden"""
+    return [symbols[i:i + shard_size] for i in range(0, len(symbols), shard_size)]
+
+def shard_event(run_id, index, symbols, shard_count):
+    """
+    Evento de un worker: {"mode": "worker", "run_id", "shard", "symbols", "calls_per_minute"}
+    
+    El límite del proveedor es por API key, así que cada worker recibe su
+    parte del presupuesto de calls/min.
+    """
+    return {
+        'mode': 'worker',
+        'run_id': run_id,
+        'shard': index,
+        'symbols': symbols,
+        'calls_per_minute': PROVIDER_CALLS_PER_MINUTE / shard_count
+    }
+
+def run_key(run_id, index=None):
+    key = {'pk': f'RUN#{run_id}'}
+    if index is not None:
+        key['sk'] = f'SHARD#{index:04d}'
+    return key
+
+def save_shard_summary(run_id, index, summary):
+    """Guardar el resumen de un shard en la tabla de estado (expira con TTL)"""
+    if resources.state_table is None:
+        return
+    
+    expires_at = int(time.time()) + RUN_SUMMARY_TTL_DAYS * 86400
+    resources.state_table.put_item(Item=dict(
+        run_key(run_id, index),
+        summary=json.dumps(summary),
+        updated_at=datetime.now().isoformat(),
+        expires_at=expires_at
+    ))
+
+def save_run_plan(run_id, shards):
+    """
+    Guardar los shards del run (RUN#<run_id> / PLAN) antes de despachar
+    
+    Los workers marcan su shard en 'done'; el último en terminar arma el
+    resumen combinado con los shards del plan.
+    """
+    if resources.state_table is None:
+        return
+    
+    resources.state_table.put_item(Item=dict(
+        run_key(run_id),
+        sk='PLAN',
+        shards=json.dumps(shards),
+        shard_count=len(shards),
+        created_at=datetime.now().isoformat(),
+        expires_at=int(time.time()) + RUN_SUMMARY_TTL_DAYS * 86400
+    ))
+
+def save_run_summary(run_id, summary):
+    """Guardar el resumen combinado del run (RUN#<run_id> / SUMMARY)"""
+    resources.state_table.put_item(Item=dict(
+        run_key(run_id),
+        sk='SUMMARY',
+        summary=json.dumps(summary),
+        updated_at=datetime.now().isoformat(),
+        expires_at=int(time.time()) + RUN_SUMMARY_TTL_DAYS * 86400
+    ))
+
+def get_run_plan(run_id):
+    """Shards guardados del run (None si no hay plan)"""
+    if resources.state_table is None:
+        return None
+    
+    item = resources.state_table.get_item(Key=dict(run_key(run_id), sk='PLAN'), ConsistentRead=True).get('Item')
+    return json.loads(item['shards']) if item else None
+
+def get_run_summary(run_id):
+    """Resumen combinado del run si ya terminaron todos los shards (None si no)"""
+    if resources.state_table is None:
+        return None
+    
+    item = resources.state_table.get_item(Key=dict(run_key(run_id), sk='SUMMARY'), ConsistentRead=True).get('Item')
+    return json.loads(item['summary']) if item else None
+
+def complete_shard(run_id, index):
+    """
+    Marcar el shard como terminado; si es el último, guardar el resumen combinado
+    
+    'done' es un set de índices, así que un worker reintentado por Lambda no
+    cuenta dos veces.
+    
+    Returns:
+        bool: True si este worker guardó el resumen combinado
+    """
+    if resources.state_table is None:
+        return False
+    
+    response = resources.state_table.update_item(
+        Key=dict(run_key(run_id), sk='PLAN'),
+        UpdateExpression='ADD done :shard',
+        ConditionExpression='attribute_exists(pk)',
+        ExpressionAttributeValues={':shard': {index}},
+        ReturnValues='ALL_NEW'
+    )
+    plan = response.get('Attributes') or {}
+    if not plan or len(plan.get('done', ())) < int(plan['shard_count']):
+        return False
+    
+    shards = json.loads(plan['shards'])
+    merged = merge_shard_summaries(run_id, shards, get_shard_summaries(run_id))
+    save_run_summary(run_id, merged)
+    print(f"🧩 Run {run_id}: last shard {index} merged {len(shards)} summaries")
+    return True
+
+def get_shard_summaries(run_id):
+    """
+    Leer los resúmenes de shards ya reportados de un run
+    
+    Returns:
+        dict: {shard_index: summary}
+    """
+    if resources.state_table is None:
+        return {}
+    
+    summaries = {}
+    query = {'KeyConditionExpression': Key('pk').eq(run_key(run_id)['pk']), 'ConsistentRead': True}
+    while True:
+        response = resources.state_table.query(**query)
+        for item in response.get('Items', []):
+            if item['sk'].startswith('SHARD#'):
+                summaries[int(item['sk'].split('#', 1)[1])] = json.loads(item['summary'])
+        if 'LastEvaluatedKey' not in response:
+            return summaries
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def run_worker(event, context=None):
+    """
+    Ingerir los símbolos de un shard y publicar su resumen
+    
+    Es el mismo camino que la invocación directa (ingest_symbols + batch
+    writes), descontando del ledger de cuota compartido o, sin ledger, de un
+    token bucket propio del tamaño de su parte del presupuesto (ver
+    worker_rate_limiter).
+    
+    Returns:
+        dict: Resumen del shard (formato de ingest_symbols + 'run_id', 'shard')
+    """
+    deadline = Deadline.from_context(context)
+    rate_limiter = worker_rate_limiter(float(event.get('calls_per_minute') or PROVIDER_CALLS_PER_MINUTE))
+    
+    writer = BatchWriter(resources.table, deadline=deadline, on_written=after_batch_write) if BATCH_WRITES and resources.table is not None else None
+    results = ingest_symbols(event['symbols'], concurrent=CONCURRENT_INGESTION,
+                             writer=writer, rate_limiter=rate_limiter, deadline=deadline)
+    if writer is not None:
+        finalize_batch_writes(results, writer)
+    settle_retry_queue(results)
+    
+    results['run_id'] = event.get('run_id')
+    results['shard'] = event.get('shard', 0)
+    
+    if results['run_id']:
+        save_shard_summary(results['run_id'], results['shard'], results)
+        try:
+            complete_shard(results['run_id'], results['shard'])
+        except ClientError as e:
+            # Run sin plan (evento manual) o tabla no disponible: queda el resumen del shard
+            print(f"⚠️ Run summary not merged for {results['run_id']}: {str(e)}")
+    
+    return results
+
+def dispatch_lambda_workers(events):
+    """
+    Invocar un worker asíncrono (InvocationType=Event) por shard
+    
+    Returns:
+        dict: {shard_index: error_msg} de los shards que no se pudieron despachar
+    """
+    client = get_lambda_client()
+    failures = {}
+    
+    for event in events:
+        try:
+            response = client.invoke(
+                FunctionName=WORKER_FUNCTION_NAME,
+                InvocationType='Event',
+                Payload=json.dumps(event).encode('utf-8')
+            )
+            if response.get('StatusCode') != 202:
+                failures[event['shard']] = f"Invoke returned {response.get('StatusCode')}"
+        except Exception as e:
+            failures[event['shard']] = str(e)
+    
+    return failures
+
+def run_local_workers(events):
+    """
+    Stand-in local de las invocaciones asíncronas: un proceso por shard
+    
+    Solo para desarrollo; Lambda no soporta multiprocessing con /dev/shm.
+    
+    Returns:
+        dict: {shard_index: summary}
+    """
+    summaries = {}
+    with ProcessPoolExecutor(max_workers=len(events)) as executor:
+        futures = {event['shard']: executor.submit(run_worker, event) for event in events}
+        for index, future in futures.items():
+            try:
+                summaries[index] = future.result()
+            except Exception as e:
+                summaries[index] = dict(new_results(), shard=index, error='worker_error', message=str(e))
+    return summaries
+
+def merge_shard_summaries(run_id, shards, summaries, dispatch_failures=None):
+    """
+    Agregar los resúmenes por shard en un único resumen del run
+    
+    Los shards sin resumen quedan como 'pending' (o 'dispatch_failed') y
+    sus símbolos en 'pending_symbols'.
+    
+    Returns:
+        dict: Resumen con el formato de ingest_symbols + 'run_id', 'shards', 'pending_symbols'
+    """
+    dispatch_failures = dispatch_failures or {}
+    merged = new_results()
+    merged.update({
+        'mode': 'fanout',
+        'run_id': run_id,
+        'shards': [],
+        'pending_symbols': []
+    })
+    batch_write = {}
+    
+    for index, symbols in enumerate(shards):
+        summary = summaries.get(index)
+        shard = {'shard': index, 'symbols': len(symbols)}
+        
+        if summary is None:
+            shard['status'] = 'dispatch_failed' if index in dispatch_failures else 'pending'
+            if index in dispatch_failures:
+                shard['message'] = dispatch_failures[index]
+            merged['pending_symbols'].extend(symbols)
+            merged['shards'].append(shard)
+            continue
+        
+        for field in ('processed', 'successful', 'failed', 'rate_limited', 'writes_avoided'):
+            merged[field] += summary.get(field, 0)
+        merged['details'].extend(summary.get('details', []))
+        merged['deferred'].extend(summary.get('deferred', []))
+        
+        if summary.get('retry_queue'):
+            retries = merged.setdefault('retry_queue', {'scheduled': 0, 'cleared': 0, 'dead': []})
+            retries['scheduled'] += summary['retry_queue']['scheduled']
+            retries['cleared'] += summary['retry_queue']['cleared']
+            retries['dead'].extend(summary['retry_queue']['dead'])
+        
+        for field, value in (summary.get('batch_write') or {}).items():
+            batch_write[field] = round(batch_write.get(field, 0) + value, 1)
+        
+        shard.update({
+            'status': 'error' if 'error' in summary else 'complete',
+            'successful': summary.get('successful', 0),
+            'failed': summary.get('failed', 0),
+            'breaker': (summary.get('breaker') or {}).get('state'),
+            'duration_ms': summary.get('duration_ms')
+        })
+        merged['shards'].append(shard)
+    
+    if batch_write:
+        merged['batch_write'] = batch_write
+    
+    return merged
+
+def run_fanout(symbols, context=None, shard_size=FANOUT_SHARD_SIZE):
+    """
+    Coordinador: repartir la watchlist en shards y despachar un worker por shard
+    
+    En modo 'lambda' cada shard es una invocación asíncrona de WORKER_FUNCTION_NAME
+    que guarda su resumen en la tabla de estado. Por defecto el coordinador
+    devuelve apenas despacha (shards en 'pending'): el último worker en
+    terminar guarda el resumen combinado, que se pide después con
+    {"mode": "fanout_summary", "run_id": ...}. Con FANOUT_WAIT_SECONDS > 0
+    espera hasta ese tiempo (sin pasar del margen de timeout) y agrega lo que
+    haya llegado. En modo 'local' un process pool reemplaza a las invocaciones
+    y el resumen siempre está completo.
+    
+    Returns:
+        dict: Resumen agregado del run (ver merge_shard_summaries)
+    """
+    start = time.perf_counter()
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S') + '-' + uuid.uuid4().hex[:8]
+    shards = split_shards(symbols, effective_shard_size(len(symbols), shard_size))
+    events = [shard_event(run_id, index, shard, len(shards)) for index, shard in enumerate(shards)]
+    
+    print(f"🔀 Fan-out {run_id}: {len(symbols)} symbols in {len(shards)} shards ({FANOUT_MODE})")
+    
+    dispatch_failures = {}
+    if FANOUT_MODE == 'local':
+        summaries = run_local_workers(events)
+    else:
+        if not WORKER_FUNCTION_NAME:
+            raise ValueError('WORKER_FUNCTION_NAME is required for lambda fan-out')
+        
+        save_run_plan(run_id, shards)
+        dispatch_failures = dispatch_lambda_workers(events)
+        summaries = {}
+        deadline = time.monotonic() + FANOUT_WAIT_SECONDS
+        expected = len(shards) - len(dispatch_failures)
+        
+        while expected and FANOUT_WAIT_SECONDS > 0:
+            summaries = get_shard_summaries(run_id)
+            if len(summaries) >= expected or time.monotonic() >= deadline or not has_time_left(context, INGESTION_SAFETY_MS):
+                break
+            time.sleep(1)
+    
+    merged = merge_shard_summaries(run_id, shards, summaries, dispatch_failures)
+    merged['duration_ms'] = elapsed_ms(start)
+    
+    return merged
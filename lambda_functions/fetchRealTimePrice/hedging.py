@@ -0,0 +1,183 @@
+"""
+Hedged requests a un proveedor secundario para POST /stock/fetch
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+import threading
+import time
+
+from deadline import elapsed_ms
+from breaker import CircuitBreaker, provider_breaker
+from providers import provider, PROVIDERS
+
+# ==================== CONFIGURACIÓN ====================
+# Proveedor secundario para hedged requests en POST /stock/fetch ('' = sin hedging)
+SECONDARY_PROVIDER = os.environ.get('SECONDARY_PROVIDER', '')
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', '95'))
+HEDGE_INITIAL_DELAY_MS = float(os.environ.get('HEDGE_INITIAL_DELAY_MS', '1000'))
+HEDGE_MIN_DELAY_MS = float(os.environ.get('HEDGE_MIN_DELAY_MS', '50'))
+HEDGE_MAX_DELAY_MS = float(os.environ.get('HEDGE_MAX_DELAY_MS', '5000'))
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', '20'))
+HEDGE_WINDOW = int(os.environ.get('HEDGE_WINDOW', '200'))
+
+# ==================== HEDGED REQUESTS ====================
+
+class HedgedQuoteFetcher:
+    """
+    Hedged requests: si el primario no responde en delay, se repite el request al secundario
+    
+    delay es el percentil HEDGE_PERCENTILE de la latencia reciente del
+    primario (HEDGE_INITIAL_DELAY_MS hasta juntar HEDGE_MIN_SAMPLES), acotado
+    a [HEDGE_MIN_DELAY_MS, HEDGE_MAX_DELAY_MS]. Gana la primera respuesta
+    válida; un error transitorio de uno espera al otro. El perdedor se
+    cancela si no empezó; un request HTTP en vuelo no se puede abortar, así
+    que su resultado se descarta. La latencia del primario se muestrea solo
+    cuando su request termina (done-callback), también si perdió.
+    """
+    
+    # Errores tras los que vale la pena esperar al otro proveedor
+    TRANSIENT_ERRORS = CircuitBreaker.TRIP_ERRORS | CircuitBreaker.FAILURE_ERRORS | {'parse_error'}
+    
+    def __init__(self, primary, secondary, percentile=HEDGE_PERCENTILE, initial_delay_ms=HEDGE_INITIAL_DELAY_MS,
+                 min_delay_ms=HEDGE_MIN_DELAY_MS, max_delay_ms=HEDGE_MAX_DELAY_MS,
+                 min_samples=HEDGE_MIN_SAMPLES, window=HEDGE_WINDOW):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.initial_delay_ms = initial_delay_ms
+        self.min_delay_ms = min_delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.stats = {
+            'requests': 0,
+            'hedged': 0,
+            'primary_wins': 0,
+            'secondary_wins': 0,
+            'both_failed': 0,
+            'cancelled': 0
+        }
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='hedge')
+    
+    def delay_ms(self):
+        """Delay actual del hedge según la latencia reciente del primario"""
+        with self.lock:
+            samples = sorted(self.latencies)
+        
+        if len(samples) < self.min_samples:
+            delay = self.initial_delay_ms
+        else:
+            delay = samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+        
+        return max(self.min_delay_ms, min(self.max_delay_ms, delay))
+    
+    def _count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+    
+    def _observe_primary(self, future, start):
+        """Done-callback del primario: registrar su latencia si el request llegó a correr"""
+        if future.cancelled():
+            return
+        with self.lock:
+            self.latencies.append(elapsed_ms(start))
+    
+    @staticmethod
+    def _result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return {
+                'error': 'request_error',
+                'message': f'Request failed: {str(e)}',
+                'http_code': 500
+            }
+    
+    def get_quote(self, symbol, timeout=None):
+        """
+        Cotización del primero que responda
+        
+        Returns:
+            tuple: (stock_data or error dict, info {'hedged', 'winner', 'delay_ms'})
+        """
+        delay = self.delay_ms()
+        start = time.perf_counter()
+        self._count('requests')
+        
+        primary_future = self.executor.submit(self.primary.get_quote, symbol, timeout)
+        primary_future.add_done_callback(lambda f: self._observe_primary(f, start))
+        names = {primary_future: self.primary.name}
+        info = {'hedged': False, 'winner': self.primary.name, 'delay_ms': round(delay, 1)}
+        errors = {}
+        
+        done, _ = wait([primary_future], timeout=delay / 1000.0)
+        if done:
+            result = self._result(primary_future)
+            provider_breaker.record(result)
+            
+            if result.get('error') not in self.TRANSIENT_ERRORS:
+                self._count('primary_wins')
+                return result, info
+            # Error transitorio rápido: pasar directo al secundario
+            errors[self.primary.name] = result
+        
+        info['hedged'] = True
+        self._count('hedged')
+        print(f"🪢 Hedging {symbol}: no answer from {self.primary.name} in {round(delay)} ms, asking {self.secondary.name}")
+        
+        secondary_future = self.executor.submit(self.secondary.get_quote, symbol, timeout)
+        names[secondary_future] = self.secondary.name
+        pending = {secondary_future} if done else {primary_future, secondary_future}
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = self._result(future)
+                
+                if future is primary_future:
+                    provider_breaker.record(result)
+                
+                if result.get('error') in self.TRANSIENT_ERRORS:
+                    errors[names[future]] = result
+                    continue
+                
+                # Respuesta válida (o definitiva, p.ej. símbolo inválido): gana
+                info['winner'] = names[future]
+                self._count('primary_wins' if future is primary_future else 'secondary_wins')
+                for loser in pending:
+                    if loser.cancel():
+                        self._count('cancelled')
+                if primary_future in pending:
+                    # El resultado tardío se descarta; su latencia la registra el done-callback
+                    primary_future.add_done_callback(lambda f: provider_breaker.record(self._result(f)))
+                return result, info
+        
+        self._count('both_failed')
+        info['winner'] = None
+        return errors.get(self.primary.name) or errors[self.secondary.name], info
+    
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            samples = len(self.latencies)
+        
+        requests_count = stats['requests'] or 1
+        stats.update({
+            'primary': self.primary.name,
+            'secondary': self.secondary.name,
+            'delay_ms': round(self.delay_ms(), 1),
+            'samples': samples,
+            'hedge_rate': round(stats['hedged'] / requests_count, 4),
+            'secondary_win_rate': round(stats['secondary_wins'] / max(1, stats['hedged']), 4)
+        })
+        return stats
+
+hedger = None
+if SECONDARY_PROVIDER:
+    if SECONDARY_PROVIDER in PROVIDERS:
+        hedger = HedgedQuoteFetcher(provider, PROVIDERS[SECONDARY_PROVIDER]())
+    else:
+        print(f"⚠️ Unknown SECONDARY_PROVIDER '{SECONDARY_PROVIDER}', hedging disabled")
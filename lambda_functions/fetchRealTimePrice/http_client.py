@@ -0,0 +1,63 @@
+"""
+Cliente HTTP keep-alive hacia el proveedor de cotizaciones
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import os
+
+# ==================== CONFIGURACIÓN ====================
+# Pool HTTP hacia el proveedor (reutilizado entre invocaciones warm)
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', os.environ.get('MAX_WORKERS', '8')))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', '10'))
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '2'))
+
+# ==================== HTTP CLIENT ====================
+
+class ProviderHttpClient:
+    """
+    Cliente HTTP keep-alive para el proveedor de cotizaciones
+    
+    Un requests.Session con pool de conexiones y Retry de urllib3: las
+    conexiones TCP/TLS se reutilizan entre símbolos y entre invocaciones
+    warm del mismo contenedor.
+    """
+    
+    def __init__(self, pool_size=HTTP_POOL_SIZE, connect_timeout=HTTP_CONNECT_TIMEOUT,
+                 read_timeout=HTTP_READ_TIMEOUT, max_retries=HTTP_MAX_RETRIES):
+        self.timeout = (connect_timeout, read_timeout)
+        self.requests_sent = 0
+        
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False  # La última respuesta llega a raise_for_status
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=max(1, pool_size),
+            max_retries=retry
+        )
+        
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def get(self, url, params=None, **kwargs):
+        """GET con los timeouts (connect, read) del cliente por defecto"""
+        kwargs.setdefault('timeout', self.timeout)
+        self.requests_sent += 1
+        return self.session.get(url, params=params, **kwargs)
+    
+    def close(self):
+        self.session.close()
+
+# Compartido por la ingesta y los scripts de prueba (test_events/test_alpha_vantage.py)
+http_client = ProviderHttpClient()
@@ -0,0 +1,477 @@
+"""
+Ingesta de la watchlist: fetch por símbolo (o bulk), escritura y resumen del run
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from deadline import elapsed_ms, NO_DEADLINE, save_continuation
+from rate_limiter import provider_rate_limiter, provider_scheduler
+from breaker import provider_breaker, save_deferred_symbols
+from symbol_universe import negative_cache, validate_symbol
+from providers import provider, validate_api_key
+from hedging import hedger
+from persistence import CHANGE_DETECTION, forget_quote, is_unchanged_quote, queue_to_dynamodb, remember_quote, save_to_dynamodb
+
+# ==================== CONFIGURACIÓN ====================
+# Watchlist configurable
+watchlist_env = os.environ.get('WATCHLIST', '')
+if watchlist_env:
+    DEFAULT_WATCHLIST = [s.strip().upper() for s in watchlist_env.split(',')]
+else:
+    DEFAULT_WATCHLIST = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'META', 
+                        'NVDA', 'TSLA', 'IBM', 'JPM', 'V']
+
+# Ingesta concurrente: threads del pool
+CONCURRENT_INGESTION = os.environ.get('CONCURRENT_INGESTION', 'true').lower() == 'true'
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '8'))
+
+# ==================== API FUNCTIONS ====================
+
+def fetch_stock_data(symbol, timeout=None, hedge=False):
+    """
+    Obtener datos del proveedor configurado con error handling robusto
+    
+    timeout: (connect, read) derivado del deadline de la invocación
+    hedge: usar hedged requests al proveedor secundario (si hay uno configurado)
+    
+    Returns:
+        tuple: (stock_data or error dict, hedge_info: dict or None)
+        - stock_data si exitoso
+        - Error dict si falla {'error': str, 'message': str, 'http_code': int}
+    """
+    
+    # Validar API key
+    is_valid, result = validate_api_key()
+    if not is_valid:
+        return {
+            'error': 'configuration_error',
+            'message': result,
+            'http_code': 500
+        }, None
+    
+    # Validar símbolo
+    is_valid, validated_symbol = validate_symbol(symbol)
+    if not is_valid:
+        return {
+            'error': 'validation_error',
+            'message': validated_symbol,
+            'http_code': 400
+        }, None
+    
+    print(f"🌐 Fetching data for {validated_symbol}...")
+    
+    hedge_info = None
+    if hedge and hedger is not None:
+        # El hedger registra en el breaker solo las respuestas del primario
+        stock_data, hedge_info = hedger.get_quote(validated_symbol, timeout=timeout)
+    else:
+        stock_data = provider.get_quote(validated_symbol, timeout=timeout)
+        provider_breaker.record(stock_data)
+    
+    negative_cache.record(validated_symbol, stock_data)
+    
+    if 'error' not in stock_data:
+        print(f"✅ {validated_symbol}: ${stock_data['price']}")
+    
+    return stock_data, hedge_info
+
+def fetch_bulk_stock_data(symbols, timeout=None):
+    """
+    Obtener varias cotizaciones en una sola llamada al proveedor
+    
+    Returns:
+        dict: {symbol: stock_data | error dict} para los símbolos resueltos
+        dict: Error dict si la llamada bulk falla o no está soportada
+    """
+    
+    is_valid, result = validate_api_key()
+    if not is_valid:
+        return {
+            'error': 'configuration_error',
+            'message': result,
+            'http_code': 500
+        }
+    
+    print(f"🌐 Bulk fetching {len(symbols)} symbols...")
+    
+    quotes = provider.get_bulk_quotes(symbols, timeout=timeout)
+    if quotes.get('error') != 'bulk_unsupported':
+        provider_breaker.record(quotes)
+    
+    if 'error' in quotes:
+        print(f"⚠️ Bulk quotes failed: {quotes['message']}")
+        if quotes['error'] == 'bulk_unsupported':
+            # No volver a intentarlo en esta instancia
+            provider.supports_bulk = False
+    else:
+        print(f"✅ Bulk quotes: {len(quotes)}/{len(symbols)} symbols resolved")
+    
+    return quotes
+
+# ==================== INGESTION ====================
+
+def complete_symbol(symbol, stock_data, timings, start, writer=None):
+    """
+    Guardar un stock_data ya obtenido y construir su detalle
+    
+    Con writer el detalle queda en status 'queued' hasta finalize_batch_writes.
+    
+    Returns:
+        tuple: (detail: dict, stock_data: dict) - stock_data es el error dict si falló el fetch
+    """
+    if isinstance(stock_data, dict) and 'error' in stock_data:
+        timings['total_ms'] = elapsed_ms(start)
+        return {
+            'symbol': symbol,
+            'status': 'error',
+            'error': stock_data['error'],
+            'message': stock_data['message'],
+            'timings': timings
+        }, stock_data
+    
+    if CHANGE_DETECTION:
+        check_start = time.perf_counter()
+        unchanged = is_unchanged_quote(stock_data)
+        timings['check_ms'] = elapsed_ms(check_start)
+        
+        if unchanged:
+            print(f"⏭️ {symbol} unchanged since last stored quote, skipping write")
+            timings['total_ms'] = elapsed_ms(start)
+            return {
+                'symbol': symbol,
+                'status': 'unchanged',
+                'price': float(stock_data['price']),
+                'change': float(stock_data['change']),
+                'change_percent': stock_data['change_percent'],
+                'latest_trading_day': stock_data['latest_trading_day'],
+                'timings': timings
+            }, stock_data
+    
+    save_start = time.perf_counter()
+    if writer is not None:
+        success, result = queue_to_dynamodb(stock_data, writer)
+        error_msg = None if success else result
+    else:
+        success, error_msg = save_to_dynamodb(stock_data)
+    timings['save_ms'] = elapsed_ms(save_start)
+    timings['total_ms'] = elapsed_ms(start)
+    
+    if not success:
+        return {
+            'symbol': symbol,
+            'status': 'error',
+            'error': 'database_error',
+            'message': error_msg,
+            'timings': timings
+        }, stock_data
+    
+    remember_quote(stock_data)
+    
+    detail = {
+        'symbol': symbol,
+        'status': 'success',
+        'price': float(stock_data['price']),
+        'change': float(stock_data['change']),
+        'change_percent': stock_data['change_percent'],
+        'timings': timings
+    }
+    
+    if writer is not None:
+        detail['status'] = 'queued'
+        detail['write_key'] = result
+    
+    return detail, stock_data
+
+def deferred_symbol(symbol, timings, start):
+    """
+    Detalle de un símbolo cortado por el circuit breaker
+    
+    Returns:
+        tuple: (detail: dict, error dict 'circuit_open' con http_code 503)
+    """
+    provider_breaker.reject()
+    timings['total_ms'] = elapsed_ms(start)
+    retry_after = provider_breaker.retry_after()
+    error = {
+        'error': 'circuit_open',
+        'message': f'Provider circuit breaker is open, retry in {retry_after}s',
+        'http_code': 503,
+        'retry_after': retry_after
+    }
+    return {
+        'symbol': symbol,
+        'status': 'deferred',
+        'error': error['error'],
+        'message': error['message'],
+        'timings': timings
+    }, error
+
+def pending_symbol(symbol, timings, start):
+    """
+    Detalle de un símbolo que no se empezó por falta de tiempo (va a la continuación)
+    
+    Returns:
+        tuple: (detail: dict, error dict 'deadline_exceeded' con http_code 504)
+    """
+    timings['total_ms'] = elapsed_ms(start)
+    error = {
+        'error': 'deadline_exceeded',
+        'message': 'Not enough invocation time left to fetch this symbol',
+        'http_code': 504
+    }
+    return {
+        'symbol': symbol,
+        'status': 'pending',
+        'error': error['error'],
+        'message': error['message'],
+        'timings': timings
+    }, error
+
+def process_symbol(symbol, rate_limiter=None, writer=None, deadline=None, hedge=False):
+    """
+    Fetch + save de un símbolo, con tiempos por etapa
+    
+    Con deadline, la espera por token y el timeout HTTP se recortan al tiempo
+    restante; si no alcanza, el símbolo queda 'pending'. Con hedge, el fetch
+    usa hedged requests y timings['hedge'] indica si hubo hedge y quién ganó.
+    
+    Returns:
+        tuple: (detail: dict, stock_data: dict) - stock_data es el error dict si falló el fetch
+    """
+    deadline = deadline or NO_DEADLINE
+    start = time.perf_counter()
+    timings = {}
+    
+    # Símbolos no listados o rechazados hace poco: sin token ni red
+    is_valid, message = validate_symbol(symbol)
+    if not is_valid:
+        return complete_symbol(symbol, {
+            'error': 'validation_error',
+            'message': message,
+            'http_code': 400
+        }, timings, start)
+    
+    # Con el circuito abierto no se espera token ni se llama al proveedor
+    if provider_breaker.is_open():
+        return deferred_symbol(symbol, timings, start)
+    
+    if not deadline.can_start():
+        return pending_symbol(symbol, timings, start)
+    
+    if rate_limiter is not None:
+        waited = rate_limiter.acquire(max_wait=deadline.wait_budget())
+        if waited is None:
+            return pending_symbol(symbol, timings, start)
+        timings['wait_ms'] = round(waited * 1000, 1)
+    
+    if not provider_breaker.allow():
+        return deferred_symbol(symbol, timings, start)
+    
+    fetch_start = time.perf_counter()
+    stock_data, hedge_info = fetch_stock_data(symbol, timeout=deadline.http_timeout(), hedge=hedge)
+    timings['fetch_ms'] = elapsed_ms(fetch_start)
+    if hedge_info:
+        timings['hedge'] = hedge_info
+    
+    if stock_data.get('error') == 'timeout' and not deadline.can_start():
+        # Timeout recortado por el deadline: se reintenta en la continuación
+        return pending_symbol(symbol, timings, start)
+    
+    return complete_symbol(symbol, stock_data, timings, start, writer)
+
+def prefetch_bulk_quotes(symbols, rate_limiter=None, deadline=None):
+    """
+    Resolver la watchlist con llamadas bulk (una por cada max_bulk_symbols)
+    
+    Los símbolos que el proveedor no devuelve, o los lotes cuya llamada bulk
+    falla, quedan para el camino por símbolo (que los difiere si el rate
+    limit abrió el circuit breaker).
+    
+    Returns:
+        dict: {symbol: (stock_data, timings, start)} de los símbolos resueltos
+    """
+    valid_symbols = []
+    for symbol in symbols:
+        is_valid, result = validate_symbol(symbol)
+        if is_valid and result == symbol and result not in valid_symbols:
+            valid_symbols.append(result)
+    
+    deadline = deadline or NO_DEADLINE
+    prefetched = {}
+    chunk_size = provider.max_bulk_symbols
+    
+    for i in range(0, len(valid_symbols), chunk_size):
+        if not provider.supports_bulk:
+            break
+        
+        chunk = valid_symbols[i:i + chunk_size]
+        start = time.perf_counter()
+        timings = {}
+        
+        if provider_breaker.is_open() or not deadline.can_start():
+            # El camino por símbolo los marca como diferidos / pendientes
+            break
+        
+        if rate_limiter is not None:
+            waited = rate_limiter.acquire(max_wait=deadline.wait_budget())
+            if waited is None:
+                break
+            timings['wait_ms'] = round(waited * 1000, 1)
+        
+        if not provider_breaker.allow():
+            break
+        
+        fetch_start = time.perf_counter()
+        quotes = fetch_bulk_stock_data(chunk, timeout=deadline.http_timeout())
+        timings['fetch_ms'] = elapsed_ms(fetch_start)
+        timings['bulk_size'] = len(chunk)
+        
+        if 'error' in quotes:
+            continue
+        
+        for symbol, stock_data in quotes.items():
+            prefetched[symbol] = (stock_data, dict(timings), start)
+    
+    return prefetched
+
+def new_results():
+    """Resumen vacío de un run de ingesta"""
+    return {
+        'processed': 0,
+        'successful': 0,
+        'failed': 0,
+        'rate_limited': 0,
+        'writes_avoided': 0,
+        'deferred': [],
+        'continuation': [],
+        'details': []
+    }
+
+def record_result(results, detail):
+    """Acumular el detalle de un símbolo en el resumen del run"""
+    results['processed'] += 1
+    
+    if detail['status'] == 'queued':
+        # Se contabiliza en finalize_batch_writes
+        pass
+    elif detail['status'] in ('success', 'cached'):
+        results['successful'] += 1
+    elif detail['status'] == 'unchanged':
+        results['successful'] += 1
+        results['writes_avoided'] += 1
+    elif detail['status'] == 'deferred':
+        results['deferred'].append(detail['symbol'])
+    elif detail['status'] == 'pending':
+        results['continuation'].append(detail['symbol'])
+    else:
+        results['failed'] += 1
+        if detail['error'] == 'rate_limit':
+            # También se reintenta en un run posterior
+            results['rate_limited'] += 1
+            results['deferred'].append(detail['symbol'])
+    
+    results['details'].append(detail)
+
+def finalize_batch_writes(results, writer):
+    """Hacer flush del BatchWriter y volcar el resultado por item en results['details']"""
+    flush_start = time.perf_counter()
+    write_results = writer.flush()
+    
+    for detail in results['details']:
+        if detail['status'] != 'queued':
+            continue
+        
+        success, error_msg = write_results.get(detail.pop('write_key'), (False, 'Item was not written'))
+        if success:
+            detail['status'] = 'success'
+            results['successful'] += 1
+        else:
+            forget_quote(detail['symbol'])
+            detail.update({
+                'status': 'error',
+                'error': 'database_error',
+                'message': error_msg
+            })
+            results['failed'] += 1
+    
+    results['batch_write'] = dict(writer.stats, flush_ms=elapsed_ms(flush_start))
+    
+    return results
+
+def ingest_symbols(symbols, concurrent=True, writer=None, rate_limiter=None, deadline=None):
+    """
+    Procesar una lista de símbolos (watchlist)
+    
+    Si el proveedor soporta bulk quotes, la watchlist se resuelve primero en
+    lotes y solo los símbolos pendientes usan una llamada por símbolo. En modo
+    concurrente las llamadas al proveedor y las escrituras se solapan en un
+    thread pool, mientras el token bucket mantiene el presupuesto de calls/min
+    del proveedor.
+    
+    Con writer las escrituras quedan encoladas: el caller debe llamar a
+    finalize_batch_writes para completar el resumen. rate_limiter reemplaza
+    al bucket del módulo (los workers de fan-out usan su parte del presupuesto).
+    
+    Con deadline, los símbolos que no llegan a empezar antes del corte quedan
+    en 'continuation' y se guardan para que la próxima ejecución los tome primero.
+    
+    Returns:
+        dict: Resumen {'processed', 'successful', 'failed', 'rate_limited', 'details', ...}
+    """
+    results = new_results()
+    rate_limiter = rate_limiter or provider_rate_limiter
+    deadline = deadline or NO_DEADLINE
+    
+    start = time.perf_counter()
+    
+    prefetched = {}
+    if provider.supports_bulk and len(symbols) > 1:
+        prefetched = prefetch_bulk_quotes(symbols, rate_limiter, deadline)
+    
+    def run(symbol):
+        if symbol in prefetched:
+            stock_data, timings, symbol_start = prefetched[symbol]
+            return complete_symbol(symbol, stock_data, timings, symbol_start, writer)
+        return process_symbol(symbol, rate_limiter, writer, deadline)
+    
+    if concurrent and len(symbols) > 1:
+        workers = max(1, min(MAX_WORKERS, len(symbols)))
+        print(f"⚡ Concurrent ingestion: {workers} workers, {round(rate_limiter.rate * 60, 2)} calls/min")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run, symbol) for symbol in symbols]
+            # Mantener el orden de la watchlist en details
+            for symbol, future in zip(symbols, futures):
+                try:
+                    detail, _ = future.result()
+                except Exception as e:
+                    detail = {
+                        'symbol': symbol,
+                        'status': 'error',
+                        'error': 'internal_error',
+                        'message': str(e)
+                    }
+                record_result(results, detail)
+    else:
+        for symbol in symbols:
+            detail, _ = run(symbol)
+            record_result(results, detail)
+    
+    results['mode'] = 'concurrent' if concurrent and len(symbols) > 1 else 'sequential'
+    results['bulk_resolved'] = len(prefetched)
+    results['breaker'] = provider_breaker.snapshot()
+    results['lanes'] = provider_scheduler.snapshot()
+    results['deadline'] = deadline.snapshot()
+    results['duration_ms'] = elapsed_ms(start)
+    
+    if results['continuation']:
+        print(f"⏱️ Deadline reached: {len(results['continuation'])} symbols saved as continuation")
+        save_continuation(results['continuation'])
+    
+    if results['deferred']:
+        print(f"🔌 {len(results['deferred'])} symbols deferred by the circuit breaker")
+        save_deferred_symbols(results['deferred'], provider_breaker.retry_at, provider_breaker.last_error)
+    
+    return results
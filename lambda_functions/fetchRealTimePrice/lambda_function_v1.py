@@ -1,261 +1,53 @@
 """
 Lambda Function: fetchRealTimePrice (PRODUCTION v2.0)
 Descripción: Obtiene precios reales desde Alpha Vantage
-Features: Batch processing, error handling robusto, validaciones
+Features: Batch processing, error handling robusto, validaciones,
+          ingesta concurrente con rate limiter (token bucket),
+          provider adapters con bulk quotes, pool HTTP keep-alive,
+          escrituras agrupadas (BatchWriteItem), detección de cambios,
+          backfill histórico reanudable con parseo en streaming,
+          proveedor stub (record/replay) para pruebas de carga,
+          fan-out de la watchlist en workers por shard,
+          plan de refresco por demanda y volatilidad,
+          caché de cotizaciones con coalescing para POST /stock/fetch,
+          circuit breaker del proveedor con diferido de símbolos,
+          deadline propagado con continuación antes del timeout,
+          hedged requests a un proveedor secundario,
+          índice local de símbolos y negative cache,
+          calendario de mercado (sin runs con el mercado cerrado),
+          cola durable de reintentos con backoff y dead-letter,
+          ledger de cuota del proveedor compartido entre contenedores,
+          cola de prioridad interactive/scheduled delante del proveedor,
+          stale-while-revalidate para POST /stock/fetch,
+          rollups diarios OHLCV mantenidos al escribir,
+          item LATEST por símbolo escrito en la misma transacción que el punto,
+          registro de símbolos (GSI disperso sobre los LATEST) para GET /portfolio,
+          ventanas cerradas empaquetadas en chunks binarios ('<SYMBOL>#CHUNK')
 """
 
 import json
-import boto3
-import requests
-from decimal import Decimal, InvalidOperation
-from datetime import datetime
-import os
 import traceback
 
-# ==================== CONFIGURACIÓN ====================
-ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY')
-ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
-TABLE_NAME = os.environ.get('TABLE_NAME', 'FinancialData')
+# Lambda Layer common-layer
+from financial_common.batch_writer import BatchWriter
 
-# Watchlist configurable
-watchlist_env = os.environ.get('WATCHLIST', '')
-if watchlist_env:
-    DEFAULT_WATCHLIST = [s.strip().upper() for s in watchlist_env.split(',')]
-else:
-    DEFAULT_WATCHLIST = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'META', 
-                        'NVDA', 'TSLA', 'IBM', 'JPM', 'V']
-
-# Cliente DynamoDB
-try:
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(TABLE_NAME)
-except Exception as e:
-    print(f"❌ Error inicializando DynamoDB: {str(e)}")
-    table = None
-
-# ==================== VALIDACIONES ====================
-
-def validate_symbol(symbol):
-    """Validar formato de símbolo de acción"""
-    if not symbol:
-        return False, "Symbol is required"
-    
-    if not isinstance(symbol, str):
-        return False, "Symbol must be a string"
-    
-    symbol = symbol.strip().upper()
-    
-    if len(symbol) < 1 or len(symbol) > 5:
-        return False, "Symbol must be 1-5 characters"
-    
-    if not symbol.isalpha():
-        return False, "Symbol must contain only letters"
-    
-    return True, symbol
-
-def validate_api_key():
-    """Validar que API key esté configurada"""
-    if not ALPHA_VANTAGE_API_KEY:
-        return False, "ALPHA_VANTAGE_API_KEY not configured"
-    
-    if len(ALPHA_VANTAGE_API_KEY) < 10:
-        return False, "Invalid ALPHA_VANTAGE_API_KEY format"
-    
-    return True, ALPHA_VANTAGE_API_KEY
-
-def validate_price_data(data):
-    """Validar que los datos de precio sean válidos"""
-    required_fields = ['symbol', 'price', 'volume', 'change']
-    
-    for field in required_fields:
-        if field not in data:
-            return False, f"Missing required field: {field}"
-    
-    # Validar tipos de datos
-    try:
-        price = float(data['price'])
-        if price <= 0:
-            return False, "Price must be positive"
-        
-        volume = int(data['volume'])
-        if volume < 0:
-            return False, "Volume cannot be negative"
-        
-    except (ValueError, TypeError) as e:
-        return False, f"Invalid data type: {str(e)}"
-    
-    return True, data
-
-# ==================== API FUNCTIONS ====================
-
-def fetch_stock_data(symbol):
-    """
-    Obtener datos de Alpha Vantage con error handling robusto
-    
-    Returns:
-        dict: Stock data si exitoso
-        dict: Error dict si falla {'error': str, 'message': str, 'http_code': int}
-    """
-    
-    # Validar API key
-    is_valid, result = validate_api_key()
-    if not is_valid:
-        return {
-            'error': 'configuration_error',
-            'message': result,
-            'http_code': 500
-        }
-    
-    # Validar símbolo
-    is_valid, validated_symbol = validate_symbol(symbol)
-    if not is_valid:
-        return {
-            'error': 'validation_error',
-            'message': validated_symbol,
-            'http_code': 400
-        }
-    
-    print(f"🌐 Fetching data for {validated_symbol}...")
-    
-    params = {
-        "function": "GLOBAL_QUOTE",
-        "symbol": validated_symbol,
-        "apikey": ALPHA_VANTAGE_API_KEY
-    }
-    
-    try:
-        response = requests.get(
-            ALPHA_VANTAGE_URL, 
-            params=params, 
-            timeout=10
-        )
-        response.raise_for_status()
-        
-    except requests.exceptions.Timeout:
-        return {
-            'error': 'timeout',
-            'message': f'Request timeout for {validated_symbol}',
-            'http_code': 504
-        }
-    except requests.exceptions.ConnectionError:
-        return {
-            'error': 'connection_error',
-            'message': 'Failed to connect to Alpha Vantage API',
-            'http_code': 503
-        }
-    except requests.exceptions.HTTPError as e:
-        return {
-            'error': 'http_error',
-            'message': f'HTTP error: {e.response.status_code}',
-            'http_code': e.response.status_code
-        }
-    except Exception as e:
-        return {
-            'error': 'request_error',
-            'message': f'Request failed: {str(e)}',
-            'http_code': 500
-        }
-    
-    # Parse response
-    try:
-        data = response.json()
-    except json.JSONDecodeError:
-        return {
-            'error': 'parse_error',
-            'message': 'Invalid JSON response from API',
-            'http_code': 502
-        }
-    
-    # Validar respuesta de API
-    if "Global Quote" not in data:
-        if "Note" in data:
-            return {
-                'error': 'rate_limit',
-                'message': 'Alpha Vantage API rate limit reached (5 calls/min)',
-                'http_code': 429
-            }
-        elif "Error Message" in data:
-            return {
-                'error': 'invalid_symbol',
-                'message': f'Invalid or unknown symbol: {validated_symbol}',
-                'http_code': 404
-            }
-        else:
-            return {
-                'error': 'no_data',
-                'message': f'No data available for {validated_symbol}',
-                'http_code': 404
-            }
-    
-    quote = data["Global Quote"]
-    
-    # Construir stock data
-    try:
-        stock_data = {
-            'symbol': quote.get("01. symbol", validated_symbol),
-            'price': float(quote.get("05. price", 0)),
-            'volume': int(quote.get("06. volume", 0)),
-            'latest_trading_day': quote.get("07. latest trading day", ""),
-            'previous_close': float(quote.get("08. previous close", 0)),
-            'change': float(quote.get("09. change", 0)),
-            'change_percent': quote.get("10. change percent", "0%").replace("%", "")
-        }
-    except (ValueError, TypeError) as e:
-        return {
-            'error': 'data_parse_error',
-            'message': f'Failed to parse API response: {str(e)}',
-            'http_code': 502
-        }
-    
-    # Validar datos extraídos
-    is_valid, result = validate_price_data(stock_data)
-    if not is_valid:
-        return {
-            'error': 'invalid_data',
-            'message': result,
-            'http_code': 502
-        }
-    
-    print(f"✅ {validated_symbol}: ${stock_data['price']}")
-    return stock_data
-
-# ==================== DATABASE FUNCTIONS ====================
-
-def save_to_dynamodb(stock_data):
-    """
-    Guardar datos en DynamoDB con error handling
-    
-    Returns:
-        tuple: (success: bool, error_message: str or None)
-    """
-    
-    if table is None:
-        return False, "DynamoDB table not initialized"
-    
-    try:
-        timestamp = int(datetime.now().timestamp())
-        current_date = datetime.now().isoformat()
-        
-        item = {
-            'symbol': stock_data['symbol'],
-            'timestamp': timestamp,
-            'price': Decimal(str(stock_data['price'])),
-            'date': current_date,
-            'volume': stock_data['volume'],
-            'change': Decimal(str(stock_data['change'])),
-            'change_percent': Decimal(str(stock_data['change_percent'])),
-            'source': 'alpha_vantage',
-            'latest_trading_day': stock_data['latest_trading_day']
-        }
-        
-        table.put_item(Item=item)
-        print(f"💾 Saved {stock_data['symbol']} to DynamoDB")
-        return True, None
-        
-    except InvalidOperation as e:
-        return False, f"Invalid decimal conversion: {str(e)}"
-    except Exception as e:
-        return False, f"DynamoDB error: {str(e)}"
+import resources
+import retries
+from deadline import Deadline, has_time_left, take_continuation
+from rate_limiter import interactive_rate_limiter, provider_scheduler
+from market import MARKET_CALENDAR, market_calendar, market_run_decision, MARKET_STATUS_RESOURCE
+from breaker import take_deferred_symbols
+from symbol_universe import validate_symbol
+from hedging import hedger
+from persistence import after_batch_write, BATCH_WRITES, rebuild_latest, rebuild_rollups
+from compaction import CHUNK_STORAGE, compact_recent_windows, compact_symbol
+from ingestion import CONCURRENT_INGESTION, DEFAULT_WATCHLIST, finalize_batch_writes, ingest_symbols, new_results, record_result
+from retries import settle_retry_queue, take_due_retries
+from quote_cache import fetch_symbol_cached, fetch_symbol_swr, QUOTE_SWR, revalidate_symbol
+from planner import build_refresh_plan, planned_symbols, REFRESH_PLANNER
+from fanout import (effective_shard_size, FANOUT_SHARD_SIZE, get_run_plan, get_run_summary, get_shard_summaries,
+                    merge_shard_summaries, run_fanout, run_worker, split_shards)
+from backfill import run_backfill
 
 # ==================== LAMBDA HANDLER ====================
 
@@ -289,14 +81,63 @@ def lambda_handler(event, context):
         # Detectar origen del evento
         is_from_eventbridge = 'source' in event and event['source'] == 'aws.events'
         is_from_api_gateway = 'pathParameters' in event
+        plan_info = None
+        market_info = None
         
         symbols_to_process = []
         
         # Determinar símbolos a procesar
-        if is_from_eventbridge:
+        if event.get('resource') == MARKET_STATUS_RESOURCE or event.get('mode') == 'market_status':
+            # GET /market/status: cuándo se esperan datos nuevos
+            return create_response(200, market_calendar.status(), {'Cache-Control': 'max-age=60'})
+            
+        elif is_from_eventbridge:
             print("🤖 EventBridge invocation - Processing watchlist")
             symbols_to_process = DEFAULT_WATCHLIST
             
+            if MARKET_CALENDAR:
+                market_info = market_run_decision()
+                print(f"🕰️ Market {market_info['reason']} - {market_info['action']} run")
+                if market_info['action'] == 'skip':
+                    return {
+                        'statusCode': 200,
+                        'body': json.dumps({'skipped': True, 'market': market_info})
+                    }
+            
+            # El refresh de cierre trae toda la watchlist, no el slot del plan
+            if REFRESH_PLANNER and (market_info is None or market_info['action'] == 'intraday'):
+                symbols_to_process, plan_info = planned_symbols()
+                print(f"🗓️ Plan slot {plan_info['slot']}/{plan_info['slots']}: {len(symbols_to_process)} symbols")
+            
+            # Reintentos vencidos de la cola antes que la watchlist
+            due_retries = take_due_retries()
+            if due_retries:
+                print(f"🔁 Draining {len(due_retries)} due retries before the watchlist")
+                symbols_to_process = due_retries + [s for s in symbols_to_process if s not in due_retries]
+            
+            # Antes, los símbolos que el circuit breaker difirió en runs anteriores
+            deferred = take_deferred_symbols()
+            if deferred:
+                print(f"🔁 Retrying {len(deferred)} deferred symbols first")
+                symbols_to_process = deferred + [s for s in symbols_to_process if s not in deferred]
+            
+            # Y antes que todo, la continuación del run que llegó al deadline
+            continuation = take_continuation()
+            if continuation:
+                print(f"⏩ Resuming {len(continuation)} symbols from the previous run")
+                symbols_to_process = continuation + [s for s in symbols_to_process if s not in continuation]
+            
+            if FANOUT_SHARD_SIZE > 0 and len(symbols_to_process) > FANOUT_SHARD_SIZE:
+                summary = run_fanout(symbols_to_process, context)
+                if plan_info:
+                    summary['plan'] = plan_info
+                if market_info:
+                    summary['market'] = market_info
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps(summary)
+                }
+            
         elif is_from_api_gateway:
             # Validar pathParameters
             if not event.get('pathParameters'):
@@ -317,6 +158,111 @@ def lambda_handler(event, context):
             
             symbols_to_process = [result]
             
+        elif event.get('mode') == 'backfill':
+            # Backfill histórico: {"mode": "backfill", "symbols": [...], "outputsize": "full"}
+            symbols = event.get('symbols') or DEFAULT_WATCHLIST
+            print(f"📚 Backfill invocation - {len(symbols)} symbols")
+            summary = run_backfill(symbols, context, event.get('outputsize', 'full'))
+            return {
+                'statusCode': 200,
+                'body': json.dumps(summary)
+            }
+            
+        elif event.get('mode') == 'rollup_rebuild':
+            # Reconstruir rollups diarios: {"mode": "rollup_rebuild", "symbols": [...], "days": 365}
+            symbols = event.get('symbols') or DEFAULT_WATCHLIST
+            summary = {'results': [], 'remaining': []}
+            for index, symbol in enumerate(symbols):
+                if not has_time_left(context):
+                    summary['remaining'] = list(symbols[index:])
+                    break
+                summary['results'].append(rebuild_rollups(symbol.strip().upper(), event.get('days')))
+            return {
+                'statusCode': 200,
+                'body': json.dumps(summary)
+            }
+            
+        elif event.get('mode') == 'latest_rebuild':
+            # Crear LATEST y registro de símbolos de datos anteriores: {"mode": "latest_rebuild", "start_key": {...}}
+            return {
+                'statusCode': 200,
+                'body': json.dumps(rebuild_latest(context, event.get('start_key')))
+            }
+            
+        elif event.get('mode') == 'compact':
+            # Empaquetar ventanas cerradas: {"mode": "compact", "symbols": [...], "days": 30, "force": false}
+            symbols = event.get('symbols') or DEFAULT_WATCHLIST
+            summary = {'results': [], 'remaining': []}
+            for index, symbol in enumerate(symbols):
+                if not has_time_left(context):
+                    summary['remaining'] = list(symbols[index:])
+                    break
+                summary['results'].append(compact_symbol(symbol.strip().upper(), event.get('days'), event.get('force', False)))
+            return {
+                'statusCode': 200,
+                'body': json.dumps(summary)
+            }
+            
+        elif event.get('mode') == 'plan':
+            # Reconstruir el plan de refresco: {"mode": "plan"}
+            return {
+                'statusCode': 200,
+                'body': json.dumps(build_refresh_plan())
+            }
+            
+        elif event.get('mode') == 'revalidate':
+            # Refresh en segundo plano de stale-while-revalidate: {"mode": "revalidate", "symbol": "AAPL"}
+            symbol = event.get('symbol', '').strip().upper()
+            is_valid, result = validate_symbol(symbol)
+            if not is_valid:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'invalid_symbol', 'message': result})
+                }
+            return {
+                'statusCode': 200,
+                'body': json.dumps(revalidate_symbol(result, Deadline.from_context(context)), default=str)
+            }
+            
+        elif event.get('mode') == 'retry_queue':
+            # Estado de la cola de reintentos: {"mode": "retry_queue", "requeue": ["AAPL"]}
+            if retries.retry_queue is None:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({'error': 'retry_queue_disabled', 'message': 'RETRY_QUEUE is false'})
+                }
+            if event.get('requeue'):
+                retries.retry_queue.requeue([s.strip().upper() for s in event['requeue']])
+            return {
+                'statusCode': 200,
+                'body': json.dumps(retries.retry_queue.snapshot())
+            }
+            
+        elif event.get('mode') == 'worker':
+            # Worker de fan-out: {"mode": "worker", "run_id", "shard", "symbols", "calls_per_minute"}
+            print(f"🧩 Worker invocation - shard {event.get('shard')} of run {event.get('run_id')}")
+            return {
+                'statusCode': 200,
+                'body': json.dumps(run_worker(event, context))
+            }
+            
+        elif event.get('mode') == 'fanout_summary':
+            # Resumen agregado de un run de fan-out: {"mode": "fanout_summary", "run_id", "symbols"}
+            run_id = event['run_id']
+            summary = get_run_summary(run_id)
+            if summary is None:
+                # Run en curso: combinar los shards que ya reportaron (los del plan guardado)
+                shards = get_run_plan(run_id)
+                if shards is None:
+                    symbols = event.get('symbols') or DEFAULT_WATCHLIST
+                    shard_size = event.get('shard_size') or FANOUT_SHARD_SIZE or len(symbols)
+                    shards = split_shards(symbols, effective_shard_size(len(symbols), shard_size))
+                summary = merge_shard_summaries(run_id, shards, get_shard_summaries(run_id))
+            return {
+                'statusCode': 200,
+                'body': json.dumps(summary)
+            }
+            
         else:
             # Invocación directa
             symbols_to_process = event.get('symbols', DEFAULT_WATCHLIST)
@@ -324,65 +270,37 @@ def lambda_handler(event, context):
         print(f"📊 Processing {len(symbols_to_process)} symbols: {symbols_to_process}")
         
         # Procesar símbolos
-        results = {
-            'processed': 0,
-            'successful': 0,
-            'failed': 0,
-            'rate_limited': 0,
-            'details': []
-        }
-        
-        for symbol in symbols_to_process:
-            stock_data = fetch_stock_data(symbol)
-            results['processed'] += 1
-            
-            # Verificar si hay error
-            if isinstance(stock_data, dict) and 'error' in stock_data:
-                results['failed'] += 1
-                
-                if stock_data['error'] == 'rate_limit':
-                    results['rate_limited'] += 1
-                
-                results['details'].append({
-                    'symbol': symbol,
-                    'status': 'error',
-                    'error': stock_data['error'],
-                    'message': stock_data['message']
-                })
-                
-                # Si es API Gateway y solo 1 símbolo, retornar error inmediatamente
-                if is_from_api_gateway:
-                    return create_response(
-                        stock_data.get('http_code', 500),
-                        {
-                            'error': stock_data['error'],
-                            'message': stock_data['message'],
-                            'symbol': symbol
-                        }
-                    )
-                
-                continue
+        if is_from_api_gateway:
+            fetch = fetch_symbol_swr if QUOTE_SWR else fetch_symbol_cached
+            detail, stock_data, cache_info = fetch(
+                symbols_to_process[0], interactive_rate_limiter, Deadline.from_context(context)
+            )
+            results = new_results()
+            record_result(results, detail)
             
-            # Guardar en DynamoDB
-            success, error_msg = save_to_dynamodb(stock_data)
+            # Si es API Gateway y el fetch falló, retornar error inmediatamente
+            if 'error' in stock_data:
+                headers = None
+                if stock_data['error'] == 'circuit_open':
+                    headers = {'Retry-After': str(stock_data['retry_after'])}
+                return create_response(
+                    stock_data.get('http_code', 500),
+                    {
+                        'error': stock_data['error'],
+                        'message': stock_data['message'],
+                        'symbol': detail['symbol']
+                    },
+                    headers
+                )
+        else:
+            deadline = Deadline.from_context(context)
+            writer = BatchWriter(resources.table, deadline=deadline, on_written=after_batch_write) if BATCH_WRITES and resources.table is not None else None
+            results = ingest_symbols(symbols_to_process, concurrent=CONCURRENT_INGESTION,
+                                     writer=writer, deadline=deadline)
             
-            if success:
-                results['successful'] += 1
-                results['details'].append({
-                    'symbol': symbol,
-                    'status': 'success',
-                    'price': float(stock_data['price']),
-                    'change': float(stock_data['change']),
-                    'change_percent': stock_data['change_percent']
-                })
-            else:
-                results['failed'] += 1
-                results['details'].append({
-                    'symbol': symbol,
-                    'status': 'error',
-                    'error': 'database_error',
-                    'message': error_msg
-                })
+            if writer is not None:
+                finalize_batch_writes(results, writer)
+            settle_retry_queue(results)
         
         print(f"✅ Processing complete: {results['successful']}/{results['processed']} successful")
         
@@ -391,10 +309,24 @@ def lambda_handler(event, context):
             # API Gateway - retornar datos del símbolo
             if results['successful'] > 0:
                 detail = results['details'][0]
-                return create_response(200, {
-                    'message': f"Price for {detail['symbol']} updated successfully",
-                    'data': detail
-                })
+                if cache_info['served_from'] == 'provider':
+                    message = f"Price for {detail['symbol']} updated successfully"
+                else:
+                    message = f"Price for {detail['symbol']} served from cache ({cache_info['age_seconds']}s old)"
+                body = {
+                    'message': message,
+                    'data': detail,
+                    'cache': cache_info
+                }
+                body['lanes'] = provider_scheduler.snapshot()
+                print(f"🚦 Lanes: {json.dumps(body['lanes'])}")
+                if hedger is not None:
+                    body['hedge_stats'] = hedger.snapshot()
+                    print(f"📈 Hedge stats: {json.dumps(body['hedge_stats'])}")
+                headers = None
+                if cache_info['served_from'] != 'provider':
+                    headers = {'Age': str(int(cache_info['age_seconds']))}
+                return create_response(200, body, headers)
             else:
                 # Ya se manejó arriba, pero por si acaso
                 return create_response(500, {
@@ -403,6 +335,13 @@ def lambda_handler(event, context):
                 })
         else:
             # EventBridge o invocación directa - retornar resumen
+            if plan_info:
+                results['plan'] = plan_info
+            if market_info:
+                results['market'] = market_info
+                if CHUNK_STORAGE and market_info['action'] == 'end_of_day':
+                    # Las ventanas que cerraron se empaquetan una vez por sesión, con el run de cierre
+                    results['chunks'] = compact_recent_windows(DEFAULT_WATCHLIST, context)
             return {
                 'statusCode': 200,
                 'body': json.dumps(results)
@@ -0,0 +1,184 @@
+"""
+Prueba de carga local de fetchRealTimePrice con el proveedor stub
+Ejecutar: python3 load_test.py --symbols 2000 --latency-ms 120 --calls-per-minute 600
+
+No usa red ni cuota de Alpha Vantage; DynamoDB se reemplaza por una tabla en
+memoria, así que la medida es determinista (con --seed) en cualquier laptop.
+Con --recordings se reproducen respuestas grabadas (p.ej. los test*.json de
+este directorio o un archivo generado con RECORD_RESPONSES_TO).
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from itertools import product
+from string import ascii_uppercase
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load test de ingesta con StubProvider')
+    parser.add_argument('--symbols', type=int, default=500, help='Símbolos sintéticos en la watchlist')
+    parser.add_argument('--latency-ms', type=float, default=100, help='Latencia base del proveedor')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='Latencia extra aleatoria')
+    parser.add_argument('--rate-limit-per-minute', type=int, default=0, help='Límite del stub (payload "Note")')
+    parser.add_argument('--rate-limit-probability', type=float, default=0.0, help='Probabilidad de "Note"')
+    parser.add_argument('--calls-per-minute', type=int, default=6000, help='Presupuesto del token bucket')
+    parser.add_argument('--workers', type=int, default=8, help='Threads de ingesta')
+    parser.add_argument('--recordings', default='', help='Archivo o directorio con respuestas grabadas')
+    parser.add_argument('--bulk', action='store_true', help='Habilitar bulk quotes en el stub')
+    parser.add_argument('--sequential', action='store_true', help='Desactivar la ingesta concurrente')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+def synthetic_symbols(count):
+    """AAAA, AAAB, ... (símbolos válidos de 4 letras)"""
+    symbols = []
+    for letters in product(ascii_uppercase, repeat=4):
+        if len(symbols) >= count:
+            break
+        symbols.append(''.join(letters))
+    return symbols
+
+class InMemoryTable:
+    """Tabla DynamoDB mínima (put/get/update/delete/query/batch_write_item/transact_write_items) para medir sin AWS"""
+
+    def __init__(self, name, key_fields):
+        self.name = name
+        self.key_fields = key_fields
+        self.items = {}
+        self.lock = threading.Lock()
+        self.meta = type('Meta', (), {'client': self})()
+
+    def key(self, item):
+        return tuple(item[field] for field in self.key_fields)
+
+    def put_item(self, Item, **kwargs):
+        with self.lock:
+            self.items[self.key(Item)] = dict(Item)
+        return {'ResponseMetadata': {'HTTPStatusCode': 200}}
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(self.key(Key))
+        return {'Item': item} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        # Solo "ADD campo :valor [SET campo = :valor, ...]" (símbolos diferidos)
+        add_part, _, set_part = UpdateExpression.partition(' SET ')
+        with self.lock:
+            item = self.items.setdefault(self.key(Key), dict(Key))
+            for clause in add_part.replace('ADD ', '', 1).split(','):
+                field, placeholder = clause.split()
+                value = ExpressionAttributeValues[placeholder]
+                item[field] = (item.get(field) or type(value)()) | value if isinstance(value, set) else item.get(field, 0) + value
+            for clause in filter(None, set_part.split(',')):
+                field, placeholder = [part.strip() for part in clause.split('=')]
+                item[field] = ExpressionAttributeValues[placeholder]
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        with self.lock:
+            item = self.items.pop(self.key(Key), None)
+        return {'Attributes': item} if item else {}
+
+    def query(self, **kwargs):
+        # Solo el patrón "último item del símbolo" que usa la ingesta
+        return {'Items': [], 'Count': 0}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        # Solo Puts (punto crudo + LATEST); las condiciones no se evalúan
+        for request in TransactItems:
+            self.put_item(request['Put']['Item'])
+        return {}
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        for request in RequestItems.get(self.name, []):
+            if 'DeleteRequest' in request:
+                self.delete_item(request['DeleteRequest']['Key'])
+            else:
+                self.put_item(request['PutRequest']['Item'])
+        return {'UnprocessedItems': {}}
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    args = parse_args()
+
+    os.environ.update({
+        'PROVIDER': 'stub',
+        'STUB_LATENCY_MS': str(args.latency_ms),
+        'STUB_JITTER_MS': str(args.jitter_ms),
+        'STUB_RATE_LIMIT_PER_MINUTE': str(args.rate_limit_per_minute),
+        'STUB_RATE_LIMIT_PROBABILITY': str(args.rate_limit_probability),
+        'STUB_RECORDINGS': args.recordings,
+        'STUB_BULK': 'true' if args.bulk else 'false',
+        'STUB_SEED': str(args.seed),
+        'PROVIDER_CALLS_PER_MINUTE': str(args.calls_per_minute),
+        'QUOTA_LEDGER': 'false',
+        'MAX_WORKERS': str(args.workers),
+        'CONCURRENT_INGESTION': 'false' if args.sequential else 'true',
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+    })
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    # Lambda Layer common-layer (en Lambda queda en /opt/python)
+    sys.path.insert(0, os.path.join(here, '..', '..', 'layers', 'common-layer', 'python'))
+    import lambda_function_v1 as ingestion
+    import providers
+    import resources
+    import retries
+
+    # DynamoDB en memoria (los workers usan get_table)
+    price_table = InMemoryTable(resources.TABLE_NAME, ('symbol', 'timestamp'))
+    resources.table = price_table
+    resources.state_table = InMemoryTable(resources.STATE_TABLE_NAME, ('pk', 'sk'))
+    resources.get_table = lambda: price_table
+    # Cola de reintentos en memoria (misma interfaz que la de DynamoDB)
+    retries.retry_queue = retries.RetryQueue()
+
+    symbols = synthetic_symbols(args.symbols)
+    if args.recordings:
+        symbols = sorted(providers.provider.recordings) + symbols
+
+    print(f"🚀 Load test: {len(symbols)} symbols, latency {args.latency_ms}±{args.jitter_ms} ms, "
+          f"{args.calls_per_minute} calls/min, {args.workers} workers")
+
+    start = time.perf_counter()
+    response = ingestion.lambda_handler({'symbols': symbols}, None)
+    duration = time.perf_counter() - start
+
+    results = json.loads(response['body'])
+    totals = [d['timings']['total_ms'] for d in results['details'] if 'timings' in d]
+
+    report = {
+        'symbols': len(symbols),
+        'duration_s': round(duration, 2),
+        'symbols_per_s': round(len(symbols) / duration, 1) if duration else None,
+        'successful': results['successful'],
+        'failed': results['failed'],
+        'rate_limited': results['rate_limited'],
+        'deferred': len(results['deferred']),
+        'breaker': results.get('breaker'),
+        'retry_queue': results.get('retry_queue'),
+        'lanes': results.get('lanes'),
+        'writes_avoided': results['writes_avoided'],
+        'items_stored': len(price_table.items),
+        'symbol_total_ms': {
+            'p50': percentile(totals, 50),
+            'p95': percentile(totals, 95),
+            'p99': percentile(totals, 99)
+        },
+        'provider': providers.provider.stats,
+        'batch_write': results.get('batch_write')
+    }
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
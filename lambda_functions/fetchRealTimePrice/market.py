@@ -0,0 +1,77 @@
+"""
+Calendario de mercado de los runs de EventBridge (refresh de cierre por sesión)
+"""
+
+from botocore.exceptions import ClientError
+from datetime import datetime, timedelta, timezone
+import os
+
+# Lambda Layer common-layer
+from financial_common.market_calendar import TradingCalendar
+
+import resources
+
+# ==================== CONFIGURACIÓN ====================
+# Calendario de mercado (NYSE/Nasdaq) para los runs de EventBridge
+MARKET_CALENDAR = os.environ.get('MARKET_CALENDAR', 'true').lower() == 'true'
+MARKET_CLOSED_MODE = os.environ.get('MARKET_CLOSED_MODE', 'eod')  # eod | skip
+MARKET_EOD_WINDOW_MINUTES = int(os.environ.get('MARKET_EOD_WINDOW_MINUTES', '60'))
+MARKET_EXTRA_HOLIDAYS = [d.strip() for d in os.environ.get('MARKET_EXTRA_HOLIDAYS', '').split(',') if d.strip()]
+INGESTION_INTERVAL_MINUTES = int(os.environ.get('INGESTION_INTERVAL_MINUTES', '60'))  # rate() de la regla
+MARKET_STATUS_RESOURCE = '/market/status'
+
+# ==================== MARKET CALENDAR ====================
+
+market_calendar = TradingCalendar(MARKET_EXTRA_HOLIDAYS, INGESTION_INTERVAL_MINUTES, MARKET_CLOSED_MODE == 'eod')
+
+def claim_end_of_day(session_date, last_close, now):
+    """
+    Reservar el refresh de cierre de una sesión (PutItem condicional: lo hace un solo run)
+    
+    Sin tabla de estado, lo hace el run que cae dentro de MARKET_EOD_WINDOW_MINUTES
+    después del cierre.
+    
+    Returns:
+        bool: True si este run debe hacer el refresh de cierre
+    """
+    if resources.state_table is not None:
+        try:
+            resources.state_table.put_item(
+                Item={
+                    'pk': 'MARKET#EOD',
+                    'sk': session_date,
+                    'claimed_at': now.isoformat(),
+                    'expires_at': int(now.timestamp()) + 3 * 86400
+                },
+                ConditionExpression='attribute_not_exists(pk)'
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            print(f"⚠️ Could not claim end-of-day refresh: {str(e)}")
+        except Exception as e:
+            print(f"⚠️ Could not claim end-of-day refresh: {str(e)}")
+    
+    return now < last_close + timedelta(minutes=MARKET_EOD_WINDOW_MINUTES)
+
+def market_run_decision(now=None):
+    """
+    Qué hace un run de EventBridge según el calendario
+    
+    Returns:
+        dict: status del mercado + 'action' ('intraday' | 'end_of_day' | 'skip')
+    """
+    now = now or datetime.now(timezone.utc)
+    status = market_calendar.status(now)
+    
+    if status['is_open']:
+        action = 'intraday'
+    elif MARKET_CLOSED_MODE == 'eod' and claim_end_of_day(
+        status['last_session'], datetime.fromisoformat(status['last_close']), now
+    ):
+        action = 'end_of_day'
+    else:
+        action = 'skip'
+    
+    return dict(status, action=action)
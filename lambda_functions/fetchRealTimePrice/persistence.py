@@ -0,0 +1,304 @@
+"""
+Escritura de cotizaciones en FinancialData: items crudos, detección de
+cambios, rollups diarios e item LATEST
+"""
+
+from boto3.dynamodb.conditions import Key
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
+import os
+import threading
+import time
+
+# Lambda Layer common-layer
+from financial_common.batch_writer import BatchWriter
+from financial_common.chunks import chunk_bytes, chunk_points, CHUNK_STORAGE, query_chunks
+from financial_common.latest import latest_key, put_with_latest, update_latest
+from financial_common.rollups import merge_rollup, new_rollup, trading_day_of, update_rollups
+
+import resources
+from deadline import has_time_left
+
+# ==================== CONFIGURACIÓN ====================
+# Escrituras agrupadas con BatchWriteItem (BATCH_WRITE_SIZE / BATCH_WRITE_MAX_RETRIES en financial_common)
+BATCH_WRITES = os.environ.get('BATCH_WRITES', 'true').lower() == 'true'
+
+# Rollups diarios OHLCV (symbol '<SYMBOL>#1D' en FinancialData), mantenidos al escribir
+ROLLUPS = os.environ.get('ROLLUPS', 'true').lower() == 'true'
+
+# Item '<SYMBOL>#LATEST' con la última cotización (lecturas con GetItem)
+# Solo los LATEST llevan 'registry' (REGISTRY_KEY), así el GSI de registro de
+# símbolos (registry, symbol) tiene un item por símbolo y getPortfolio lo lee con Query
+LATEST_ITEMS = os.environ.get('LATEST_ITEMS', 'true').lower() == 'true'
+
+# Omitir escrituras cuando la cotización no cambió desde el último punto guardado
+CHANGE_DETECTION = os.environ.get('CHANGE_DETECTION', 'true').lower() == 'true'
+
+# ==================== DATABASE FUNCTIONS ====================
+
+def build_dynamodb_item(stock_data):
+    """Construir el item de FinancialData para un stock_data (puede lanzar InvalidOperation)"""
+    timestamp = int(datetime.now().timestamp())
+    current_date = datetime.now().isoformat()
+    
+    return {
+        'symbol': stock_data['symbol'],
+        'timestamp': timestamp,
+        'price': Decimal(str(stock_data['price'])),
+        'date': current_date,
+        'volume': stock_data['volume'],
+        'change': Decimal(str(stock_data['change'])),
+        'change_percent': Decimal(str(stock_data['change_percent'])),
+        'source': stock_data.get('source', 'alpha_vantage'),
+        'latest_trading_day': stock_data['latest_trading_day']
+    }
+
+def save_to_dynamodb(stock_data):
+    """
+    Guardar datos en DynamoDB con error handling
+    
+    Returns:
+        tuple: (success: bool, error_message: str or None)
+    """
+    
+    target_table = resources.get_table()
+    if target_table is None:
+        return False, "DynamoDB table not initialized"
+    
+    try:
+        item = build_dynamodb_item(stock_data)
+        if LATEST_ITEMS:
+            put_with_latest(target_table, item)
+        else:
+            target_table.put_item(Item=item)
+        print(f"💾 Saved {stock_data['symbol']} to DynamoDB")
+        if ROLLUPS:
+            update_rollups(target_table, [item])
+        return True, None
+    
+    except InvalidOperation as e:
+        return False, f"Invalid decimal conversion: {str(e)}"
+    except Exception as e:
+        return False, f"DynamoDB error: {str(e)}"
+
+def queue_to_dynamodb(stock_data, writer):
+    """
+    Encolar datos en un BatchWriter; el resultado definitivo llega con writer.flush()
+    
+    Returns:
+        tuple: (success: bool, key: tuple or error_message: str)
+    """
+    try:
+        item = build_dynamodb_item(stock_data)
+        return True, writer.add(item)
+    except InvalidOperation as e:
+        return False, f"Invalid decimal conversion: {str(e)}"
+    except Exception as e:
+        return False, f"DynamoDB error: {str(e)}"
+
+# ==================== CHANGE DETECTION ====================
+
+# Última cotización conocida por símbolo: {symbol: (latest_trading_day, price, volume)}
+# Vive en el contenedor (warm invocations); se siembra con un Query del último item
+last_quotes = {}
+last_quotes_lock = threading.Lock()
+
+def quote_fingerprint(latest_trading_day, price, volume):
+    """Campos que identifican un punto de precio para detectar duplicados"""
+    return (str(latest_trading_day or ''), Decimal(str(price)), int(volume or 0))
+
+def get_last_quote(symbol):
+    """
+    Obtener la última cotización conocida (cache en proceso o item LATEST en DynamoDB)
+    
+    Returns:
+        tuple or None: Fingerprint de la última cotización, None si no hay datos
+    """
+    with last_quotes_lock:
+        if symbol in last_quotes:
+            return last_quotes[symbol]
+    
+    item = get_latest_item(symbol)
+    
+    fingerprint = None
+    if item:
+        fingerprint = quote_fingerprint(item.get('latest_trading_day'), item['price'], item.get('volume'))
+    
+    with last_quotes_lock:
+        last_quotes[symbol] = fingerprint
+    
+    return fingerprint
+
+def remember_quote(stock_data):
+    """Actualizar la cache tras escribir (o encolar) una cotización"""
+    fingerprint = quote_fingerprint(
+        stock_data['latest_trading_day'], stock_data['price'], stock_data['volume']
+    )
+    with last_quotes_lock:
+        last_quotes[stock_data['symbol']] = fingerprint
+
+def forget_quote(symbol):
+    """Invalidar la cache de un símbolo (p.ej. si la escritura falló)"""
+    with last_quotes_lock:
+        last_quotes.pop(symbol, None)
+
+def is_unchanged_quote(stock_data):
+    """True si latest_trading_day, price y volume coinciden con el último punto guardado"""
+    try:
+        last = get_last_quote(stock_data['symbol'])
+    except Exception as e:
+        # Ante la duda, escribir
+        print(f"⚠️ Change detection lookup failed for {stock_data['symbol']}: {str(e)}")
+        return False
+    
+    if last is None:
+        return False
+    
+    return last == quote_fingerprint(
+        stock_data['latest_trading_day'], stock_data['price'], stock_data['volume']
+    )
+
+# ==================== ROLLUPS ====================
+
+def rebuild_rollups(symbol, days=None):
+    """
+    Recalcular desde cero los rollups de un símbolo a partir de sus items crudos
+    
+    Lee el histórico paginado (solo los campos necesarios) y reescribe los
+    rollups con BatchWriteItem. Con CHUNK_STORAGE también suma los puntos de
+    los chunks que ya no tienen su item crudo (CHUNK_PRUNE_RAW).
+    
+    Returns:
+        dict: {'symbol', 'points', 'days', 'written', 'failed'}
+    """
+    since = int(time.time()) - int(days) * 86400 if days else 0
+    condition = Key('symbol').eq(symbol)
+    if days:
+        condition = condition & Key('timestamp').gte(since)
+    
+    query = {
+        'KeyConditionExpression': condition,
+        'ProjectionExpression': '#ts, price, #open, high, low, volume, latest_trading_day',
+        'ExpressionAttributeNames': {'#ts': 'timestamp', '#open': 'open'}
+    }
+    rollups = {}
+    seen = set()
+    
+    while True:
+        response = resources.table.query(**query)
+        for item in response.get('Items', []):
+            day = trading_day_of(item)
+            merge_rollup(rollups.setdefault(day, new_rollup(symbol, day)), item)
+            seen.add(int(item['timestamp']))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    points = len(seen)
+    
+    if CHUNK_STORAGE:
+        for chunk in query_chunks(resources.table, symbol, since, int(time.time())):
+            for timestamp, (price, volume) in chunk_points(chunk_bytes(chunk['data'])).items():
+                if timestamp < since or timestamp in seen:
+                    continue
+                item = {'timestamp': timestamp, 'price': price, 'volume': volume}
+                day = trading_day_of(item)
+                merge_rollup(rollups.setdefault(day, new_rollup(symbol, day)), item)
+                points += 1
+    
+    writer = BatchWriter(resources.table)
+    rebuilt_at = datetime.now().isoformat()
+    for rollup in rollups.values():
+        # version nueva: una actualización en vuelo falla su condición y relee el rollup reconstruido
+        writer.add(dict(rollup, version=int(time.time() * 1000), updated_at=rebuilt_at))
+    results = writer.flush()
+    failed = sum(1 for success, _ in results.values() if not success)
+    
+    print(f"📅 Rebuilt {len(rollups)} daily rollups for {symbol} from {points} points")
+    return {
+        'symbol': symbol,
+        'points': points,
+        'days': len(rollups),
+        'written': len(rollups) - failed,
+        'failed': failed
+    }
+
+# ==================== LATEST ====================
+
+def get_latest_item(symbol):
+    """
+    Última cotización guardada de un símbolo: GetItem del LATEST y, si el
+    símbolo todavía no lo tiene, el Query con Limit=1 de siempre
+    
+    Returns:
+        dict or None: Item (con as_of si vino del LATEST)
+    """
+    target_table = resources.get_table()
+    if target_table is None:
+        return None
+    
+    if LATEST_ITEMS:
+        item = target_table.get_item(Key=latest_key(symbol)).get('Item')
+        if item:
+            return item
+    
+    response = target_table.query(
+        KeyConditionExpression=Key('symbol').eq(symbol),
+        ScanIndexForward=False,
+        Limit=1
+    )
+    items = response.get('Items', [])
+    return items[0] if items else None
+
+def rebuild_latest(context=None, start_key=None):
+    """
+    Crear los LATEST (y con ellos el registro de símbolos) de los datos
+    guardados antes de que existieran: un Scan paginado, una sola vez
+    
+    update_latest es condicional, así que no pisa LATEST más nuevos. Si el
+    run se acerca al timeout devuelve last_evaluated_key para seguir.
+    
+    Returns:
+        dict: {'scanned', 'symbols', 'latest', 'last_evaluated_key'}
+    """
+    scan = {}
+    if start_key:
+        scan['ExclusiveStartKey'] = start_key
+    
+    newest = {}
+    scanned = 0
+    last_key = None
+    
+    while True:
+        response = resources.table.scan(**scan)
+        for item in response.get('Items', []):
+            scanned += 1
+            symbol = item['symbol']
+            if '#' not in symbol and (symbol not in newest or item['timestamp'] > newest[symbol]['timestamp']):
+                newest[symbol] = item
+        
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key or not has_time_left(context):
+            break
+        scan['ExclusiveStartKey'] = last_key
+    
+    stats = update_latest(resources.get_table(), list(newest.values()))
+    print(f"🗂️ Rebuilt LATEST for {len(newest)} symbols from {scanned} items")
+    return {
+        'scanned': scanned,
+        'symbols': len(newest),
+        'latest': stats,
+        'last_evaluated_key': {'symbol': last_key['symbol'], 'timestamp': int(last_key['timestamp'])} if last_key else None
+    }
+
+def after_batch_write(items):
+    """
+    on_written de los BatchWriter: LATEST y rollups de los items escritos
+    
+    Corre después del BatchWriteItem, fuera de transacción: en este camino el
+    LATEST es eventualmente consistente con los puntos crudos.
+    """
+    target_table = resources.get_table()
+    if LATEST_ITEMS:
+        update_latest(target_table, items)
+    if ROLLUPS:
+        update_rollups(target_table, items)
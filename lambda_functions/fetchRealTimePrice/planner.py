@@ -0,0 +1,286 @@
+"""
+Plan de refresco por demanda y volatilidad para el presupuesto del proveedor
+"""
+
+import json
+from boto3.dynamodb.conditions import Key
+from datetime import datetime, timedelta, timezone
+import math
+import os
+import time
+
+# Lambda Layer common-layer
+from financial_common.chunks import CHUNK_STORAGE, recent_packed_prices
+from financial_common.demand import demand_bucket_key
+
+import resources
+from deadline import elapsed_ms
+from rate_limiter import PROVIDER_CALLS_PER_MINUTE
+from symbol_universe import validate_symbol
+from ingestion import DEFAULT_WATCHLIST
+
+# ==================== CONFIGURACIÓN ====================
+# Planificador de refresco por demanda y volatilidad
+REFRESH_PLANNER = os.environ.get('REFRESH_PLANNER', 'false').lower() == 'true'
+REFRESH_BUDGET_PER_HOUR = int(os.environ.get('REFRESH_BUDGET_PER_HOUR', str(PROVIDER_CALLS_PER_MINUTE * 10)))
+REFRESH_SLOTS_PER_HOUR = int(os.environ.get('REFRESH_SLOTS_PER_HOUR', '12'))  # rate(5 minutes)
+PLAN_MAX_AGE_MINUTES = int(os.environ.get('PLAN_MAX_AGE_MINUTES', '60'))
+PLAN_MAX_SYMBOLS = int(os.environ.get('PLAN_MAX_SYMBOLS', '200'))
+DEMAND_WINDOW_HOURS = int(os.environ.get('DEMAND_WINDOW_HOURS', '24'))
+DEMAND_HALF_LIFE_HOURS = float(os.environ.get('DEMAND_HALF_LIFE_HOURS', '6'))
+DEMAND_WEIGHT = float(os.environ.get('DEMAND_WEIGHT', '0.6'))  # El resto pondera la volatilidad
+VOLATILITY_POINTS = int(os.environ.get('VOLATILITY_POINTS', '24'))
+
+# ==================== REFRESH PLANNER ====================
+
+PLAN_KEY = {'pk': 'SCHEDULE', 'sk': 'PLAN'}
+
+def get_read_demand(now=None, window_hours=DEMAND_WINDOW_HOURS, half_life_hours=DEMAND_HALF_LIFE_HOURS):
+    """
+    Demanda de lectura por símbolo en la ventana, con decaimiento exponencial
+    
+    Una lectura de hace half_life_hours pesa la mitad que una de esta hora.
+    
+    Returns:
+        dict: {symbol: {'demand': float, 'reads': int}}
+    """
+    if resources.state_table is None:
+        return {}
+    
+    now = now or datetime.now(timezone.utc)
+    demand = {}
+    
+    for age in range(window_hours):
+        weight = 0.5 ** (age / half_life_hours)
+        query = {'KeyConditionExpression': Key('pk').eq(demand_bucket_key(now - timedelta(hours=age)))}
+        
+        while True:
+            response = resources.state_table.query(**query)
+            for item in response.get('Items', []):
+                entry = demand.setdefault(item['sk'], {'demand': 0.0, 'reads': 0})
+                reads = int(item.get('reads', 0))
+                entry['demand'] += reads * weight
+                entry['reads'] += reads
+            if 'LastEvaluatedKey' not in response:
+                break
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    return demand
+
+def get_recent_volatility(symbol, points=VOLATILITY_POINTS):
+    """
+    Desviación estándar (%) de los retornos entre los últimos puntos guardados
+    
+    Returns:
+        float: Volatilidad reciente (0.0 sin historia suficiente)
+    """
+    response = resources.get_table().query(
+        KeyConditionExpression=Key('symbol').eq(symbol),
+        ScanIndexForward=False,
+        Limit=points,
+        ProjectionExpression='#ts, price',
+        ExpressionAttributeNames={'#ts': 'timestamp'}
+    )
+    items = response.get('Items', [])
+    prices = [float(item['price']) for item in items if item.get('price')]
+    
+    # Ventanas cerradas sin puntos crudos (CHUNK_PRUNE_RAW): completar con los chunks
+    if CHUNK_STORAGE and len(prices) < points:
+        before = int(items[-1]['timestamp']) if items else int(time.time()) + 1
+        prices += recent_packed_prices(resources.get_table(), symbol, before, points - len(prices))
+    returns = [(newer - older) / older * 100 for newer, older in zip(prices, prices[1:]) if older]
+    
+    if len(returns) < 2:
+        return 0.0
+    
+    avg = sum(returns) / len(returns)
+    return math.sqrt(sum((r - avg) ** 2 for r in returns) / (len(returns) - 1))
+
+def score_symbols(symbols, demand, volatility, demand_weight=DEMAND_WEIGHT):
+    """
+    Prioridad de cada símbolo: demanda y volatilidad normalizadas al máximo del universo
+    
+    Returns:
+        list: [{'symbol', 'demand', 'volatility', 'score'}] de mayor a menor score
+    """
+    max_demand = max([demand.get(s, {}).get('demand', 0) for s in symbols] + [0]) or 1
+    max_volatility = max([volatility.get(s, 0) for s in symbols] + [0]) or 1
+    
+    scored = []
+    for symbol in symbols:
+        symbol_demand = demand.get(symbol, {}).get('demand', 0)
+        symbol_volatility = volatility.get(symbol, 0)
+        score = (demand_weight * symbol_demand / max_demand
+                 + (1 - demand_weight) * symbol_volatility / max_volatility)
+        scored.append({
+            'symbol': symbol,
+            'demand': round(symbol_demand, 2),
+            'volatility': round(symbol_volatility, 4),
+            'score': round(score, 4)
+        })
+    
+    # Desempate estable por orden de la watchlist
+    scored.sort(key=lambda entry: -entry['score'])
+    return scored
+
+def allocate_refreshes(scored, budget, slots):
+    """
+    Repartir el presupuesto de llamadas/hora entre los símbolos
+    
+    Cada símbolo recibe un refresco por hora en orden de prioridad mientras
+    alcance el presupuesto (el resto queda diferido); lo que sobra se reparte
+    en proporción al score, con un máximo de un refresco por slot.
+    
+    Returns:
+        list: scored con 'refreshes' (0 = diferido)
+    """
+    for entry in scored:
+        entry['refreshes'] = 0
+    
+    remaining = budget
+    for entry in scored:
+        if remaining <= 0:
+            break
+        entry['refreshes'] = 1
+        remaining -= 1
+    
+    while remaining > 0:
+        candidates = [e for e in scored if 0 < e['refreshes'] < slots and e['score'] > 0]
+        if not candidates:
+            break
+        
+        total_score = sum(e['score'] for e in candidates)
+        granted = 0
+        for entry in candidates:
+            extra = min(slots - entry['refreshes'], int(remaining * entry['score'] / total_score))
+            entry['refreshes'] += extra
+            granted += extra
+        
+        if granted == 0:
+            # Restos del redondeo: uno más al de mayor score
+            candidates[0]['refreshes'] += 1
+            granted = 1
+        remaining -= granted
+    
+    return scored
+
+def assign_slots(scored, slots, budget):
+    """
+    Escalonar los refrescos en los slots de la hora
+    
+    Un símbolo con k refrescos se reparte cada slots/k slots empezando en el
+    slot menos cargado; ningún slot supera ceil(budget / slots) llamadas.
+    
+    Returns:
+        list: slots[i] = símbolos a refrescar en el slot i (por prioridad)
+    """
+    capacity = max(1, math.ceil(budget / slots))
+    plan = [[] for _ in range(slots)]
+    
+    for entry in scored:
+        count = entry['refreshes']
+        if count <= 0:
+            continue
+        
+        offset = min(range(slots), key=lambda i: len(plan[i]))
+        for i in range(count):
+            target = (offset + i * slots // count) % slots
+            for step in range(slots):
+                slot = (target + step) % slots
+                if len(plan[slot]) < capacity and entry['symbol'] not in plan[slot]:
+                    plan[slot].append(entry['symbol'])
+                    break
+    
+    return plan
+
+def build_refresh_plan(now=None, budget=REFRESH_BUDGET_PER_HOUR, slots=REFRESH_SLOTS_PER_HOUR):
+    """
+    Construir y guardar el plan de refresco priorizado
+    
+    Universo: DEFAULT_WATCHLIST más los símbolos leídos en la ventana de
+    demanda (hasta PLAN_MAX_SYMBOLS, los más demandados primero).
+    
+    Returns:
+        dict: Plan {'built_at', 'budget', 'slots', 'symbols', 'schedule', 'deferred'}
+    """
+    start = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    demand = get_read_demand(now)
+    
+    universe = list(DEFAULT_WATCHLIST)
+    for symbol, _ in sorted(demand.items(), key=lambda kv: -kv[1]['demand']):
+        is_valid, result = validate_symbol(symbol)
+        if is_valid and result not in universe:
+            universe.append(result)
+    universe = universe[:max(PLAN_MAX_SYMBOLS, len(DEFAULT_WATCHLIST))]
+    
+    volatility = {}
+    for symbol in universe:
+        try:
+            volatility[symbol] = get_recent_volatility(symbol)
+        except Exception as e:
+            print(f"⚠️ Volatility unavailable for {symbol}: {str(e)}")
+    
+    scored = allocate_refreshes(score_symbols(universe, demand, volatility), budget, slots)
+    plan = {
+        'built_at': now.isoformat(),
+        'budget': budget,
+        'slots': slots,
+        'symbols': scored,
+        'schedule': assign_slots(scored, slots, budget),
+        'deferred': [entry['symbol'] for entry in scored if entry['refreshes'] == 0],
+        'build_ms': elapsed_ms(start)
+    }
+    
+    save_refresh_plan(plan)
+    print(f"🗓️ Refresh plan: {len(universe)} symbols, {budget} calls/h in {slots} slots, "
+          f"{len(plan['deferred'])} deferred")
+    
+    return plan
+
+def save_refresh_plan(plan):
+    if resources.state_table is None:
+        return
+    
+    resources.state_table.put_item(Item=dict(
+        PLAN_KEY,
+        plan=json.dumps(plan),
+        built_at=plan['built_at']
+    ))
+
+def get_refresh_plan():
+    """Leer el plan guardado (un GetItem); None si no existe"""
+    if resources.state_table is None:
+        return None
+    
+    item = resources.state_table.get_item(Key=PLAN_KEY).get('Item')
+    return json.loads(item['plan']) if item else None
+
+def current_slot(now, slots):
+    return (now.minute * slots) // 60
+
+def planned_symbols(now=None):
+    """
+    Símbolos que tocan en este slot según el plan (reconstruido si caducó)
+    
+    Returns:
+        tuple: (symbols: list, info: dict) - info describe el plan usado
+    """
+    now = now or datetime.now(timezone.utc)
+    plan = get_refresh_plan()
+    
+    if plan is not None:
+        age_minutes = (now - datetime.fromisoformat(plan['built_at'])).total_seconds() / 60
+        if age_minutes > PLAN_MAX_AGE_MINUTES:
+            plan = None
+    
+    if plan is None:
+        plan = build_refresh_plan(now)
+    
+    slot = current_slot(now, plan['slots'])
+    return plan['schedule'][slot], {
+        'built_at': plan['built_at'],
+        'slot': slot,
+        'slots': plan['slots'],
+        'deferred': len(plan['deferred'])
+    }
@@ -0,0 +1,770 @@
+"""
+Provider adapters de cotizaciones (Alpha Vantage, Finnhub y stub record/replay)
+"""
+
+from abc import ABC, abstractmethod
+import json
+import requests
+from datetime import datetime, timedelta, timezone
+import os
+import random
+import threading
+import time
+
+from http_client import http_client
+from stream_parser import STREAM_CHUNK_SIZE, TimeSeriesStream
+
+# ==================== CONFIGURACIÓN ====================
+ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY')
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+
+# Proveedor de cotizaciones y soporte de bulk quotes (requiere plan premium)
+PROVIDER_NAME = os.environ.get('PROVIDER', 'alpha_vantage')
+ALPHA_VANTAGE_BULK_QUOTES = os.environ.get('ALPHA_VANTAGE_BULK_QUOTES', 'false').lower() == 'true'
+
+# Finnhub (proveedor secundario de los hedged requests)
+FINNHUB_API_KEY = os.environ.get('FINNHUB_API_KEY')
+FINNHUB_URL = "https://finnhub.io/api/v1/quote"
+
+# ==================== VALIDACIONES ====================
+
+def validate_api_key(quote_provider=None):
+    """Validar la API key del proveedor (default: el configurado con PROVIDER)"""
+    quote_provider = quote_provider or provider
+    if not quote_provider.requires_api_key:
+        return True, None
+    
+    if not quote_provider.api_key:
+        return False, f"{quote_provider.api_key_env} not configured"
+    
+    if len(quote_provider.api_key) < 10:
+        return False, f"Invalid {quote_provider.api_key_env} format"
+    
+    return True, quote_provider.api_key
+
+def validate_price_data(data):
+    """Validar que los datos de precio sean válidos"""
+    required_fields = ['symbol', 'price', 'volume', 'change']
+    
+    for field in required_fields:
+        if field not in data:
+            return False, f"Missing required field: {field}"
+    
+    # Validar tipos de datos
+    try:
+        price = float(data['price'])
+        if price <= 0:
+            return False, "Price must be positive"
+        
+        volume = int(data['volume'])
+        if volume < 0:
+            return False, "Volume cannot be negative"
+    
+    except (ValueError, TypeError) as e:
+        return False, f"Invalid data type: {str(e)}"
+    
+    return True, data
+
+# ==================== PROVIDER ADAPTERS ====================
+
+class QuoteProvider(ABC):
+    """
+    Interfaz de proveedor de cotizaciones
+    
+    get_quote devuelve stock_data o un error dict {'error', 'message', 'http_code'}.
+    get_bulk_quotes devuelve {symbol: stock_data | error dict} o un error dict
+    si el proveedor no soporta (o rechaza) la operación bulk.
+    """
+    
+    name = 'base'
+    supports_bulk = False
+    max_bulk_symbols = 1
+    requires_api_key = True
+    # Variable de entorno de la API key (para los mensajes de validate_api_key)
+    api_key_env = None
+    api_key = None
+    
+    @abstractmethod
+    def get_quote(self, symbol, timeout=None):
+        """Cotización actual de symbol"""
+    
+    def get_daily_series(self, symbol, outputsize='full'):
+        """Iterador de velas {'date', 'open', 'high', 'low', 'close', 'volume'}, más reciente primero"""
+        return {
+            'error': 'series_unsupported',
+            'message': f'Provider {self.name} does not support daily series',
+            'http_code': 501
+        }
+    
+    def get_bulk_quotes(self, symbols, timeout=None):
+        return {
+            'error': 'bulk_unsupported',
+            'message': f'Provider {self.name} does not support bulk quotes',
+            'http_code': 501
+        }
+
+class HttpQuoteProvider(QuoteProvider):
+    """Base de los adapters HTTP: GET con el cliente keep-alive y errores normalizados"""
+    
+    display_name = 'Quote provider'
+    
+    def __init__(self, url, client=None):
+        self.url = url
+        self.client = client or http_client
+    
+    def auth_params(self):
+        """Parámetros de autenticación agregados a cada request"""
+        return {}
+    
+    def _send(self, params, label, stream=False, timeout=None):
+        """
+        GET al endpoint del proveedor
+        
+        timeout (connect, read) reemplaza al del cliente cuando hay deadline.
+        
+        Returns:
+            tuple: (response or None, error: dict or None)
+        """
+        options = {'stream': stream}
+        if timeout:
+            options['timeout'] = timeout
+        
+        try:
+            response = self.client.get(
+                self.url,
+                params=dict(params, **self.auth_params()),
+                **options
+            )
+            response.raise_for_status()
+            return response, None
+        
+        except requests.exceptions.Timeout:
+            return None, {
+                'error': 'timeout',
+                'message': f'Request timeout for {label}',
+                'http_code': 504
+            }
+        except requests.exceptions.ConnectionError:
+            return None, {
+                'error': 'connection_error',
+                'message': f'Failed to connect to {self.display_name} API',
+                'http_code': 503
+            }
+        except requests.exceptions.HTTPError as e:
+            return None, {
+                'error': 'http_error',
+                'message': f'HTTP error: {e.response.status_code}',
+                'http_code': e.response.status_code
+            }
+        except Exception as e:
+            return None, {
+                'error': 'request_error',
+                'message': f'Request failed: {str(e)}',
+                'http_code': 500
+            }
+    
+    def _request(self, params, label, timeout=None):
+        """
+        GET al endpoint del proveedor con el body ya parseado
+        
+        Returns:
+            tuple: (data: dict or None, error: dict or None)
+        """
+        response, error = self._send(params, label, timeout=timeout)
+        if error:
+            return None, error
+        
+        # Parse response
+        try:
+            data = response.json()
+        except (json.JSONDecodeError, ValueError):
+            return None, {
+                'error': 'parse_error',
+                'message': 'Invalid JSON response from API',
+                'http_code': 502
+            }
+        
+        return data, None
+    
+    def _build_stock_data(self, symbol, fields):
+        """Construir y validar stock_data a partir de campos ya normalizados"""
+        try:
+            stock_data = {
+                'symbol': fields.get('symbol') or symbol,
+                'price': float(fields.get('price') or 0),
+                'volume': int(float(fields.get('volume') or 0)),
+                'latest_trading_day': fields.get('latest_trading_day') or '',
+                'previous_close': float(fields.get('previous_close') or 0),
+                'change': float(fields.get('change') or 0),
+                'change_percent': str(fields.get('change_percent') or '0').replace('%', ''),
+                'source': self.name
+            }
+        except (ValueError, TypeError) as e:
+            return {
+                'error': 'data_parse_error',
+                'message': f'Failed to parse API response: {str(e)}',
+                'http_code': 502
+            }
+        
+        # Validar datos extraídos
+        is_valid, result = validate_price_data(stock_data)
+        if not is_valid:
+            return {
+                'error': 'invalid_data',
+                'message': result,
+                'http_code': 502
+            }
+        
+        return stock_data
+
+class AlphaVantageProvider(HttpQuoteProvider):
+    """Adapter de Alpha Vantage: GLOBAL_QUOTE y REALTIME_BULK_QUOTES (premium)"""
+    
+    name = 'alpha_vantage'
+    display_name = 'Alpha Vantage'
+    api_key_env = 'ALPHA_VANTAGE_API_KEY'
+    max_bulk_symbols = 100
+    
+    def __init__(self, api_key, url=ALPHA_VANTAGE_URL, bulk_enabled=False, client=None, record_to=None):
+        super().__init__(url, client)
+        self.api_key = api_key
+        self.supports_bulk = bulk_enabled
+        # Grabación de respuestas para reproducirlas con StubProvider
+        self.record_to = record_to
+        self.recorded = {}
+    
+    def auth_params(self):
+        return {'apikey': self.api_key}
+    
+    def _request(self, params, label, timeout=None):
+        data, error = super()._request(params, label, timeout)
+        
+        if data is not None and self.record_to and params.get('function') == 'GLOBAL_QUOTE':
+            self.record(params['symbol'], data)
+        
+        return data, error
+    
+    def record(self, symbol, data):
+        """Guardar un payload GLOBAL_QUOTE en el archivo de grabación (formato de load_recordings)"""
+        self.recorded.setdefault(symbol, []).append(data)
+        try:
+            with open(self.record_to, 'w') as f:
+                json.dump(self.recorded, f)
+        except OSError as e:
+            print(f"⚠️ Could not write recordings to {self.record_to}: {str(e)}")
+    
+    def get_quote(self, symbol, timeout=None):
+        data, error = self._request({'function': 'GLOBAL_QUOTE', 'symbol': symbol}, symbol, timeout)
+        if error:
+            return error
+        
+        # Validar respuesta de API
+        if "Global Quote" not in data:
+            if "Note" in data or "Information" in data:
+                return self._limit_error(data)
+            elif "Error Message" in data:
+                return {
+                    'error': 'invalid_symbol',
+                    'message': f'Invalid or unknown symbol: {symbol}',
+                    'http_code': 404
+                }
+            else:
+                return {
+                    'error': 'no_data',
+                    'message': f'No data available for {symbol}',
+                    'http_code': 404
+                }
+        
+        quote = data["Global Quote"]
+        
+        return self._build_stock_data(symbol, {
+            'symbol': quote.get("01. symbol"),
+            'price': quote.get("05. price"),
+            'volume': quote.get("06. volume"),
+            'latest_trading_day': quote.get("07. latest trading day"),
+            'previous_close': quote.get("08. previous close"),
+            'change': quote.get("09. change"),
+            'change_percent': quote.get("10. change percent")
+        })
+    
+    def get_bulk_quotes(self, symbols, timeout=None):
+        if not self.supports_bulk:
+            return super().get_bulk_quotes(symbols)
+        
+        label = f'{len(symbols)} symbols'
+        data, error = self._request({
+            'function': 'REALTIME_BULK_QUOTES',
+            'symbol': ','.join(symbols)
+        }, label, timeout)
+        if error:
+            return error
+        
+        if "Note" in data:
+            return {
+                'error': 'rate_limit',
+                'message': 'Alpha Vantage API rate limit reached (5 calls/min)',
+                'http_code': 429
+            }
+        
+        # Keys sin plan premium reciben un "Information" en lugar de "data"
+        if not isinstance(data.get('data'), list):
+            return {
+                'error': 'bulk_unsupported',
+                'message': data.get('Information') or data.get('message') or 'Bulk quotes not available',
+                'http_code': 501
+            }
+        
+        quotes = {}
+        for row in data['data']:
+            symbol = str(row.get('symbol', '')).upper()
+            if symbol not in symbols:
+                continue
+            
+            quotes[symbol] = self._build_stock_data(symbol, {
+                'symbol': symbol,
+                'price': row.get('close'),
+                'volume': row.get('volume'),
+                'latest_trading_day': str(row.get('timestamp') or '')[:10],
+                'previous_close': row.get('previous_close'),
+                'change': row.get('change'),
+                'change_percent': row.get('change_percent')
+            })
+        
+        return quotes
+    
+    @staticmethod
+    def _limit_error(data):
+        """
+        Error dict de los payloads de cuota: "Note" (límite por minuto) e
+        "Information" (cuota diaria agotada o endpoint premium). No dicen nada
+        del símbolo, así que no deben terminar en la negative cache.
+        """
+        return {
+            'error': 'rate_limit',
+            'message': data.get('Information') or 'Alpha Vantage API rate limit reached (5 calls/min)',
+            'http_code': 429
+        }
+    
+    def _series_error(self, data, symbol):
+        """Mapear un payload sin serie temporal a un error dict"""
+        if "Note" in data or "Information" in data:
+            return self._limit_error(data)
+        return {
+            'error': 'no_data',
+            'message': data.get('Error Message') or f'No daily series for {symbol}',
+            'http_code': 404
+        }
+    
+    def get_daily_series(self, symbol, outputsize='full'):
+        """
+        Velas diarias en el orden del proveedor (más reciente primero)
+        
+        El body se lee con stream=True y se parsea incrementalmente: las velas
+        se generan una a una sin materializar el JSON completo.
+        
+        Returns:
+            iterator: Velas {'date', 'open', 'high', 'low', 'close', 'volume'}
+            dict: Error dict si la petición falla o no hay serie
+        """
+        response, error = self._send({
+            'function': 'TIME_SERIES_DAILY',
+            'symbol': symbol,
+            'outputsize': outputsize
+        }, symbol, stream=True)
+        if error:
+            return error
+        
+        stream = TimeSeriesStream(response, "Time Series (Daily)")
+        
+        try:
+            found = stream.open()
+        except Exception as e:
+            stream.close()
+            return {
+                'error': 'request_error',
+                'message': f'Request failed: {str(e)}',
+                'http_code': 500
+            }
+        
+        if not found:
+            # Payload pequeño sin serie (Note / Error Message / Information)
+            try:
+                data = json.loads(stream.parser.buffer)
+            except (json.JSONDecodeError, ValueError):
+                return {
+                    'error': 'parse_error',
+                    'message': 'Invalid JSON response from API',
+                    'http_code': 502
+                }
+            return self._series_error(data, symbol)
+        
+        def candles():
+            for day, values in stream.entries():
+                yield {
+                    'date': day,
+                    'open': values.get("1. open"),
+                    'high': values.get("2. high"),
+                    'low': values.get("3. low"),
+                    'close': values.get("4. close"),
+                    'volume': values.get("5. volume")
+                }
+        
+        return candles()
+
+class FinnhubProvider(HttpQuoteProvider):
+    """Adapter de Finnhub (/quote): cotización sin volumen, usado como proveedor secundario"""
+    
+    name = 'finnhub'
+    display_name = 'Finnhub'
+    api_key_env = 'FINNHUB_API_KEY'
+    
+    def __init__(self, api_key, url=FINNHUB_URL, client=None):
+        super().__init__(url, client)
+        self.api_key = api_key
+    
+    def auth_params(self):
+        return {'token': self.api_key}
+    
+    def get_quote(self, symbol, timeout=None):
+        if not self.api_key:
+            return {
+                'error': 'configuration_error',
+                'message': 'FINNHUB_API_KEY not configured',
+                'http_code': 500
+            }
+        
+        data, error = self._request({'symbol': symbol}, symbol, timeout)
+        if error:
+            if error.get('http_code') == 429:
+                return {
+                    'error': 'rate_limit',
+                    'message': 'Finnhub API rate limit reached',
+                    'http_code': 429
+                }
+            return error
+        
+        # Finnhub responde c=0 para símbolos desconocidos
+        if not isinstance(data, dict) or not data.get('c'):
+            return {
+                'error': 'invalid_symbol',
+                'message': f'Invalid or unknown symbol: {symbol}',
+                'http_code': 404
+            }
+        
+        latest_trading_day = ''
+        if data.get('t'):
+            latest_trading_day = datetime.fromtimestamp(int(data['t']), tz=timezone.utc).strftime('%Y-%m-%d')
+        
+        return self._build_stock_data(symbol, {
+            'price': data.get('c'),
+            'volume': 0,
+            'latest_trading_day': latest_trading_day,
+            'previous_close': data.get('pc'),
+            'change': data.get('d'),
+            'change_percent': f"{float(data.get('dp') or 0):.4f}%"
+        })
+
+class StubResponse:
+    """Respuesta HTTP en memoria con la interfaz que usan los adapters (json, iter_content, close)"""
+    
+    def __init__(self, payload=None, chunks=None, status_code=200):
+        self.payload = payload
+        self.chunks = chunks
+        self.status_code = status_code
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            error = requests.exceptions.HTTPError(f'HTTP error: {self.status_code}')
+            error.response = self
+            raise error
+    
+    def json(self):
+        return self.payload
+    
+    def iter_content(self, chunk_size=STREAM_CHUNK_SIZE):
+        if self.chunks is not None:
+            yield from self.chunks
+            return
+        
+        body = json.dumps(self.payload).encode('utf-8')
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+    
+    def close(self):
+        pass
+
+class StubProvider(AlphaVantageProvider):
+    """
+    Proveedor local que imita a Alpha Vantage sin red ni cuota
+    
+    Reproduce respuestas grabadas, inyecta latencia y payloads "Note" de rate
+    limit, y sintetiza cotizaciones (y series diarias) deterministas para
+    cualquier símbolo. Como hereda el parseo de AlphaVantageProvider, los
+    benchmarks ejercitan el mismo código que producción.
+    """
+    
+    name = 'stub'
+    requires_api_key = False
+    
+    def __init__(self, recordings=None, latency_ms=0, jitter_ms=0, rate_limit_per_minute=0,
+                 rate_limit_probability=0.0, synthesize=True, bulk_enabled=False,
+                 history_days=5000, seed=0):
+        super().__init__(api_key='stub', url='stub://alphavantage', bulk_enabled=bulk_enabled)
+        self.recordings = recordings or {}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.rate_limit_probability = rate_limit_probability
+        self.synthesize = synthesize
+        self.history_days = history_days
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.call_times = []
+        self.replay_positions = {}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'replayed': 0, 'synthesized': 0}
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def from_env(cls):
+        recordings_path = os.environ.get('STUB_RECORDINGS', '')
+        return cls(
+            recordings=load_recordings(recordings_path) if recordings_path else None,
+            latency_ms=float(os.environ.get('STUB_LATENCY_MS', '0')),
+            jitter_ms=float(os.environ.get('STUB_JITTER_MS', '0')),
+            rate_limit_per_minute=int(os.environ.get('STUB_RATE_LIMIT_PER_MINUTE', '0')),
+            rate_limit_probability=float(os.environ.get('STUB_RATE_LIMIT_PROBABILITY', '0')),
+            synthesize=os.environ.get('STUB_SYNTHESIZE', 'true').lower() == 'true',
+            bulk_enabled=os.environ.get('STUB_BULK', 'false').lower() == 'true',
+            history_days=int(os.environ.get('STUB_HISTORY_DAYS', '5000')),
+            seed=int(os.environ.get('STUB_SEED', '0'))
+        )
+    
+    def _rate_limited(self):
+        """Decidir si esta llamada recibe el payload "Note" (ventana de 60s o probabilidad)"""
+        with self.lock:
+            now = time.monotonic()
+            self.call_times = [t for t in self.call_times if now - t < 60]
+            
+            limited = bool(self.rate_limit_per_minute) and len(self.call_times) >= self.rate_limit_per_minute
+            if not limited and self.rate_limit_probability:
+                limited = self.random.random() < self.rate_limit_probability
+            
+            if limited:
+                self.stats['rate_limited'] += 1
+            else:
+                self.call_times.append(now)
+            return limited
+    
+    def _sleep(self, timeout=None):
+        """Simular la latencia; False si supera el read timeout (después de esperarlo)"""
+        delay = self.latency_ms / 1000.0
+        if self.jitter_ms:
+            with self.lock:
+                delay += self.random.uniform(0, self.jitter_ms) / 1000.0
+        
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and delay > read_timeout:
+            time.sleep(read_timeout)
+            return False
+        
+        if delay > 0:
+            time.sleep(delay)
+        return True
+    
+    def _send(self, params, label, stream=False, timeout=None):
+        with self.lock:
+            self.stats['requests'] += 1
+        
+        if not self._sleep(timeout):
+            return None, {
+                'error': 'timeout',
+                'message': f'Request timeout for {label}',
+                'http_code': 504
+            }
+        
+        if self._rate_limited():
+            return StubResponse({
+                'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency '
+                        'is 5 calls per minute and 500 calls per day.'
+            }), None
+        
+        function = params.get('function')
+        symbol = params.get('symbol', '')
+        
+        if function == 'GLOBAL_QUOTE':
+            return StubResponse(self._quote_payload(symbol)), None
+        
+        if function == 'REALTIME_BULK_QUOTES':
+            rows = []
+            for bulk_symbol in symbol.split(','):
+                quote = self._quote_payload(bulk_symbol).get('Global Quote')
+                if quote:
+                    day = quote.get('07. latest trading day')
+                    rows.append({
+                        'symbol': quote.get('01. symbol', bulk_symbol),
+                        'timestamp': f'{day} 16:00:00' if day else '',
+                        'close': quote.get('05. price'),
+                        'volume': quote.get('06. volume'),
+                        'previous_close': quote.get('08. previous close'),
+                        'change': quote.get('09. change'),
+                        'change_percent': quote.get('10. change percent')
+                    })
+            return StubResponse({'endpoint': 'Realtime Bulk Quotes', 'data': rows}), None
+        
+        if function == 'TIME_SERIES_DAILY':
+            days = 100 if params.get('outputsize') == 'compact' else self.history_days
+            return StubResponse(chunks=self._series_chunks(symbol, days)), None
+        
+        return StubResponse({'Error Message': f'Invalid API call: {function}'}), None
+    
+    def _quote_payload(self, symbol):
+        """Siguiente respuesta grabada del símbolo o una cotización sintética"""
+        with self.lock:
+            recorded = self.recordings.get(symbol)
+            if recorded:
+                position = self.replay_positions.get(symbol, 0)
+                self.replay_positions[symbol] = position + 1
+                self.stats['replayed'] += 1
+                return recorded[position % len(recorded)]
+        
+        if not self.synthesize:
+            return {'Global Quote': {}}
+        
+        with self.lock:
+            self.stats['synthesized'] += 1
+        return synthetic_quote(symbol, self.seed)
+    
+    def _series_chunks(self, symbol, days):
+        """Serie diaria sintética generada por trozos (del día más reciente al más antiguo)"""
+        rng = random.Random(f'{self.seed}:{symbol}:series')
+        price = 20 + rng.random() * 480
+        day = datetime.now(timezone.utc).date()
+        
+        yield b'{"Meta Data": {"2. Symbol": "' + symbol.encode() + b'"}, "Time Series (Daily)": {'
+        
+        for i in range(days):
+            close = round(price, 4)
+            candle = {
+                '1. open': f'{close * (1 + rng.uniform(-0.01, 0.01)):.4f}',
+                '2. high': f'{close * 1.015:.4f}',
+                '3. low': f'{close * 0.985:.4f}',
+                '4. close': f'{close:.4f}',
+                '5. volume': str(rng.randint(100000, 50000000))
+            }
+            prefix = b', ' if i else b''
+            yield prefix + json.dumps(day.isoformat()).encode() + b': ' + json.dumps(candle).encode()
+            
+            price = max(1.0, price * (1 + rng.gauss(0, 0.015)))
+            day -= timedelta(days=1)
+        
+        yield b'}}'
+
+def synthetic_quote(symbol, seed=0):
+    """GLOBAL_QUOTE determinista por símbolo y día (mismo payload dentro de un día)"""
+    today = datetime.now(timezone.utc).date().isoformat()
+    rng = random.Random(f'{seed}:{symbol}:{today}')
+    previous_close = 20 + rng.random() * 480
+    change = previous_close * rng.gauss(0, 0.015)
+    price = previous_close + change
+    
+    return {
+        'Global Quote': {
+            '01. symbol': symbol,
+            '05. price': f'{price:.4f}',
+            '06. volume': str(rng.randint(100000, 50000000)),
+            '07. latest trading day': today,
+            '08. previous close': f'{previous_close:.4f}',
+            '09. change': f'{change:.4f}',
+            '10. change percent': f'{change / previous_close * 100:.4f}%'
+        }
+    }
+
+def recording_from_lambda_detail(detail):
+    """Convertir un detalle grabado de la Lambda (test*.json) en payload de Alpha Vantage"""
+    if detail.get('status') in ('success', 'unchanged'):
+        price = float(detail['price'])
+        change = float(detail.get('change', 0))
+        return {
+            'Global Quote': {
+                '01. symbol': detail['symbol'],
+                '05. price': str(price),
+                '06. volume': str(detail.get('volume', 0)),
+                '07. latest trading day': detail.get('latest_trading_day', ''),
+                '08. previous close': str(round(price - change, 4)),
+                '09. change': str(change),
+                '10. change percent': f"{detail.get('change_percent', 0)}%"
+            }
+        }
+    
+    error = detail.get('error')
+    if error == 'rate_limit':
+        return {'Note': detail.get('message', 'API call frequency exceeded')}
+    if error == 'invalid_symbol':
+        return {'Error Message': detail.get('message', 'Invalid API call')}
+    if error == 'invalid_data':
+        return {'Global Quote': {'01. symbol': detail['symbol'], '05. price': '0'}}
+    return {}
+
+def load_recordings(path):
+    """
+    Cargar respuestas grabadas desde un archivo JSON o un directorio de archivos
+    
+    Formatos aceptados por archivo:
+      - {"SYMBOL": [payload, ...]} (grabación de AlphaVantageProvider.record_to)
+      - payload crudo de Alpha Vantage con "Global Quote"
+      - respuesta de la Lambda ({"statusCode", "body"}) con 'data' o 'details'
+    
+    Returns:
+        dict: {symbol: [payload de Alpha Vantage, ...]}
+    """
+    files = [path]
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json')
+        )
+    
+    recordings = {}
+    
+    for file_path in files:
+        try:
+            with open(file_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping recording {file_path}: {str(e)}")
+            continue
+        
+        if isinstance(data, dict) and 'statusCode' in data:
+            try:
+                body = json.loads(data.get('body') or '{}')
+            except ValueError:
+                continue
+            details = body.get('details') or ([body['data']] if 'data' in body else [])
+            for detail in details:
+                if detail.get('symbol'):
+                    recordings.setdefault(detail['symbol'], []).append(recording_from_lambda_detail(detail))
+        
+        elif isinstance(data, dict) and 'Global Quote' in data:
+            symbol = data['Global Quote'].get('01. symbol')
+            if symbol:
+                recordings.setdefault(symbol, []).append(data)
+        
+        elif isinstance(data, dict):
+            for symbol, payloads in data.items():
+                if isinstance(payloads, list) and payloads and all(isinstance(p, dict) for p in payloads):
+                    recordings.setdefault(symbol, []).extend(payloads)
+    
+    print(f"📼 Loaded recordings for {len(recordings)} symbols from {path}")
+    return recordings
+
+# Registro de proveedores disponibles (PROVIDER env var)
+PROVIDERS = {
+    'alpha_vantage': lambda: AlphaVantageProvider(
+        ALPHA_VANTAGE_API_KEY,
+        bulk_enabled=ALPHA_VANTAGE_BULK_QUOTES,
+        record_to=os.environ.get('RECORD_RESPONSES_TO') or None
+    ),
+    'finnhub': lambda: FinnhubProvider(FINNHUB_API_KEY),
+    'stub': StubProvider.from_env
+}
+
+provider = PROVIDERS.get(PROVIDER_NAME, PROVIDERS['alpha_vantage'])()
@@ -0,0 +1,395 @@
+"""
+Caché de cotizaciones con coalescing y stale-while-revalidate para POST /stock/fetch
+"""
+
+import json
+from botocore.exceptions import BotoCoreError, ClientError
+from decimal import Decimal
+from datetime import datetime, timezone
+import math
+import os
+import threading
+import time
+import uuid
+
+import resources
+from resources import get_lambda_client, WORKER_FUNCTION_NAME
+from deadline import elapsed_ms
+from rate_limiter import provider_rate_limiter
+from market import market_calendar
+from persistence import get_latest_item
+from ingestion import process_symbol
+
+# ==================== CONFIGURACIÓN ====================
+# Caché de cotizaciones para POST /stock/fetch/{symbol} (0 = sin caché)
+QUOTE_CACHE_TTL_SECONDS = int(os.environ.get('QUOTE_CACHE_TTL_SECONDS', '60'))
+QUOTE_CACHE_SHARED = os.environ.get('QUOTE_CACHE_SHARED', 'true').lower() == 'true'
+QUOTE_LEASE_SECONDS = int(os.environ.get('QUOTE_LEASE_SECONDS', '15'))
+QUOTE_COALESCE_WAIT_MS = int(os.environ.get('QUOTE_COALESCE_WAIT_MS', '5000'))
+
+# Stale-while-revalidate: responder con el último precio guardado y refrescar en segundo plano
+QUOTE_SWR = os.environ.get('QUOTE_SWR', 'false').lower() == 'true'
+QUOTE_STALE_MAX_SECONDS = int(os.environ.get('QUOTE_STALE_MAX_SECONDS', '900'))
+QUOTE_REVALIDATE_MODE = os.environ.get('QUOTE_REVALIDATE_MODE', 'lambda')  # lambda | local
+
+# ==================== QUOTE CACHE ====================
+
+class QuoteCache:
+    """
+    Caché de cotizaciones por símbolo con TTL y single-flight
+    
+    Dos niveles: un dict en memoria (por contenedor) y un item compartido en
+    la tabla de estado (QUOTE#<symbol> / CACHE) para que los contenedores
+    reutilicen el fetch de otro. El single-flight también tiene dos niveles:
+    un Event por símbolo entre threads y un lease condicional
+    (QUOTE#<symbol> / LEASE) entre contenedores.
+    
+    Si la tabla de estado falla, la caché sigue solo en memoria (como el
+    ledger de cuota con su bucket local): una lectura fallida es un miss, la
+    escritura es best effort y sin lease el contenedor hace el fetch.
+    """
+    
+    def __init__(self, ttl_seconds, target_table=None, lease_seconds=QUOTE_LEASE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.table = target_table
+        self.lease_seconds = lease_seconds
+        self.entries = {}
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.owner = uuid.uuid4().hex
+    
+    @staticmethod
+    def key(symbol, kind):
+        return {'pk': f'QUOTE#{symbol}', 'sk': kind}
+    
+    def get(self, symbol, shared=True):
+        """
+        Cotización en caché si no superó el TTL (shared=False: solo memoria)
+        
+        Returns:
+            tuple or None: (stock_data, age_seconds, tier) - tier 'memory' o 'shared'
+        """
+        now = time.time()
+        
+        with self.lock:
+            entry = self.entries.get(symbol)
+        if entry and now - entry[1] <= self.ttl_seconds:
+            return entry[0], round(now - entry[1], 1), 'memory'
+        
+        if self.table is None or not shared:
+            return None
+        
+        try:
+            item = self.table.get_item(Key=self.key(symbol, 'CACHE'), ConsistentRead=True).get('Item')
+        except (ClientError, BotoCoreError) as e:
+            print(f"⚠️ Shared quote cache unavailable for {symbol}, using memory only: {str(e)}")
+            return None
+        
+        if not item or now - float(item['fetched_at']) > self.ttl_seconds:
+            return None
+        
+        stock_data = json.loads(item['quote'], parse_float=Decimal)
+        fetched_at = float(item['fetched_at'])
+        with self.lock:
+            self.entries[symbol] = (stock_data, fetched_at)
+        
+        return stock_data, round(now - fetched_at, 1), 'shared'
+    
+    def put(self, symbol, stock_data, fetched_at=None):
+        """Guardar una cotización recién obtenida en ambos niveles"""
+        fetched_at = fetched_at or time.time()
+        
+        with self.lock:
+            self.entries[symbol] = (stock_data, fetched_at)
+        
+        if self.table is None:
+            return
+        
+        try:
+            self.table.put_item(Item=dict(
+                self.key(symbol, 'CACHE'),
+                quote=json.dumps(stock_data, default=float),
+                fetched_at=Decimal(str(round(fetched_at, 3))),
+                expires_at=int(fetched_at) + self.ttl_seconds + 3600
+            ))
+        except (ClientError, BotoCoreError) as e:
+            print(f"⚠️ Shared quote cache not updated for {symbol}: {str(e)}")
+    
+    def begin(self, symbol):
+        """
+        Entrar al single-flight del símbolo en este contenedor
+        
+        Returns:
+            tuple: (event: threading.Event, leader: bool)
+        """
+        with self.lock:
+            event = self.inflight.get(symbol)
+            if event is not None:
+                return event, False
+            event = self.inflight[symbol] = threading.Event()
+            return event, True
+    
+    def end(self, symbol):
+        with self.lock:
+            event = self.inflight.pop(symbol, None)
+        if event is not None:
+            event.set()
+    
+    def acquire_lease(self, symbol):
+        """
+        Tomar el lease compartido del símbolo (PutItem condicional)
+        
+        Returns:
+            bool: True si este contenedor debe hacer el fetch (también si la
+            tabla de estado falla: el fetch no depende del lease)
+        """
+        if self.table is None:
+            return True
+        
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item=dict(self.key(symbol, 'LEASE'), owner=self.owner, expires_at=now + self.lease_seconds),
+                ConditionExpression='attribute_not_exists(pk) OR expires_at < :now',
+                ExpressionAttributeValues={':now': now}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            print(f"⚠️ Quote lease unavailable for {symbol}, fetching as leader: {str(e)}")
+            return True
+        except BotoCoreError as e:
+            print(f"⚠️ Quote lease unavailable for {symbol}, fetching as leader: {str(e)}")
+            return True
+    
+    def release_lease(self, symbol):
+        if self.table is None:
+            return
+        
+        try:
+            self.table.delete_item(
+                Key=self.key(symbol, 'LEASE'),
+                ConditionExpression='#owner = :owner',
+                ExpressionAttributeNames={'#owner': 'owner'},
+                ExpressionAttributeValues={':owner': self.owner}
+            )
+        except (ClientError, BotoCoreError):
+            # El lease expiró y lo tomó otro contenedor (o la tabla no responde: expira solo)
+            pass
+    
+    def wait_for(self, symbol, wait_ms):
+        """Esperar a que otro contenedor publique la cotización (polling del nivel compartido)"""
+        deadline = time.monotonic() + wait_ms / 1000
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            hit = self.get(symbol)
+            if hit:
+                return hit
+        return None
+
+quote_cache = QuoteCache(
+    QUOTE_CACHE_TTL_SECONDS,
+    resources.state_table if QUOTE_CACHE_SHARED else None
+)
+
+def cached_detail(symbol, stock_data, timings):
+    """Detalle de respuesta para una cotización servida desde caché (sin escritura)"""
+    return {
+        'symbol': symbol,
+        'status': 'cached',
+        'price': float(stock_data['price']),
+        'change': float(stock_data['change']),
+        'change_percent': stock_data['change_percent'],
+        'latest_trading_day': stock_data['latest_trading_day'],
+        'timings': timings
+    }
+
+def fetch_symbol_cached(symbol, rate_limiter=None, deadline=None):
+    """
+    Fetch + save de un símbolo a través de la caché de cotizaciones
+    
+    Dentro del TTL se responde desde caché sin llamar al proveedor ni
+    escribir. Si no, solo el líder del single-flight hace el fetch; los demás
+    requests (threads del contenedor u otros contenedores con el lease tomado)
+    esperan su resultado hasta QUOTE_COALESCE_WAIT_MS y luego hacen su propio
+    fetch como fallback.
+    
+    Returns:
+        tuple: (detail, stock_data, cache_info) - cache_info {'served_from', 'age_seconds', 'ttl_seconds'}
+    """
+    start = time.perf_counter()
+    
+    def served(stock_data, age, served_from):
+        timings = {'total_ms': elapsed_ms(start)}
+        return cached_detail(symbol, stock_data, timings), stock_data, {
+            'served_from': served_from,
+            'age_seconds': age,
+            'ttl_seconds': quote_cache.ttl_seconds
+        }
+    
+    if quote_cache.ttl_seconds <= 0:
+        detail, stock_data = process_symbol(symbol, rate_limiter, deadline=deadline, hedge=True)
+        return detail, stock_data, {'served_from': 'provider', 'age_seconds': 0, 'ttl_seconds': 0}
+    
+    hit = quote_cache.get(symbol)
+    if hit:
+        return served(*hit)
+    
+    event, leader = quote_cache.begin(symbol)
+    if not leader:
+        event.wait(QUOTE_COALESCE_WAIT_MS / 1000)
+        hit = quote_cache.get(symbol)
+        if hit:
+            return served(hit[0], hit[1], 'coalesced')
+        detail, stock_data = process_symbol(symbol, rate_limiter, deadline=deadline, hedge=True)
+        return detail, stock_data, {'served_from': 'provider', 'age_seconds': 0, 'ttl_seconds': quote_cache.ttl_seconds}
+    
+    try:
+        if not quote_cache.acquire_lease(symbol):
+            hit = quote_cache.wait_for(symbol, QUOTE_COALESCE_WAIT_MS)
+            if hit:
+                return served(hit[0], hit[1], 'coalesced')
+            print(f"⏳ Lease for {symbol} not released in time, fetching anyway")
+        
+        try:
+            detail, stock_data = process_symbol(symbol, rate_limiter, deadline=deadline, hedge=True)
+            if detail['status'] in ('success', 'unchanged'):
+                quote_cache.put(symbol, stock_data)
+        finally:
+            quote_cache.release_lease(symbol)
+    finally:
+        quote_cache.end(symbol)
+    
+    return detail, stock_data, {'served_from': 'provider', 'age_seconds': 0, 'ttl_seconds': quote_cache.ttl_seconds}
+
+# ==================== STALE-WHILE-REVALIDATE ====================
+
+# Último refresh en segundo plano disparado por símbolo (time.monotonic)
+revalidations = {}
+revalidations_lock = threading.Lock()
+
+def get_latest_stored_quote(symbol):
+    """
+    Última cotización guardada del símbolo (GetItem del item LATEST)
+    
+    Returns:
+        tuple or None: (stock_data, stored_at epoch seconds)
+    """
+    item = get_latest_item(symbol)
+    if not item:
+        return None
+    
+    stock_data = {
+        'symbol': symbol,
+        'price': float(item['price']),
+        'volume': int(item.get('volume', 0)),
+        'change': float(item.get('change', 0)),
+        'change_percent': str(item.get('change_percent', '0')),
+        'latest_trading_day': item.get('latest_trading_day'),
+        'source': item.get('source', 'alpha_vantage')
+    }
+    return stock_data, int(item.get('as_of', item['timestamp']))
+
+def is_stale(stored_at, now):
+    """
+    Más viejo que el TTL de la caché, salvo que se haya guardado después del
+    último cierre con el mercado todavía cerrado (el precio no cambió desde entonces)
+    """
+    if now - stored_at <= quote_cache.ttl_seconds:
+        return False
+    
+    market = market_calendar.status(datetime.fromtimestamp(now, timezone.utc))
+    return market['is_open'] or stored_at < datetime.fromisoformat(market['last_close']).timestamp()
+
+def schedule_revalidation(symbol):
+    """
+    Refrescar el símbolo en segundo plano, como mucho una vez por TTL y contenedor
+    
+    En modo 'lambda' es un self-invoke asíncrono ({"mode": "revalidate"}); en
+    'local' (o sin WORKER_FUNCTION_NAME) un thread del proceso.
+    
+    Returns:
+        bool: True si se disparó el refresh
+    """
+    now = time.monotonic()
+    with revalidations_lock:
+        if now - revalidations.get(symbol, -math.inf) < max(1, quote_cache.ttl_seconds):
+            return False
+        revalidations[symbol] = now
+    
+    if QUOTE_REVALIDATE_MODE == 'local' or not WORKER_FUNCTION_NAME:
+        threading.Thread(target=revalidate_symbol, args=(symbol,), daemon=True).start()
+        return True
+    
+    try:
+        get_lambda_client().invoke(
+            FunctionName=WORKER_FUNCTION_NAME,
+            InvocationType='Event',
+            Payload=json.dumps({'mode': 'revalidate', 'symbol': symbol}).encode('utf-8')
+        )
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not schedule revalidation for {symbol}: {str(e)}")
+        with revalidations_lock:
+            revalidations.pop(symbol, None)
+        return False
+
+def revalidate_symbol(symbol, deadline=None):
+    """
+    Refresh en segundo plano: pasa por la caché y el lease, así que varios
+    disparos del mismo símbolo terminan en un solo fetch al proveedor
+    
+    Returns:
+        dict: {'symbol', 'status', 'cache', ...}
+    """
+    detail, _, cache_info = fetch_symbol_cached(symbol, provider_rate_limiter, deadline)
+    print(f"🔄 Revalidated {symbol}: {detail['status']} ({cache_info['served_from']})")
+    return dict(detail, cache=cache_info)
+
+def fetch_symbol_swr(symbol, rate_limiter=None, deadline=None):
+    """
+    Stale-while-revalidate para POST /stock/fetch/{symbol}
+    
+    Responde con la cotización de la caché en memoria o, si no hay, con el
+    último item guardado (una lectura de DynamoDB) mientras tenga menos de
+    QUOTE_STALE_MAX_SECONDS; si ya pasó el TTL, dispara el refresh en segundo
+    plano. Sin dato guardado o demasiado viejo, hace el fetch normal.
+    
+    Returns:
+        tuple: (detail, stock_data, cache_info) - cache_info incluye 'stale' y 'revalidating'
+    """
+    start = time.perf_counter()
+    
+    hit = quote_cache.get(symbol, shared=False)
+    if hit:
+        stock_data, age, tier = hit
+        return cached_detail(symbol, stock_data, {'total_ms': elapsed_ms(start)}), stock_data, {
+            'served_from': tier,
+            'age_seconds': age,
+            'ttl_seconds': quote_cache.ttl_seconds,
+            'stale': False,
+            'revalidating': False
+        }
+    
+    try:
+        stored = get_latest_stored_quote(symbol)
+    except Exception as e:
+        print(f"⚠️ Stored quote lookup failed for {symbol}: {str(e)}")
+        stored = None
+    
+    now = time.time()
+    if stored and now - stored[1] <= QUOTE_STALE_MAX_SECONDS:
+        stock_data, stored_at = stored
+        stale = is_stale(stored_at, now)
+        revalidating = schedule_revalidation(symbol) if stale else False
+        return cached_detail(symbol, stock_data, {'total_ms': elapsed_ms(start)}), stock_data, {
+            'served_from': 'stored',
+            'age_seconds': round(now - stored_at, 1),
+            'ttl_seconds': quote_cache.ttl_seconds,
+            'stale': stale,
+            'revalidating': revalidating
+        }
+    
+    detail, stock_data, cache_info = fetch_symbol_cached(symbol, rate_limiter, deadline)
+    return detail, stock_data, dict(cache_info, stale=False, revalidating=False)
@@ -0,0 +1,372 @@
+"""
+Rate limiting del proveedor: token bucket local, ledger de cuota compartido
+en DynamoDB y cola de prioridad por lane (interactive / scheduled)
+"""
+
+from botocore.exceptions import ClientError
+from decimal import Decimal
+from collections import deque
+import math
+import os
+import random
+import threading
+import time
+
+import resources
+from providers import PROVIDER_NAME
+
+# ==================== CONFIGURACIÓN ====================
+# Presupuesto del proveedor (calls/min), compartido por todos los lanes
+PROVIDER_CALLS_PER_MINUTE = int(os.environ.get('PROVIDER_CALLS_PER_MINUTE', '5'))
+
+# Ledger de cuota compartido en DynamoDB (un token bucket por API key); activo si hay tabla de estado
+QUOTA_LEDGER = os.environ.get('QUOTA_LEDGER', 'true').lower() == 'true'
+QUOTA_INTERACTIVE_SHARE = float(os.environ.get('QUOTA_INTERACTIVE_SHARE', '0.2'))
+
+# Cola de prioridad por lane: aging de la ingesta programada y ventana de métricas
+LANE_AGING_SECONDS = float(os.environ.get('LANE_AGING_SECONDS', '30'))
+LANE_STATS_WINDOW = int(os.environ.get('LANE_STATS_WINDOW', '500'))
+
+# ==================== RATE LIMITER ====================
+
+class TokenBucket:
+    """
+    Token bucket thread-safe para respetar el límite de llamadas del proveedor
+    
+    capacity tokens como máximo (ráfaga), recargados a rate tokens/segundo
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def try_acquire(self, aged=False):
+        """
+        Tomar un token sin bloquear
+        
+        Returns:
+            float: 0.0 si se tomó el token, o segundos hasta el próximo
+        """
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+    
+    def acquire(self, max_wait=None):
+        """
+        Bloquear hasta obtener un token
+        
+        Args:
+            max_wait: Segundos máximos de espera (None = sin límite)
+        
+        Returns:
+            float: Segundos esperados, o None si el token no llega dentro de max_wait
+        """
+        waited = 0.0
+        while True:
+            wait_time = self.try_acquire()
+            if wait_time == 0:
+                return waited
+            
+            if max_wait is not None and waited + wait_time > max_wait:
+                return None
+            
+            time.sleep(wait_time)
+            waited += wait_time
+
+class QuotaLedger:
+    """
+    Token bucket del proveedor guardado en la tabla de estado (QUOTA / <provider>)
+    
+    Todos los contenedores (API Gateway, EventBridge, workers de fan-out)
+    descuentan del mismo item: se lee con ConsistentRead, se recalcula el
+    refill con el reloj de pared y se escribe con un PutItem condicional sobre
+    updated_at (optimistic locking); si otro contenedor escribió antes, se
+    reintenta. El lane 'scheduled' no puede bajar de reserved tokens, que
+    quedan para el lane 'interactive'. Misma interfaz que TokenBucket.
+    
+    Un fetch interactivo que tiene que esperar lo anuncia en priority_until y,
+    hasta entonces, el lane 'scheduled' de cualquier contenedor le cede los
+    tokens (salvo que su espera ya haya envejecido, ver LaneScheduler).
+    
+    Si DynamoDB falla, la llamada usa el bucket local (fallback) para no
+    bloquear la ingesta.
+    """
+    
+    def __init__(self, target_table, key, rate, capacity, reserved=0, lane='scheduled', fallback=None):
+        self.table = target_table
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self.reserved = reserved
+        self.lane = lane
+        self.fallback = fallback or TokenBucket(rate, capacity)
+        # Un round-trip a la vez por contenedor (los resources de boto3 no son thread-safe)
+        self.lock = threading.Lock()
+        self.stats = {'acquired': 0, 'conflicts': 0, 'fallbacks': 0, 'ceded': 0}
+    
+    def _write(self, item, new_item):
+        """PutItem condicional; False si otro contenedor escribió antes"""
+        try:
+            if item is None:
+                self.table.put_item(Item=new_item, ConditionExpression='attribute_not_exists(pk)')
+            else:
+                self.table.put_item(
+                    Item=new_item,
+                    ConditionExpression='updated_at = :previous',
+                    ExpressionAttributeValues={':previous': item['updated_at']}
+                )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            self.stats['conflicts'] += 1
+            return False
+    
+    def _try_take(self, aged=False):
+        """
+        Returns:
+            float: 0.0 si se tomó el token, o segundos hasta reintentar
+        """
+        with self.lock:
+            now = time.time()
+            item = self.table.get_item(Key=self.key, ConsistentRead=True).get('Item')
+            
+            if item is None:
+                tokens = float(self.capacity)
+                priority_until = 0.0
+            else:
+                elapsed = max(0.0, now - float(item['updated_at']))
+                tokens = min(self.capacity, float(item['tokens']) + elapsed * self.rate)
+                priority_until = float(item.get('priority_until', 0))
+            
+            if self.lane == 'scheduled' and not aged and priority_until > now:
+                self.stats['ceded'] += 1
+                return priority_until - now
+            
+            floor = 1 + (self.reserved if self.lane == 'scheduled' else 0)
+            if tokens < floor:
+                wait_time = (floor - tokens) / self.rate
+                if self.lane == 'interactive' and item is not None and priority_until < now + wait_time:
+                    # Anunciar la espera sin tocar tokens ni updated_at
+                    self._write(item, dict(item, priority_until=Decimal(str(round(now + wait_time + 1, 3)))))
+                return wait_time
+            
+            new_item = dict(
+                self.key,
+                tokens=Decimal(str(round(tokens - 1, 6))),
+                updated_at=Decimal(str(round(now, 6))),
+                last_lane=self.lane
+            )
+            if self.lane == 'scheduled' and priority_until > now:
+                new_item['priority_until'] = item['priority_until']
+            
+            if not self._write(item, new_item):
+                return random.uniform(0.005, 0.05)
+            
+            self.stats['acquired'] += 1
+            return 0.0
+    
+    def try_acquire(self, aged=False):
+        """
+        Tomar un token del ledger sin bloquear
+        
+        Args:
+            aged: La espera del caller ya envejeció (el lane 'scheduled' deja de ceder)
+        
+        Returns:
+            float: 0.0 si se tomó el token, o segundos hasta reintentar
+        """
+        try:
+            return self._try_take(aged)
+        except Exception as e:
+            print(f"⚠️ Quota ledger unavailable, using local bucket: {str(e)}")
+            self.stats['fallbacks'] += 1
+            return self.fallback.try_acquire()
+    
+    def acquire(self, max_wait=None):
+        """
+        Bloquear hasta obtener un token del ledger
+        
+        Returns:
+            float: Segundos esperados, o None si el token no llega dentro de max_wait
+        """
+        waited = 0.0
+        while True:
+            wait_time = self.try_acquire()
+            if wait_time == 0:
+                return waited
+            
+            if max_wait is not None and waited + wait_time > max_wait:
+                return None
+            
+            time.sleep(wait_time)
+            waited += wait_time
+
+class LaneScheduler:
+    """
+    Cola de prioridad delante del rate limiter del proveedor
+    
+    Todos los threads que piden un token esperan en una sola cola y solo el
+    primero (menor prioridad efectiva) intenta tomarlo: un fetch interactivo
+    pasa delante de la ingesta programada, que usa la capacidad que sobra.
+    La prioridad efectiva mejora un nivel por cada aging_seconds de espera,
+    así la ingesta no queda postergada indefinidamente. Guarda profundidad
+    de cola y tiempos de espera por lane.
+    """
+    
+    PRIORITIES = {'interactive': 0, 'scheduled': 1}
+    POLL_SECONDS = 1.0
+    
+    def __init__(self, limiters, aging_seconds=LANE_AGING_SECONDS, window=LANE_STATS_WINDOW):
+        self.limiters = limiters
+        self.aging_seconds = aging_seconds
+        self.waiting = []
+        self.sequence = 0
+        self.attempting = False
+        self.cond = threading.Condition()
+        self.stats = {
+            lane: {'granted': 0, 'timeouts': 0, 'max_depth': 0, 'waits_ms': deque(maxlen=window)}
+            for lane in limiters
+        }
+    
+    def _priority(self, ticket, now):
+        lane, enqueued_at, sequence = ticket
+        return (self.PRIORITIES[lane] - (now - enqueued_at) / self.aging_seconds, enqueued_at, sequence)
+    
+    def depth(self, lane):
+        return sum(1 for ticket in self.waiting if ticket[0] == lane)
+    
+    def acquire(self, lane, max_wait=None):
+        """
+        Esperar turno en la cola y tomar un token del limiter del lane
+        
+        El try_acquire del limiter (con el ledger, GetItem + PutItem
+        condicional) corre fuera de self.cond: el resto de los threads puede
+        encolarse mientras tanto, y un solo intento está en vuelo a la vez.
+        
+        Returns:
+            float: Segundos esperados, o None si el token no llega dentro de max_wait
+        """
+        start = time.monotonic()
+        
+        with self.cond:
+            self.sequence += 1
+            ticket = (lane, start, self.sequence)
+            self.waiting.append(ticket)
+            self.stats[lane]['max_depth'] = max(self.stats[lane]['max_depth'], self.depth(lane))
+            self.cond.notify_all()
+        
+        try:
+            while True:
+                with self.cond:
+                    now = time.monotonic()
+                    waited = now - start
+                    remaining = None if max_wait is None else max_wait - waited
+                    head = min(self.waiting, key=lambda t: self._priority(t, now))
+                    
+                    if head is not ticket or self.attempting:
+                        if remaining is not None and remaining <= 0:
+                            self.stats[lane]['timeouts'] += 1
+                            return None
+                        self.cond.wait(self.POLL_SECONDS if remaining is None else min(self.POLL_SECONDS, remaining))
+                        continue
+                    
+                    # Turno de este ticket: tomar el intento y soltar el lock
+                    self.attempting = True
+                
+                try:
+                    wait_time = self.limiters[lane].try_acquire(aged=waited >= self.aging_seconds)
+                finally:
+                    with self.cond:
+                        self.attempting = False
+                        self.cond.notify_all()
+                
+                with self.cond:
+                    waited = time.monotonic() - start
+                    remaining = None if max_wait is None else max_wait - waited
+                    if wait_time == 0:
+                        self.stats[lane]['granted'] += 1
+                        self.stats[lane]['waits_ms'].append(round(waited * 1000, 1))
+                        return waited
+                    if remaining is not None and wait_time > remaining:
+                        self.stats[lane]['timeouts'] += 1
+                        return None
+                    self.cond.wait(min(self.POLL_SECONDS, wait_time))
+        finally:
+            with self.cond:
+                self.waiting.remove(ticket)
+                self.cond.notify_all()
+    
+    def lane(self, name):
+        """Vista con la interfaz de TokenBucket (acquire/rate) para un lane"""
+        return SchedulerLane(self, name)
+    
+    def snapshot(self):
+        """
+        Returns:
+            dict: Por lane: depth actual, max_depth, granted, timeouts y espera p50/p95/max (ms)
+        """
+        with self.cond:
+            snapshot = {}
+            for lane, stats in self.stats.items():
+                waits = sorted(stats['waits_ms'])
+                snapshot[lane] = {
+                    'depth': self.depth(lane),
+                    'max_depth': stats['max_depth'],
+                    'granted': stats['granted'],
+                    'timeouts': stats['timeouts'],
+                    'wait_ms': {
+                        'p50': waits[len(waits) // 2] if waits else 0,
+                        'p95': waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0,
+                        'max': waits[-1] if waits else 0
+                    }
+                }
+            return snapshot
+
+class SchedulerLane:
+    """Un lane de LaneScheduler usable donde se espera un rate limiter"""
+    
+    def __init__(self, scheduler, name):
+        self.scheduler = scheduler
+        self.name = name
+        self.rate = scheduler.limiters[name].rate
+    
+    def acquire(self, max_wait=None):
+        return self.scheduler.acquire(self.name, max_wait)
+
+# Compartido entre invocaciones warm: el límite es por API key, no por invocación
+local_rate_limiter = TokenBucket(
+    rate=PROVIDER_CALLS_PER_MINUTE / 60.0,
+    capacity=PROVIDER_CALLS_PER_MINUTE
+)
+
+if QUOTA_LEDGER and resources.state_table is not None:
+    # Y entre contenedores: un ledger por API key con una parte reservada para API Gateway
+    QUOTA_KEY = {'pk': 'QUOTA', 'sk': PROVIDER_NAME}
+    QUOTA_RESERVED_TOKENS = math.ceil(PROVIDER_CALLS_PER_MINUTE * QUOTA_INTERACTIVE_SHARE)
+    scheduled_quota = QuotaLedger(
+        resources.state_table, QUOTA_KEY, PROVIDER_CALLS_PER_MINUTE / 60.0, PROVIDER_CALLS_PER_MINUTE,
+        reserved=QUOTA_RESERVED_TOKENS, lane='scheduled', fallback=local_rate_limiter
+    )
+    interactive_quota = QuotaLedger(
+        resources.state_table, QUOTA_KEY, PROVIDER_CALLS_PER_MINUTE / 60.0, PROVIDER_CALLS_PER_MINUTE,
+        reserved=QUOTA_RESERVED_TOKENS, lane='interactive', fallback=local_rate_limiter
+    )
+else:
+    scheduled_quota = interactive_quota = local_rate_limiter
+
+# Toda llamada al proveedor pasa por la cola de prioridad
+provider_scheduler = LaneScheduler({'interactive': interactive_quota, 'scheduled': scheduled_quota})
+provider_rate_limiter = provider_scheduler.lane('scheduled')
+interactive_rate_limiter = provider_scheduler.lane('interactive')
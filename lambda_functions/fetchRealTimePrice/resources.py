@@ -0,0 +1,55 @@
+"""
+Recursos AWS compartidos por los módulos de fetchRealTimePrice
+
+Tablas DynamoDB (FinancialData y la de estado operativo) y cliente Lambda.
+Los módulos las leen como resources.table / resources.get_table() para que
+load_test.py pueda reemplazarlas por tablas en memoria.
+"""
+
+import boto3
+import os
+import threading
+
+# ==================== CONFIGURACIÓN ====================
+TABLE_NAME = os.environ.get('TABLE_NAME', 'FinancialData')
+
+# Tabla de estado operativo (checkpoints, etc.): pk (S) + sk (S)
+STATE_TABLE_NAME = os.environ.get('STATE_TABLE_NAME', 'FinancialDataState')
+
+# Lambda que procesa los shards del fan-out y los refresh de stale-while-revalidate
+WORKER_FUNCTION_NAME = os.environ.get('WORKER_FUNCTION_NAME', os.environ.get('AWS_LAMBDA_FUNCTION_NAME', ''))
+
+# ==================== DYNAMODB ====================
+
+# Cliente DynamoDB
+try:
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.Table(TABLE_NAME)
+    state_table = dynamodb.Table(STATE_TABLE_NAME)
+except Exception as e:
+    print(f"❌ Error inicializando DynamoDB: {str(e)}")
+    table = None
+    state_table = None
+
+# Los resources de boto3 no son thread-safe: cada worker usa su propia Table
+_thread_local = threading.local()
+
+def get_table():
+    """Obtener la tabla DynamoDB del thread actual"""
+    if threading.current_thread() is threading.main_thread() or table is None:
+        return table
+    
+    if not hasattr(_thread_local, 'table'):
+        _thread_local.table = boto3.resource('dynamodb').Table(TABLE_NAME)
+    return _thread_local.table
+
+# ==================== LAMBDA ====================
+
+_lambda_client = None
+
+def get_lambda_client():
+    """Cliente Lambda para invocar workers (se crea en la primera invocación con fan-out)"""
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = boto3.client('lambda')
+    return _lambda_client
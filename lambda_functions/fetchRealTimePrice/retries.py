@@ -0,0 +1,221 @@
+"""
+Cola durable de reintentos de símbolos fallidos (backoff exponencial y dead-letter)
+"""
+
+from boto3.dynamodb.conditions import Key
+from datetime import datetime
+import os
+import random
+import threading
+import time
+
+import resources
+
+# ==================== CONFIGURACIÓN ====================
+# Cola de reintentos de símbolos fallidos (backoff exponencial con jitter)
+RETRY_QUEUE = os.environ.get('RETRY_QUEUE', 'true').lower() == 'true'
+RETRY_BASE_SECONDS = int(os.environ.get('RETRY_BASE_SECONDS', '300'))
+RETRY_MAX_SECONDS = int(os.environ.get('RETRY_MAX_SECONDS', '21600'))
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', '6'))
+RETRY_DRAIN_LIMIT = int(os.environ.get('RETRY_DRAIN_LIMIT', '50'))
+RETRY_DEAD_TTL_DAYS = int(os.environ.get('RETRY_DEAD_TTL_DAYS', '14'))
+
+# ==================== RETRY QUEUE ====================
+
+class RetryQueue:
+    """
+    Cola durable de símbolos fallidos: un item por símbolo (RETRY / <symbol>)
+    
+    Cada fallo transitorio suma un intento y agenda el próximo con backoff
+    exponencial y jitter (mitad fija, mitad aleatoria, para no volver a chocar
+    con el rate limit en el mismo tick). Al agotar max_attempts el item queda
+    en estado 'dead' hasta que expira o se reencola a mano. Sin tabla usa un
+    dict en memoria con la misma interfaz (tests, load_test).
+    """
+    
+    PK = 'RETRY'
+    # rate_limit / circuit_open van a DEFERRED y deadline_exceeded a CONTINUATION
+    RETRYABLE_ERRORS = frozenset([
+        'timeout', 'connection_error', 'http_error', 'request_error',
+        'parse_error', 'data_parse_error', 'database_error', 'internal_error'
+    ])
+    SUCCESS_STATUSES = frozenset(['success', 'cached', 'unchanged'])
+    
+    def __init__(self, target_table=None, base_seconds=RETRY_BASE_SECONDS, max_seconds=RETRY_MAX_SECONDS,
+                 max_attempts=RETRY_MAX_ATTEMPTS, dead_ttl_days=RETRY_DEAD_TTL_DAYS):
+        self.table = target_table
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.max_attempts = max_attempts
+        self.dead_ttl_seconds = dead_ttl_days * 86400
+        self.memory = {}
+        self.lock = threading.Lock()
+    
+    def items(self):
+        """
+        Returns:
+            dict: {symbol: item} de toda la cola (pendientes y dead)
+        """
+        if self.table is None:
+            with self.lock:
+                return {symbol: dict(item) for symbol, item in self.memory.items()}
+        
+        items = {}
+        kwargs = {'KeyConditionExpression': Key('pk').eq(self.PK)}
+        while True:
+            response = self.table.query(**kwargs)
+            for item in response.get('Items', []):
+                items[item['sk']] = item
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    def _put(self, item):
+        if self.table is None:
+            with self.lock:
+                self.memory[item['sk']] = item
+        else:
+            self.table.put_item(Item=item)
+    
+    def _delete(self, symbol):
+        if self.table is None:
+            with self.lock:
+                self.memory.pop(symbol, None)
+        else:
+            self.table.delete_item(Key={'pk': self.PK, 'sk': symbol})
+    
+    def backoff(self, attempts):
+        """Segundos hasta el próximo intento: cap/2 + uniform(0, cap/2), cap = base * 2^(n-1)"""
+        cap = min(self.max_seconds, self.base_seconds * 2 ** (attempts - 1))
+        return cap / 2 + random.uniform(0, cap / 2)
+    
+    def due(self, now=None, limit=RETRY_DRAIN_LIMIT):
+        """
+        Símbolos pendientes cuyo próximo intento ya venció, los más atrasados primero
+        
+        Returns:
+            list: Hasta limit símbolos
+        """
+        now = now or time.time()
+        pending = [
+            item for item in self.items().values()
+            if item.get('status') == 'pending' and int(item.get('next_attempt_at', 0)) <= now
+        ]
+        pending.sort(key=lambda item: int(item['next_attempt_at']))
+        return [item['sk'] for item in pending[:limit]]
+    
+    def settle(self, details, now=None):
+        """
+        Actualizar la cola con el resultado de un run
+        
+        Los símbolos que salieron bien se quitan de la cola; los que fallaron
+        con un error transitorio suman un intento (o pasan a 'dead').
+        
+        Returns:
+            dict: {'scheduled', 'cleared', 'dead'} - dead: símbolos que agotaron los intentos
+        """
+        now = now or time.time()
+        queued = self.items()
+        summary = {'scheduled': 0, 'cleared': 0, 'dead': []}
+        
+        for detail in details:
+            symbol = detail['symbol']
+            
+            if detail['status'] in self.SUCCESS_STATUSES:
+                if symbol in queued:
+                    self._delete(symbol)
+                    summary['cleared'] += 1
+                continue
+            
+            if detail['status'] != 'error' or detail.get('error') not in self.RETRYABLE_ERRORS:
+                continue
+            
+            previous = queued.get(symbol) or {}
+            attempts = int(previous.get('attempts', 0)) + 1
+            item = {
+                'pk': self.PK,
+                'sk': symbol,
+                'attempts': attempts,
+                'last_error': detail['error'],
+                'last_message': str(detail.get('message', ''))[:200],
+                'first_failed_at': previous.get('first_failed_at') or datetime.now().isoformat(),
+                'updated_at': datetime.now().isoformat()
+            }
+            
+            if attempts >= self.max_attempts:
+                item.update(status='dead', next_attempt_at=0, expires_at=int(now) + self.dead_ttl_seconds)
+                summary['dead'].append(symbol)
+                print(f"☠️ {symbol} moved to dead-letter after {attempts} attempts ({detail['error']})")
+            else:
+                next_attempt_at = int(now + self.backoff(attempts))
+                item.update(status='pending', next_attempt_at=next_attempt_at,
+                            expires_at=next_attempt_at + self.dead_ttl_seconds)
+                summary['scheduled'] += 1
+            
+            self._put(item)
+        
+        return summary
+    
+    def requeue(self, symbols):
+        """Devolver símbolos (p.ej. dead) a la cola con el contador en cero"""
+        now = int(time.time())
+        for symbol in symbols:
+            self._put({
+                'pk': self.PK,
+                'sk': symbol,
+                'attempts': 0,
+                'status': 'pending',
+                'next_attempt_at': now,
+                'updated_at': datetime.now().isoformat(),
+                'expires_at': now + self.dead_ttl_seconds
+            })
+    
+    def snapshot(self, now=None):
+        now = now or time.time()
+        items = self.items().values()
+        pending = [item for item in items if item.get('status') == 'pending']
+        return {
+            'pending': len(pending),
+            'due': sum(1 for item in pending if int(item.get('next_attempt_at', 0)) <= now),
+            'dead': sorted(item['sk'] for item in items if item.get('status') == 'dead'),
+            'items': sorted(
+                ({
+                    'symbol': item['sk'],
+                    'status': item.get('status'),
+                    'attempts': int(item.get('attempts', 0)),
+                    'next_attempt_at': int(item.get('next_attempt_at', 0)),
+                    'last_error': item.get('last_error')
+                } for item in items),
+                key=lambda entry: entry['symbol']
+            )
+        }
+
+retry_queue = RetryQueue(resources.state_table) if RETRY_QUEUE else None
+
+def settle_retry_queue(results):
+    """Volcar los fallos del run a la cola de reintentos (results['retry_queue'])"""
+    if retry_queue is None:
+        return results
+    
+    try:
+        results['retry_queue'] = retry_queue.settle(results['details'])
+        if results['retry_queue']['scheduled']:
+            print(f"🔁 {results['retry_queue']['scheduled']} failed symbols scheduled for retry")
+    except Exception as e:
+        print(f"⚠️ Could not update retry queue: {str(e)}")
+    
+    return results
+
+def take_due_retries():
+    """
+    Returns:
+        list: Símbolos de la cola cuyo reintento ya venció (vacío si no hay cola)
+    """
+    if retry_queue is None:
+        return []
+    
+    try:
+        return retry_queue.due()
+    except Exception as e:
+        print(f"⚠️ Could not read retry queue: {str(e)}")
+        return []
@@ -0,0 +1,140 @@
+"""
+Parseo incremental de series diarias grandes (TIME_SERIES_DAILY)
+"""
+
+import codecs
+import json
+import os
+
+# ==================== CONFIGURACIÓN ====================
+# Bytes leídos por trozo al parsear series en streaming
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', '65536'))
+
+# ==================== STREAMING PARSER ====================
+
+class TimeSeriesStreamParser:
+    """
+    Parser incremental para payloads {"...": {...}, "<series_key>": {"<fecha>": {...}, ...}}
+    
+    Recibe el body por trozos (feed) y genera los pares (fecha, valores) en
+    cuanto están completos, descartando lo ya consumido: la memoria depende
+    del tamaño de un trozo, no de la longitud del histórico.
+    """
+    
+    WHITESPACE = ' \t\n\r'
+    
+    def __init__(self, series_key):
+        self.marker = json.dumps(series_key)
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.in_series = False
+        self.done = False
+    
+    def feed(self, text):
+        # Descartar lo consumido antes de anexar (solo una vez dentro de la serie;
+        # antes se conserva todo para poder parsear un payload de error)
+        if self.in_series and self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        self.buffer += text
+    
+    def seek_series(self):
+        """Buscar el inicio del objeto de la serie; True cuando se encontró"""
+        if self.in_series:
+            return True
+        
+        index = self.buffer.find(self.marker)
+        if index == -1:
+            return False
+        
+        brace = self.buffer.find('{', index + len(self.marker))
+        if brace == -1:
+            return False
+        
+        self.pos = brace + 1
+        self.in_series = True
+        return True
+    
+    def _skip(self, chars):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in chars:
+            self.pos += 1
+    
+    def entries(self):
+        """Generar los pares (clave, valor) completos disponibles en el buffer"""
+        while self.in_series and not self.done:
+            self._skip(self.WHITESPACE + ',')
+            if self.pos >= len(self.buffer):
+                return
+            
+            if self.buffer[self.pos] == '}':
+                self.done = True
+                self.pos += 1
+                return
+            
+            try:
+                key, end = self.decoder.raw_decode(self.buffer, self.pos)
+                colon = end
+                while colon < len(self.buffer) and self.buffer[colon] in self.WHITESPACE:
+                    colon += 1
+                if colon >= len(self.buffer):
+                    return
+                if self.buffer[colon] != ':':
+                    raise ValueError(f'Malformed time series payload near offset {colon}')
+                
+                start = colon + 1
+                while start < len(self.buffer) and self.buffer[start] in self.WHITESPACE:
+                    start += 1
+                value, end = self.decoder.raw_decode(self.buffer, start)
+            except json.JSONDecodeError:
+                # Entrada incompleta: esperar al siguiente trozo
+                return
+            
+            self.pos = end
+            yield key, value
+
+class TimeSeriesStream:
+    """Conecta una respuesta HTTP (stream=True) con TimeSeriesStreamParser"""
+    
+    def __init__(self, response, series_key, chunk_size=STREAM_CHUNK_SIZE):
+        self.response = response
+        self.parser = TimeSeriesStreamParser(series_key)
+        self.chunks = response.iter_content(chunk_size=chunk_size)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.exhausted = False
+    
+    def _read(self):
+        """Leer un trozo más del body; False si ya no hay más"""
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.exhausted = True
+            self.parser.feed(self.decoder.decode(b'', final=True))
+            return False
+        
+        self.parser.feed(self.decoder.decode(chunk))
+        return True
+    
+    def open(self):
+        """Leer hasta el inicio de la serie; False si el body no la contiene"""
+        while not self.parser.seek_series():
+            if not self._read():
+                self.close()
+                return False
+        return True
+    
+    def entries(self):
+        """Generar (fecha, valores) leyendo del socket a medida que se consumen"""
+        try:
+            while True:
+                yield from self.parser.entries()
+                if self.parser.done:
+                    return
+                if self.exhausted:
+                    raise ValueError('Truncated time series payload')
+                self._read()
+        finally:
+            self.close()
+    
+    def close(self):
+        self.response.close()
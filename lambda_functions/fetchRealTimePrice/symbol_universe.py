@@ -0,0 +1,178 @@
+"""
+Validación de símbolos sin red: formato, universo local de símbolos
+listados y negative cache de rechazos del proveedor
+"""
+
+import bisect
+import csv
+import gzip
+import os
+import threading
+import time
+
+# Lambda Layer common-layer
+from financial_common.symbols import SYMBOL_WIDTH, validate_symbol_format
+
+from deadline import elapsed_ms
+
+# ==================== CONFIGURACIÓN ====================
+# Universo de símbolos (LISTING_STATUS de Alpha Vantage, .csv o .csv.gz) y negative cache
+SYMBOL_UNIVERSE_FILE = os.environ.get(
+    'SYMBOL_UNIVERSE_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'listing_status.csv')
+)
+NEGATIVE_CACHE_TTL_SECONDS = int(os.environ.get('NEGATIVE_CACHE_TTL_SECONDS', '86400'))
+# no_data puede ser transitorio (símbolo recién listado, payload inesperado): TTL corto
+NEGATIVE_CACHE_NO_DATA_TTL_SECONDS = int(os.environ.get('NEGATIVE_CACHE_NO_DATA_TTL_SECONDS', '300'))
+NEGATIVE_CACHE_MAX_SIZE = int(os.environ.get('NEGATIVE_CACHE_MAX_SIZE', '10000'))
+
+# ==================== VALIDACIONES ====================
+
+def validate_symbol(symbol):
+    """Validar formato de símbolo de acción"""
+    is_valid, symbol = validate_symbol_format(symbol)
+    if not is_valid:
+        return False, symbol
+    
+    # Sin red: índice local de símbolos listados y rechazos recientes del proveedor
+    if symbol_universe.contains(symbol) is False:
+        return False, f"Unknown symbol: {symbol}"
+    
+    if negative_cache.contains(symbol):
+        return False, f"Symbol {symbol} was rejected by the provider recently"
+    
+    return True, symbol
+
+# ==================== SYMBOL UNIVERSE ====================
+
+class PackedSymbols:
+    """
+    Símbolos ordenados en un único bytes de registros de ancho fijo
+    
+    Indexable y con len(), así que bisect hace la búsqueda binaria directo
+    sobre el blob (~5 bytes por símbolo en lugar de un str por símbolo).
+    """
+    
+    def __init__(self, symbols):
+        self.blob = b''.join(symbol.ljust(SYMBOL_WIDTH).encode('ascii') for symbol in sorted(set(symbols)))
+    
+    def __len__(self):
+        return len(self.blob) // SYMBOL_WIDTH
+    
+    def __getitem__(self, index):
+        start = index * SYMBOL_WIDTH
+        return self.blob[start:start + SYMBOL_WIDTH]
+    
+    def __contains__(self, symbol):
+        key = symbol.ljust(SYMBOL_WIDTH).encode('ascii')
+        index = bisect.bisect_left(self, key)
+        return index < len(self) and self[index] == key
+
+class SymbolUniverse:
+    """
+    Índice de los símbolos listados, cargado una vez por contenedor
+    
+    Acepta el CSV de LISTING_STATUS de Alpha Vantage (columna 'symbol' y, si
+    viene, 'status') o un símbolo por línea, opcionalmente en gzip. Sin
+    archivo no hay índice y contains() devuelve None (no se filtra).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.symbols = None
+        self.loaded = False
+        self.lock = threading.Lock()
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            print(f"ℹ️ No symbol universe file at {self.path}, symbol index disabled")
+            return None
+        
+        start = time.perf_counter()
+        opener = gzip.open if self.path.endswith('.gz') else open
+        symbols = []
+        
+        with opener(self.path, 'rt', newline='') as f:
+            rows = csv.reader(f)
+            header = [column.strip().lower() for column in next(rows, [])]
+            symbol_column = header.index('symbol') if 'symbol' in header else 0
+            status_column = header.index('status') if 'status' in header else None
+            if 'symbol' not in header and header:
+                # Sin header: la primera línea ya es un símbolo
+                rows = [header] + list(rows)
+            
+            for row in rows:
+                if len(row) <= symbol_column:
+                    continue
+                if status_column is not None and len(row) > status_column and row[status_column].lower() != 'active':
+                    continue
+                symbol = row[symbol_column].strip().upper()
+                if 1 <= len(symbol) <= SYMBOL_WIDTH and symbol.isalpha():
+                    symbols.append(symbol)
+        
+        packed = PackedSymbols(symbols)
+        print(f"📇 Symbol universe: {len(packed)} symbols ({len(packed.blob)} bytes) in {elapsed_ms(start)} ms")
+        return packed
+    
+    def contains(self, symbol):
+        """
+        Returns:
+            bool or None: True/False según el índice, None si no hay índice
+        """
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    try:
+                        self.symbols = self._load()
+                    except Exception as e:
+                        print(f"⚠️ Could not load symbol universe: {str(e)}")
+                    self.loaded = True
+        
+        if self.symbols is None:
+            return None
+        return symbol in self.symbols
+
+class NegativeCache:
+    """
+    Símbolos que el proveedor rechazó, con TTL y tamaño acotado
+    
+    invalid_symbol se guarda ttl_seconds; no_data solo no_data_ttl_seconds,
+    porque no siempre es culpa del símbolo. Los errores de cuota
+    (rate_limit, incluido el "Information" de cuota diaria) no se guardan.
+    """
+    
+    def __init__(self, ttl_seconds=NEGATIVE_CACHE_TTL_SECONDS, max_size=NEGATIVE_CACHE_MAX_SIZE,
+                 no_data_ttl_seconds=NEGATIVE_CACHE_NO_DATA_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.rejection_ttls = {'invalid_symbol': ttl_seconds, 'no_data': no_data_ttl_seconds}
+        self.entries = {}
+        self.lock = threading.Lock()
+    
+    def add(self, symbol, ttl_seconds=None):
+        with self.lock:
+            self.entries.pop(symbol, None)
+            self.entries[symbol] = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+            while len(self.entries) > self.max_size:
+                # El dict mantiene orden de inserción: sale el más antiguo
+                self.entries.pop(next(iter(self.entries)))
+    
+    def contains(self, symbol):
+        with self.lock:
+            expires_at = self.entries.get(symbol)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self.entries[symbol]
+                return False
+            return True
+    
+    def record(self, symbol, result):
+        """Agregar el símbolo si la respuesta del proveedor fue un rechazo"""
+        ttl_seconds = self.rejection_ttls.get(result.get('error')) if isinstance(result, dict) else None
+        if ttl_seconds:
+            print(f"🚫 {symbol} rejected by provider ({result['error']}), cached for {ttl_seconds}s")
+            self.add(symbol, ttl_seconds)
+
+symbol_universe = SymbolUniverse(SYMBOL_UNIVERSE_FILE)
+negative_cache = NegativeCache()
@@ -1,7 +1,9 @@
 """
 Lambda Function: getHistoricalPrices (PRODUCTION v2.0)
 Descripción: Consulta histórico de precios desde DynamoDB
-Features: Error handling robusto, validaciones, paginación
+Features: Error handling robusto, validaciones, paginación,
+planificador de resolución (raw / 1h / 1d / 1w) sobre los rollups diarios,
+lectura de ventanas empaquetadas (chunks binarios) directo a arrays
 """
 
 import json
@@ -11,6 +13,9 @@ from datetime import datetime, timedelta
 import os
 import traceback
 
+# Lambda Layer common-layer
+from financial_common.history import plan_resolution, query_history, RESOLUTIONS
+
 # ==================== CONFIGURACIÓN ====================
 TABLE_NAME = os.environ.get('TABLE_NAME', 'FinancialData')
 
@@ -74,6 +79,28 @@ def validate_limit(limit_str):
     except ValueError:
         return False, f"Invalid limit parameter: must be an integer"
 
+def validate_interval(interval_str):
+    """Validar parámetro interval (raw, 1h, 1d, 1w)"""
+    interval = interval_str.strip().lower()
+    
+    if interval not in RESOLUTIONS:
+        return False, f"Invalid interval: must be one of {', '.join(RESOLUTIONS)}"
+    
+    return True, interval
+
+def validate_max_points(max_points_str):
+    """Validar parámetro max_points (presupuesto de puntos de la ventana)"""
+    try:
+        max_points = int(max_points_str)
+        
+        if max_points < 1:
+            return False, "max_points must be at least 1"
+        
+        return True, max_points
+        
+    except ValueError:
+        return False, "Invalid max_points parameter: must be an integer"
+
 # ==================== HELPER FUNCTIONS ====================
 
 class DecimalEncoder(json.JSONEncoder):
@@ -103,12 +130,16 @@ def create_response(status_code, body, headers=None):
 
 # ==================== DATABASE FUNCTIONS ====================
 
-def query_historical_data(symbol, days, limit=None):
+def query_historical_data(symbol, days, limit=None, interval=None, max_points=None):
     """
-    Query DynamoDB para datos históricos
+    Query DynamoDB para datos históricos con la resolución del planificador
+    
+    raw y 1h leen los puntos crudos; 1d y 1w leen los rollups diarios con la
+    cola cruda del último día plegada en su barra (ver financial_common.history).
+    Sin rollups en la ventana se vuelve a los puntos crudos.
     
     Returns:
-        tuple: (success: bool, data: list or error_message: str)
+        tuple: (success: bool, {'data': list, 'plan': dict} or error_message: str)
     """
     
     if table is None:
@@ -119,32 +150,16 @@ def query_historical_data(symbol, days, limit=None):
         end_time = int(datetime.now().timestamp())
         start_time = end_time - (days * 86400)
         
-        print(f"🔍 Querying {symbol} from {datetime.fromtimestamp(start_time)} to {datetime.fromtimestamp(end_time)}")
-        
-        # Query DynamoDB
-        query_params = {
-            'KeyConditionExpression': 'symbol = :symbol AND #ts BETWEEN :start AND :end',
-            'ExpressionAttributeNames': {
-                '#ts': 'timestamp'
-            },
-            'ExpressionAttributeValues': {
-                ':symbol': symbol,
-                ':start': start_time,
-                ':end': end_time
-            },
-            'ScanIndexForward': False
-        }
+        resolution = plan_resolution(days, interval, max_points)
         
-        if limit:
-            query_params['Limit'] = limit
-        
-        response = table.query(**query_params)
+        print(f"🔍 Querying {symbol} from {datetime.fromtimestamp(start_time)} to {datetime.fromtimestamp(end_time)} "
+              f"(resolution: {resolution})")
         
-        items = response.get('Items', [])
+        items, plan = query_history(table, symbol, start_time, end_time, resolution, limit)
         
-        print(f"✅ Found {len(items)} records for {symbol}")
+        print(f"✅ Found {len(items)} records for {symbol} ({plan['items_read']} items read)")
         
-        return True, items
+        return True, {'data': items, 'plan': plan}
         
     except Exception as e:
         error_msg = f"DynamoDB query error: {str(e)}"
@@ -198,10 +213,30 @@ def lambda_handler(event, context):
                 })
             limit = limit_result
         
+        interval = None
+        if 'interval' in query_params:
+            is_valid, interval_result = validate_interval(query_params['interval'])
+            if not is_valid:
+                return create_response(400, {
+                    'error': 'invalid_interval',
+                    'message': interval_result
+                })
+            interval = interval_result
+        
+        max_points = None
+        if 'max_points' in query_params:
+            is_valid, max_points_result = validate_max_points(query_params['max_points'])
+            if not is_valid:
+                return create_response(400, {
+                    'error': 'invalid_max_points',
+                    'message': max_points_result
+                })
+            max_points = max_points_result
+        
         print(f"📊 Fetching {days} days of history for {symbol}" + 
               (f" (limit: {limit})" if limit else ""))
         
-        success, result = query_historical_data(symbol, days, limit)
+        success, result = query_historical_data(symbol, days, limit, interval, max_points)
         
         if not success:
             return create_response(500, {
@@ -209,6 +244,9 @@ def lambda_handler(event, context):
                 'message': result
             })
         
+        plan = result['plan']
+        result = result['data']
+        
         if not result:
             return create_response(404, {
                 'error': 'no_data',
@@ -220,6 +258,8 @@ def lambda_handler(event, context):
         response_data = {
             'symbol': symbol,
             'days': days,
+            'resolution': plan['resolution'],
+            'plan': plan,
             'count': len(result),
             'data': result
         }
@@ -1,25 +1,85 @@
 """
 Lambda Function: getPortfolio
 Descripción: Obtiene lista de todos los símbolos únicos guardados con sus últimos precios
-Trigger: API Gateway GET /portfolio
+Trigger: API Gateway GET /portfolio (?symbols=AAPL,MSFT lee solo esos con BatchGetItem)
+Los símbolos salen del registro (GSI sobre los items LATEST): el costo crece con
+la cantidad de símbolos, no con el histórico guardado
 """
 
 import json
 import boto3
+from boto3.dynamodb.conditions import Key
 from decimal import Decimal
 from datetime import datetime
 import os
+import time
+
+# Lambda Layer common-layer
+from financial_common.latest import LATEST_SUFFIX, REGISTRY_KEY
 
 # Cliente DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_NAME', 'FinancialData')
 table = dynamodb.Table(table_name)
 
+# Items '<SYMBOL>#LATEST' que mantienen fetchRealTimePrice y saveStockPrice
+MAX_PORTFOLIO_SYMBOLS = int(os.environ.get('MAX_PORTFOLIO_SYMBOLS', '100'))
+
+# Registro de símbolos: GSI (registry, symbol) donde solo aparecen los LATEST
+REGISTRY_INDEX = os.environ.get('REGISTRY_INDEX', 'SymbolRegistry')
+
 def decimal_to_float(obj):
     if isinstance(obj, Decimal):
         return float(obj)
     raise TypeError
 
+def get_latest_items(symbols):
+    """
+    Items LATEST de varios símbolos con BatchGetItem (100 keys por request,
+    reintentando UnprocessedKeys)
+    """
+    items = []
+    
+    for start in range(0, len(symbols), 100):
+        request = {table_name: {'Keys': [
+            {'symbol': f'{symbol}{LATEST_SUFFIX}', 'timestamp': 0} for symbol in symbols[start:start + 100]
+        ]}}
+        for attempt in range(5):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response['Responses'].get(table_name, []))
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+            time.sleep(min(0.05 * 2 ** attempt, 1.0))
+        else:
+            print(f"⚠️ {len(request[table_name]['Keys'])} símbolos sin leer tras los reintentos")
+    
+    return [from_latest(item) for item in items]
+
+def from_latest(item):
+    """Item LATEST con el formato de un punto crudo (símbolo sin sufijo, timestamp del punto)"""
+    return dict(item, symbol=item['symbol'][:-len(LATEST_SUFFIX)], timestamp=item['as_of'])
+
+def get_registry_items():
+    """
+    Última cotización de todos los símbolos: Query paginado del registro
+    (un item por símbolo, ordenado alfabéticamente)
+    """
+    query = {
+        'IndexName': REGISTRY_INDEX,
+        'KeyConditionExpression': Key('registry').eq(REGISTRY_KEY),
+        'ProjectionExpression': 'symbol, as_of, price, #dt, volume, change_percent',
+        'ExpressionAttributeNames': {'#dt': 'date'}
+    }
+    items = []
+    
+    while True:
+        response = table.query(**query)
+        items.extend(from_latest(item) for item in response['Items'])
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
 def lambda_handler(event, context):
     """
     Handler principal - Obtiene portfolio completo
@@ -28,20 +88,30 @@ def lambda_handler(event, context):
     print(f"📥 Event recibido: {json.dumps(event, default=str)}")
     
     try:
-        print("📊 Obteniendo portfolio completo...")
+        query_params = event.get('queryStringParameters') or {}
+        requested = sorted({symbol.strip().upper() for symbol in query_params.get('symbols', '').split(',') if symbol.strip()})
         
-        # Scan de la tabla para obtener todos los registros
-        response = table.scan(
-            ProjectionExpression='symbol, #ts, price, #dt, volume, change_percent',
-            ExpressionAttributeNames={
-                '#ts': 'timestamp',
-                '#dt': 'date'
+        if len(requested) > MAX_PORTFOLIO_SYMBOLS:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': 'Too many symbols',
+                    'message': f'Máximo {MAX_PORTFOLIO_SYMBOLS} símbolos por request'
+                })
             }
-        )
         
-        items = response['Items']
+        if requested:
+            print(f"📊 Obteniendo portfolio de {len(requested)} símbolos (BatchGetItem)...")
+            items = get_latest_items(requested)
+        else:
+            print("📊 Obteniendo portfolio completo (registro de símbolos)...")
+            items = get_registry_items()
         
-        print(f"📊 {len(items)} registros encontrados en total")
+        print(f"📊 {len(items)} símbolos encontrados")
         
         if len(items) == 0:
             return {
@@ -56,14 +126,13 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Agrupar por símbolo y obtener el más reciente de cada uno
+        # Un item por símbolo (el LATEST); se conserva el más reciente por si acaso
         symbols_dict = {}
         
         for item in items:
             symbol = item['symbol']
             timestamp = int(item['timestamp'])
             
-            # Guardar solo el más reciente de cada símbolo
             if symbol not in symbols_dict or timestamp > symbols_dict[symbol]['timestamp']:
                 symbols_dict[symbol] = {
                     'symbol': symbol,
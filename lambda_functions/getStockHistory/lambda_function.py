@@ -6,16 +6,22 @@ Trigger: API Gateway GET /stock/{symbol}/history
 
 import json
 import boto3
-from boto3.dynamodb.conditions import Key
 from decimal import Decimal
 from datetime import datetime, timedelta
 import os
 
+# Lambda Layer common-layer
+from financial_common.demand import record_demand
+from financial_common.history import HISTORY_MAX_POINTS, plan_resolution, query_history, RESOLUTIONS
+
 # Cliente DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_NAME', 'FinancialData')
 table = dynamodb.Table(table_name)
 
+# Demanda de lecturas por símbolo (la usa el planificador de fetchRealTimePrice)
+state_table = dynamodb.Table(os.environ.get('STATE_TABLE_NAME', 'FinancialDataState'))
+
 def decimal_to_float(obj):
     """Convertir Decimal a float"""
     if isinstance(obj, Decimal):
@@ -29,6 +35,8 @@ def lambda_handler(event, context):
     Query Parameters:
         - days: número de días de histórico (default: 30)
         - limit: máximo número de registros (default: 100)
+        - interval: raw, 1h, 1d o 1w (default: según max_points)
+        - max_points: presupuesto de puntos de la ventana (default: HISTORY_MAX_POINTS)
     """
     
     print(f"📥 Event recibido: {json.dumps(event, default=str)}")
@@ -63,10 +71,27 @@ def lambda_handler(event, context):
                 })
             }
         
+        record_demand(state_table, symbol, 'history')
+        
         # Obtener query parameters
         query_params = event.get('queryStringParameters', {}) or {}
         days = int(query_params.get('days', 30))
         limit = int(query_params.get('limit', 100))
+        max_points = int(query_params.get('max_points', HISTORY_MAX_POINTS))
+        interval = query_params.get('interval', '').lower() or None
+        
+        if interval and interval not in RESOLUTIONS:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': 'Invalid interval',
+                    'message': f"interval debe ser uno de: {', '.join(RESOLUTIONS)}"
+                })
+            }
         
         # Validar límites
         if days > 365:
@@ -74,23 +99,19 @@ def lambda_handler(event, context):
         if limit > 500:
             limit = 500
         
-        print(f"🔍 Consultando histórico de {symbol}: {days} días, límite {limit}")
+        resolution = plan_resolution(days, interval, max_points)
+        print(f"🔍 Consultando histórico de {symbol}: {days} días, límite {limit}, resolución {resolution}")
         
         # Calcular timestamp de inicio (hace N días)
         start_date = datetime.now() - timedelta(days=days)
         start_timestamp = int(start_date.timestamp())
         
-        # Query DynamoDB
-        response = table.query(
-            KeyConditionExpression=Key('symbol').eq(symbol) & Key('timestamp').gte(start_timestamp),
-            ScanIndexForward=False,  # Más reciente primero
-            Limit=limit
-        )
+        # Query DynamoDB (más reciente primero)
+        items, plan = query_history(table, symbol, start_timestamp, int(datetime.now().timestamp()), resolution, limit)
         
-        print(f"📊 DynamoDB Response: {response['ResponseMetadata']['HTTPStatusCode']}")
-        print(f"📊 Items encontrados: {response['Count']}")
+        print(f"📊 Items encontrados: {len(items)} ({plan['items_read']} leídos, resolución {plan['resolution']})")
         
-        if response['Count'] == 0:
+        if not items:
             return {
                 'statusCode': 404,
                 'headers': {
@@ -105,7 +126,7 @@ def lambda_handler(event, context):
         
         # Procesar items
         history = []
-        for item in response['Items']:
+        for item in items:
             record = {
                 'timestamp': int(item['timestamp']),
                 'date': item['date'],
@@ -113,6 +134,10 @@ def lambda_handler(event, context):
             }
             
             # Campos opcionales
+            if all(field in item for field in ('open', 'high', 'low')):
+                record.update(open=float(item['open']), high=float(item['high']), low=float(item['low']))
+            if 'close' in item:
+                record['close'] = float(item['close'])
             if 'volume' in item:
                 record['volume'] = int(item['volume'])
             if 'change' in item:
@@ -123,7 +148,7 @@ def lambda_handler(event, context):
             history.append(record)
         
         # Calcular estadísticas
-        prices = [float(item['price']) for item in response['Items']]
+        prices = [float(item['price']) for item in items]
         stats = {
             'count': len(prices),
             'max': max(prices),
@@ -148,6 +173,8 @@ def lambda_handler(event, context):
                     'from': start_date.isoformat(),
                     'to': datetime.now().isoformat()
                 },
+                'resolution': plan['resolution'],
+                'plan': plan,
                 'statistics': stats,
                 'data': history,
                 'message': f'Histórico de {symbol} obtenido exitosamente'
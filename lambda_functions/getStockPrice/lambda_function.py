@@ -10,17 +10,41 @@ from boto3.dynamodb.conditions import Key
 from decimal import Decimal
 import os
 
+# Lambda Layer common-layer
+from financial_common.demand import record_demand
+from financial_common.latest import LATEST_SUFFIX
+
 # Cliente DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_NAME', 'FinancialData')
 table = dynamodb.Table(table_name)
 
+# Demanda de lecturas por símbolo (la usa el planificador de fetchRealTimePrice)
+state_table = dynamodb.Table(os.environ.get('STATE_TABLE_NAME', 'FinancialDataState'))
+
 def decimal_to_float(obj):
     """Convertir Decimal a float para JSON serialization"""
     if isinstance(obj, Decimal):
         return float(obj)
     raise TypeError
 
+def get_latest_item(symbol):
+    """
+    Último precio del símbolo: GetItem del item LATEST y, si todavía no
+    existe (datos anteriores al LATEST), Query del último punto crudo
+    """
+    response = table.get_item(Key={'symbol': f'{symbol}{LATEST_SUFFIX}', 'timestamp': 0})
+    if 'Item' in response:
+        return response['Item']
+    
+    print(f"⚠️ {symbol} sin item LATEST, consultando el último punto")
+    response = table.query(
+        KeyConditionExpression=Key('symbol').eq(symbol),
+        ScanIndexForward=False,  # Ordenar descendente (más reciente primero)
+        Limit=1  # Solo el más reciente
+    )
+    return response['Items'][0] if response['Items'] else None
+
 def lambda_handler(event, context):
     """
     Handler principal de la función Lambda
@@ -65,20 +89,15 @@ def lambda_handler(event, context):
                 })
             }
         
-        print(f"🔍 Consultando último precio de: {symbol}")
+        record_demand(state_table, symbol, 'price')
         
-        # Query DynamoDB para obtener el último registro del símbolo
-        response = table.query(
-            KeyConditionExpression=Key('symbol').eq(symbol),
-            ScanIndexForward=False,  # Ordenar descendente (más reciente primero)
-            Limit=1  # Solo el más reciente
-        )
+        print(f"🔍 Consultando último precio de: {symbol}")
         
-        print(f"📊 DynamoDB Response: {response['ResponseMetadata']['HTTPStatusCode']}")
-        print(f"📊 Items encontrados: {response['Count']}")
+        # GetItem del último registro del símbolo
+        item = get_latest_item(symbol)
         
         # Verificar si se encontró el símbolo
-        if response['Count'] == 0:
+        if item is None:
             return {
                 'statusCode': 404,
                 'headers': {
@@ -91,14 +110,11 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Obtener el item más reciente
-        item = response['Items'][0]
-        
-        # Preparar respuesta
+        # Preparar respuesta (en el LATEST el timestamp del punto es as_of)
         stock_data = {
-            'symbol': item['symbol'],
+            'symbol': symbol,
             'price': float(item['price']),
-            'timestamp': int(item['timestamp']),
+            'timestamp': int(item.get('as_of', item['timestamp'])),
             'date': item['date']
         }
         
@@ -2,19 +2,156 @@
 Lambda Function: saveStockPrice
 Descripción: Guarda el precio de una acción en DynamoDB
 Trigger: API Gateway (futuro) o invocación manual
+Soporta un precio ({symbol, price, ...}) o varios ({"prices": [...]}) con BatchWriteItem
+y mantiene los rollups diarios OHLCV ('<SYMBOL>#1D') y el item '<SYMBOL>#LATEST'
+de lo que escribe
 """
 
 import json
 import boto3
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
 import os
 
+# Lambda Layer common-layer (mismo formato de rollups/LATEST que fetchRealTimePrice)
+from financial_common.batch_writer import BatchWriter
+from financial_common.latest import put_with_latest, update_latest
+from financial_common.rollups import update_rollups
+from financial_common.symbols import validate_symbol_format
+
 # Cliente DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('TABLE_NAME', 'FinancialData')
 table = dynamodb.Table(table_name)
 
+# Máximo de precios por request en modo batch
+MAX_BATCH_PRICES = int(os.environ.get('MAX_BATCH_PRICES', '500'))
+
+# Rollups diarios OHLCV ('<SYMBOL>#1D')
+ROLLUPS = os.environ.get('ROLLUPS', 'true').lower() == 'true'
+
+# Item '<SYMBOL>#LATEST' con la última cotización (nunca se pisa con un punto más viejo)
+LATEST_ITEMS = os.environ.get('LATEST_ITEMS', 'true').lower() == 'true'
+
+def build_item(body, timestamp, current_date):
+    """Construir item de DynamoDB a partir de un precio (lanza ValueError/InvalidOperation)"""
+    item = {
+        'symbol': body['symbol'].upper(),
+        'timestamp': timestamp,
+        'price': Decimal(str(body['price'])),
+        'date': current_date
+    }
+    
+    # Agregar campos opcionales si existen
+    if body.get('volume') is not None:
+        item['volume'] = int(body['volume'])
+    if body.get('change') is not None:
+        item['change'] = Decimal(str(body['change']))
+    if body.get('change_percent') is not None:
+        item['change_percent'] = Decimal(str(body['change_percent']))
+    
+    return item
+
+def after_batch_write(items):
+    """on_written del BatchWriter: LATEST y rollups de los items escritos"""
+    if LATEST_ITEMS:
+        update_latest(table, items)
+    if ROLLUPS:
+        update_rollups(table, items)
+
+def save_prices_batch(prices):
+    """
+    Guardar varios precios con BatchWriteItem
+    
+    Cada precio puede traer su propio 'timestamp' (unix); si no, se usa el actual.
+    Dos precios con el mismo símbolo y timestamp serían el mismo item: se
+    guarda el primero y el resto se reporta como error.
+    
+    Returns:
+        dict: Body de respuesta con resumen y resultado por precio
+    """
+    now = datetime.now()
+    writer = BatchWriter(table, on_written=after_batch_write)
+    details = []
+    queued = {}
+    
+    for index, body in enumerate(prices):
+        if not isinstance(body, dict) or 'symbol' not in body or 'price' not in body:
+            details.append({
+                'index': index,
+                'status': 'error',
+                'error': 'Missing required field: symbol/price'
+            })
+            continue
+        
+        # Solo 1-5 letras: un '#' escribiría en las particiones derivadas (#1D, #LATEST, ...)
+        is_valid, symbol = validate_symbol_format(body['symbol'])
+        if not is_valid:
+            details.append({
+                'index': index,
+                'symbol': str(body.get('symbol')),
+                'status': 'error',
+                'error': f'Invalid symbol: {symbol}'
+            })
+            continue
+        
+        try:
+            timestamp = int(body.get('timestamp', now.timestamp()))
+            current_date = datetime.fromtimestamp(timestamp).isoformat()
+            item = build_item(dict(body, symbol=symbol), timestamp, current_date)
+        except (ValueError, TypeError, InvalidOperation) as e:
+            details.append({
+                'index': index,
+                'symbol': str(body.get('symbol')),
+                'status': 'error',
+                'error': f'Invalid data type: {str(e)}'
+            })
+            continue
+        
+        key = BatchWriter.item_key(item)
+        if key in queued:
+            details.append({
+                'index': index,
+                'symbol': item['symbol'],
+                'timestamp': timestamp,
+                'status': 'error',
+                'error': f'Duplicate key: same symbol and timestamp as prices[{queued[key]}]'
+            })
+            continue
+        queued[key] = index
+        
+        details.append({
+            'index': index,
+            'symbol': item['symbol'],
+            'price': float(item['price']),
+            'timestamp': timestamp,
+            'status': 'queued',
+            'key': writer.add(item)
+        })
+    
+    results = writer.flush()
+    
+    saved = 0
+    for detail in details:
+        if detail['status'] != 'queued':
+            continue
+        
+        success, error_msg = results.get(detail.pop('key'), (False, 'Item was not written'))
+        if success:
+            detail['status'] = 'success'
+            saved += 1
+        else:
+            detail['status'] = 'error'
+            detail['error'] = error_msg
+    
+    return {
+        'message': f'{saved}/{len(prices)} precios guardados',
+        'saved': saved,
+        'failed': len(prices) - saved,
+        'batch_write': writer.stats,
+        'details': details
+    }
+
 def lambda_handler(event, context):
     """
     Handler principal de la función Lambda
@@ -37,6 +174,31 @@ def lambda_handler(event, context):
             # Si es invocación directa, usar event directamente
             body = event
         
+        # Modo batch: {"prices": [{symbol, price, ...}, ...]}
+        if isinstance(body.get('prices'), list):
+            prices = body['prices']
+            
+            if not prices or len(prices) > MAX_BATCH_PRICES:
+                return {
+                    'statusCode': 400,
+                    'body': json.dumps({
+                        'error': 'Invalid prices list',
+                        'message': f'Debe enviar entre 1 y {MAX_BATCH_PRICES} precios'
+                    })
+                }
+            
+            print(f"💾 Guardando {len(prices)} precios en batch")
+            result = save_prices_batch(prices)
+            
+            return {
+                'statusCode': 200 if result['failed'] == 0 else 207,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps(result)
+            }
+        
         # Validar campos requeridos
         if 'symbol' not in body:
             return {
@@ -56,42 +218,38 @@ def lambda_handler(event, context):
                 })
             }
         
-        # Extraer datos
-        symbol = body['symbol'].upper()
-        price = Decimal(str(body['price']))
+        # Solo 1-5 letras: un '#' escribiría en las particiones derivadas (#1D, #LATEST, ...)
+        is_valid, symbol = validate_symbol_format(body['symbol'])
+        if not is_valid:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'Invalid symbol',
+                    'message': symbol
+                })
+            }
         
         # Timestamp actual
         timestamp = int(datetime.now().timestamp())
         current_date = datetime.now().isoformat()
         
-        # Datos opcionales
-        volume = body.get('volume', None)
-        change = body.get('change', None)
-        change_percent = body.get('change_percent', None)
-        
         # Construir item para DynamoDB
-        item = {
-            'symbol': symbol,
-            'timestamp': timestamp,
-            'price': price,
-            'date': current_date
-        }
-        
-        # Agregar campos opcionales si existen
-        if volume is not None:
-            item['volume'] = int(volume)
-        if change is not None:
-            item['change'] = Decimal(str(change))
-        if change_percent is not None:
-            item['change_percent'] = Decimal(str(change_percent))
+        item = build_item(dict(body, symbol=symbol), timestamp, current_date)
+        symbol = item['symbol']
+        price = item['price']
         
         print(f"💾 Guardando en DynamoDB: {symbol} = ${price}")
         
-        # Guardar en DynamoDB
-        response = table.put_item(Item=item)
+        # Guardar en DynamoDB (con su LATEST en la misma transacción)
+        if LATEST_ITEMS:
+            put_with_latest(table, item)
+        else:
+            table.put_item(Item=item)
         
         print(f"✅ Item guardado exitosamente")
-        print(f"📊 DynamoDB Response: {response['ResponseMetadata']['HTTPStatusCode']}")
+        
+        if ROLLUPS:
+            update_rollups(table, [item])
         
         # Respuesta exitosa
         return {
@@ -45,6 +45,7 @@ run_test "test-aapl.json" "AAPL - Valid input" "200"
 run_test "test-googl.json" "GOOGL - Valid input" "200"
 run_test "test-msft.json" "MSFT - Valid input" "200"
 run_test "test-error-missing-price.json" "Missing price field" "400"
+run_test "test-batch.json" "Batch - 3 prices" "200"
 
 echo "=========================================="
 echo "✅ Tests completados"
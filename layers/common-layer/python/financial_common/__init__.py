@@ -0,0 +1,7 @@
+"""
+financial_common: código compartido por las Lambdas de FinancialData (Lambda Layer)
+
+Formato de las particiones derivadas ('<SYMBOL>#1D', '<SYMBOL>#LATEST'),
+calendario de mercado, BatchWriter y validación de símbolos. Cada Lambda
+mantiene sus propios flags de configuración (ROLLUPS, LATEST_ITEMS, ...).
+"""
@@ -0,0 +1,145 @@
+"""
+Escrituras agrupadas con BatchWriteItem (máx. 25 items por request)
+"""
+
+import os
+import random
+import threading
+import time
+
+BATCH_WRITE_SIZE = int(os.environ.get('BATCH_WRITE_SIZE', '25'))
+BATCH_WRITE_MAX_RETRIES = int(os.environ.get('BATCH_WRITE_MAX_RETRIES', '5'))
+
+class BatchWriter:
+    """
+    Buffer de escrituras agrupadas en requests BatchWriteItem de 25 items
+    
+    add() encola un PutRequest y delete() un DeleteRequest (por key).
+    Los UnprocessedItems se reenvían con backoff exponencial (con jitter).
+    El resultado por item queda en self.results[(symbol, timestamp)] como
+    (success: bool, error_message: str or None). Thread-safe para add()/delete().
+    Con deadline (cualquier objeto con write_budget() en segundos), no se
+    reintenta si el backoff no entra en el tiempo que queda.
+    on_written recibe los items (puts) de cada lote que quedaron escritos.
+    """
+    
+    def __init__(self, target_table, batch_size=BATCH_WRITE_SIZE, max_retries=BATCH_WRITE_MAX_RETRIES,
+                 base_delay=0.05, max_delay=2.0, deadline=None, on_written=None):
+        self.table = target_table
+        self.on_written = on_written
+        self.deadline = deadline
+        self.batch_size = min(batch_size, 25)  # Límite de BatchWriteItem
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.buffer = {}
+        self.results = {}
+        self.stats = {'items': 0, 'requests': 0, 'retries': 0, 'failed': 0}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def item_key(item):
+        return (item['symbol'], item['timestamp'])
+    
+    @classmethod
+    def request_key(cls, request):
+        if 'PutRequest' in request:
+            return cls.item_key(request['PutRequest']['Item'])
+        return cls.item_key(request['DeleteRequest']['Key'])
+    
+    def add(self, item):
+        """
+        Encolar un item; envía un lote en cuanto se llena
+        
+        Returns:
+            tuple: Key (symbol, timestamp) para consultar self.results
+        """
+        return self._enqueue({'PutRequest': {'Item': item}})
+    
+    def delete(self, key):
+        """
+        Encolar el borrado del item con key {'symbol', 'timestamp'}
+        
+        Returns:
+            tuple: Key (symbol, timestamp) para consultar self.results
+        """
+        return self._enqueue({'DeleteRequest': {'Key': key}})
+    
+    def _enqueue(self, request):
+        key = self.request_key(request)
+        batch = None
+        with self.lock:
+            # Misma key en un lote = ValidationException: gana el último
+            self.buffer[key] = request
+            if len(self.buffer) >= self.batch_size:
+                batch = list(self.buffer.values())
+                self.buffer = {}
+        
+        if batch:
+            self._write_batch(batch)
+        
+        return key
+    
+    def flush(self):
+        """Enviar todo lo pendiente y devolver los resultados por item"""
+        with self.lock:
+            pending = list(self.buffer.values())
+            self.buffer = {}
+        
+        for i in range(0, len(pending), self.batch_size):
+            self._write_batch(pending[i:i + self.batch_size])
+        
+        return self.results
+    
+    def _backoff(self, attempt):
+        """Esperar antes de un reintento; False si el deadline no lo permite"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if self.deadline is not None and delay >= self.deadline.write_budget():
+            return False
+        time.sleep(delay)
+        return True
+    
+    def _write_batch(self, requests):
+        requests_to_send = requests
+        error_msg = None
+        attempt = 0
+        
+        while requests_to_send and attempt <= self.max_retries:
+            if attempt > 0:
+                if not self._backoff(attempt):
+                    error_msg = 'Deadline reached with unprocessed items'
+                    break
+                with self.lock:
+                    self.stats['retries'] += 1
+            attempt += 1
+            
+            try:
+                response = self.table.meta.client.batch_write_item(
+                    RequestItems={self.table.name: requests_to_send}
+                )
+                with self.lock:
+                    self.stats['requests'] += 1
+                requests_to_send = response.get('UnprocessedItems', {}).get(self.table.name, [])
+                error_msg = 'Unprocessed after retries' if requests_to_send else None
+            except Exception as e:
+                # Throttling / errores transitorios: reintentar el lote completo
+                error_msg = f"DynamoDB error: {str(e)}"
+                print(f"⚠️ BatchWriteItem failed (attempt {attempt}): {error_msg}")
+        
+        failed_keys = {self.request_key(r) for r in requests_to_send}
+        
+        with self.lock:
+            for request in requests:
+                key = self.request_key(request)
+                if key in failed_keys:
+                    self.results[key] = (False, error_msg)
+                    self.stats['failed'] += 1
+                else:
+                    self.results[key] = (True, None)
+                self.stats['items'] += 1
+        
+        print(f"💾 Batch saved {len(requests) - len(failed_keys)}/{len(requests)} items to DynamoDB")
+        
+        if self.on_written is not None:
+            self.on_written([request['PutRequest']['Item'] for request in requests
+                             if 'PutRequest' in request and self.request_key(request) not in failed_keys])
@@ -0,0 +1,176 @@
+"""
+Chunks binarios '<SYMBOL>#CHUNK': una ventana cerrada (día o semana UTC) de
+puntos crudos en un solo item
+
+Formato v1: header + deltas de timestamp (uint32) + precios en punto fijo
+(int64, precio * escala) + volúmenes (int64), little-endian; el cuerpo va
+comprimido con zlib si flags lo indica. fetchRealTimePrice los escribe
+(pack_chunk) y getHistoricalPrices, getStockHistory y calculateIndicators los
+leen (unpack_chunk); los dos lados validan la versión con CHUNK_VERSION.
+"""
+
+import os
+import struct
+import sys
+import zlib
+from array import array
+from decimal import Decimal
+from itertools import accumulate
+
+from boto3.dynamodb.conditions import Attr, Key
+
+# numpy es opcional (p.ej. la capa AWS SDK for pandas); sin él los chunks se decodifican con array.array
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Leer las ventanas cerradas de los chunks en vez de los puntos crudos
+CHUNK_STORAGE = os.environ.get('CHUNK_STORAGE', 'false').lower() == 'true'
+CHUNK_SUFFIX = '#CHUNK'
+
+CHUNK_HEADER = struct.Struct('<BBIqI')  # versión, flags, puntos, primer timestamp, escala
+CHUNK_VERSION = 1
+CHUNK_ZLIB = 0x01
+CHUNK_PRICE_SCALE = 10000
+
+# Segundos por ventana y corrimiento para que las semanas empiecen el lunes
+CHUNK_WINDOWS = {'day': (86400, 0), 'week': (7 * 86400, 3 * 86400)}
+
+def chunk_window_start(timestamp, window='day'):
+    """Inicio (UTC) de la ventana del timestamp"""
+    seconds, offset = CHUNK_WINDOWS[window]
+    return timestamp - (timestamp + offset) % seconds
+
+def pack_chunk(timestamps, prices, volumes, compress=True):
+    """
+    Empaquetar puntos ascendentes (timestamps sin repetir) en el formato v1
+    
+    Returns:
+        bytes
+    """
+    deltas = array('I', [0])
+    deltas.extend(current - previous for previous, current in zip(timestamps, timestamps[1:]))
+    fixed = array('q', (round(Decimal(str(price)) * CHUNK_PRICE_SCALE) for price in prices))
+    volume_column = array('q', (int(volume or 0) for volume in volumes))
+    
+    if sys.byteorder == 'big':
+        for column in (deltas, fixed, volume_column):
+            column.byteswap()
+    
+    body = deltas.tobytes() + fixed.tobytes() + volume_column.tobytes()
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= CHUNK_ZLIB
+    
+    return CHUNK_HEADER.pack(CHUNK_VERSION, flags, len(timestamps), timestamps[0], CHUNK_PRICE_SCALE) + body
+
+def chunk_bytes(value):
+    """Atributo binario de DynamoDB (boto3 Binary) a bytes"""
+    return bytes(getattr(value, 'value', value))
+
+def unpack_chunk(blob):
+    """
+    Decodificar un chunk directo en arrays, sin un dict por punto
+    
+    Raises:
+        ValueError: Versión de formato desconocida o cuerpo truncado
+    
+    Returns:
+        tuple: (timestamps, prices, volumes) como arrays de numpy o array.array
+    """
+    version, flags, count, first_ts, scale = CHUNK_HEADER.unpack_from(blob)
+    if version != CHUNK_VERSION:
+        raise ValueError(f'Unsupported chunk version {version} (expected {CHUNK_VERSION})')
+    
+    body = blob[CHUNK_HEADER.size:]
+    if flags & CHUNK_ZLIB:
+        body = zlib.decompress(body)
+    if len(body) != 20 * count:
+        raise ValueError(f'Chunk body has {len(body)} bytes for {count} points')
+    
+    if numpy is not None:
+        deltas = numpy.frombuffer(body, dtype='<u4', count=count)
+        timestamps = first_ts + numpy.cumsum(deltas, dtype=numpy.int64)
+        prices = numpy.frombuffer(body, dtype='<i8', count=count, offset=4 * count) / scale
+        volumes = numpy.frombuffer(body, dtype='<i8', count=count, offset=12 * count)
+        return timestamps, prices, volumes
+    
+    deltas, fixed, volumes = array('I'), array('q'), array('q')
+    deltas.frombytes(body[:4 * count])
+    fixed.frombytes(body[4 * count:12 * count])
+    volumes.frombytes(body[12 * count:20 * count])
+    if sys.byteorder == 'big':
+        for column in (deltas, fixed, volumes):
+            column.byteswap()
+    
+    timestamps = array('q', accumulate(deltas, initial=first_ts))[1:]
+    prices = array('d', (value / scale for value in fixed))
+    return timestamps, prices, volumes
+
+def chunk_points(blob):
+    """
+    Puntos de un chunk como {timestamp: (price: Decimal, volume: int)}
+    
+    Para el writer (re-empaquetar y verificar antes de borrar los crudos): la
+    escala de 4 decimales hace que el round trip del precio sea exacto.
+    """
+    timestamps, prices, volumes = unpack_chunk(blob)
+    return {
+        int(timestamp): (Decimal(str(round(float(price), 4))), int(volume))
+        for timestamp, price, volume in zip(timestamps, prices, volumes)
+    }
+
+def query_chunks(target_table, symbol, start_time, end_time, projection=None):
+    """
+    Chunks (ascendentes) que tocan [start_time, end_time]
+    
+    La key de un chunk es el inicio de su ventana, así que el rango empieza en
+    la semana de start_time (cubre chunks diarios y semanales) y el filtro por
+    last_ts descarta los que terminan antes de start_time.
+    """
+    lower = min(chunk_window_start(start_time, window) for window in CHUNK_WINDOWS)
+    query = {
+        'KeyConditionExpression': Key('symbol').eq(f'{symbol}{CHUNK_SUFFIX}') & Key('timestamp').between(lower, end_time),
+        'FilterExpression': Attr('last_ts').gte(start_time)
+    }
+    if projection:
+        query['ProjectionExpression'] = ', '.join(f'#{field}' for field in projection)
+        query['ExpressionAttributeNames'] = {f'#{field}': field for field in projection}
+    
+    chunks = []
+    while True:
+        response = target_table.query(**query)
+        chunks.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return chunks
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def recent_packed_prices(target_table, symbol, before, count, max_chunks=14):
+    """
+    Últimos count precios empaquetados anteriores a before (más reciente primero)
+    
+    Para lectores de "los últimos N puntos" cuando las ventanas cerradas ya
+    no tienen puntos crudos (CHUNK_PRUNE_RAW).
+    """
+    query = {
+        'KeyConditionExpression': Key('symbol').eq(f'{symbol}{CHUNK_SUFFIX}') & Key('timestamp').lt(before),
+        'ScanIndexForward': False,
+        'Limit': 2
+    }
+    prices = []
+    chunks_read = 0
+    
+    while len(prices) < count and chunks_read < max_chunks:
+        response = target_table.query(**query)
+        for chunk in response.get('Items', []):
+            chunks_read += 1
+            timestamps, chunk_prices, _ = unpack_chunk(chunk_bytes(chunk['data']))
+            prices.extend(float(price) for timestamp, price in zip(timestamps[::-1], chunk_prices[::-1])
+                          if timestamp < before)
+        if 'LastEvaluatedKey' not in response:
+            break
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    return prices[:count]
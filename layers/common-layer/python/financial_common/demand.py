@@ -0,0 +1,31 @@
+"""
+Demanda de lecturas por símbolo (buckets horarios 'DEMAND#<hora UTC>' en la
+tabla de estado) para el planificador de refresco de fetchRealTimePrice
+"""
+
+import os
+from datetime import datetime, timezone
+
+# Apagado por defecto: solo sirve con REFRESH_PLANNER=true en fetchRealTimePrice
+DEMAND_TRACKING = os.environ.get('DEMAND_TRACKING', 'false').lower() == 'true'
+DEMAND_TTL_SECONDS = 2 * 86400
+
+def demand_bucket_key(hour):
+    """pk del bucket horario de demanda"""
+    return f"DEMAND#{hour.strftime('%Y-%m-%dT%H')}"
+
+def record_demand(target_table, symbol, source):
+    """Contar una lectura del símbolo en el bucket horario de demanda (best effort)"""
+    if not DEMAND_TRACKING or target_table is None:
+        return
+    
+    try:
+        now = datetime.now(timezone.utc)
+        target_table.update_item(
+            Key={'pk': demand_bucket_key(now), 'sk': symbol},
+            UpdateExpression='ADD #reads :one, #source :one SET expires_at = :expires_at',
+            ExpressionAttributeNames={'#reads': 'reads', '#source': source},
+            ExpressionAttributeValues={':one': 1, ':expires_at': int(now.timestamp()) + DEMAND_TTL_SECONDS}
+        )
+    except Exception as e:
+        print(f"⚠️ No se pudo registrar la demanda de {symbol}: {str(e)}")
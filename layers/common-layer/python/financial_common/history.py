@@ -0,0 +1,261 @@
+"""
+Lectura del histórico por resolución (raw / 1h / 1d / 1w)
+
+raw y 1h leen los puntos crudos (y los chunks '<SYMBOL>#CHUNK' con
+CHUNK_STORAGE); 1d y 1w leen los rollups diarios '<SYMBOL>#1D'. Lo usan
+getHistoricalPrices y getStockHistory.
+"""
+
+import bisect
+import os
+from array import array
+from datetime import datetime, timezone
+from itertools import chain
+
+from boto3.dynamodb.conditions import Key
+
+from financial_common.chunks import chunk_bytes, CHUNK_STORAGE, numpy, query_chunks, unpack_chunk
+from financial_common.rollups import merge_rollup, new_rollup, ROLLUP_SUFFIX, trading_day_of
+
+# Planificador de resolución
+HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', '500'))
+RAW_POINTS_PER_DAY = float(os.environ.get('RAW_POINTS_PER_DAY', '8'))
+
+# Resoluciones de la más fina a la más gruesa: segundos por barra y partición
+# de la que se leen ('raw' = puntos crudos, 'rollup' = '<SYMBOL>#1D')
+RESOLUTIONS = {
+    'raw': (0, 'raw'),
+    '1h': (3600, 'raw'),
+    '1d': (86400, 'rollup'),
+    '1w': (7 * 86400, 'rollup')
+}
+
+# Las semanas empiezan el lunes (el epoch cae en jueves)
+WEEK_OFFSET = 3 * 86400
+
+def expected_points(resolution, days):
+    """Puntos esperados de una resolución en una ventana de days días"""
+    trading_days = days * 5 / 7
+    
+    if resolution == 'raw':
+        return trading_days * RAW_POINTS_PER_DAY
+    if resolution == '1h':
+        return trading_days * min(RAW_POINTS_PER_DAY, 7)
+    if resolution == '1d':
+        return trading_days
+    return days / 7
+
+def plan_resolution(days, interval=None, max_points=None):
+    """
+    Elegir la resolución de la consulta
+    
+    Con interval se usa esa; si no, la más fina cuyos puntos esperados caben
+    en max_points (o la más gruesa si ninguna cabe).
+    """
+    if interval:
+        return interval
+    
+    budget = max_points or HISTORY_MAX_POINTS
+    for resolution in RESOLUTIONS:
+        if expected_points(resolution, days) <= budget:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+def query_partition(target_table, partition, start_time, end_time, newest_first=False, limit=None):
+    """Query paginado de una partición en [start_time, end_time]"""
+    params = {
+        'KeyConditionExpression': Key('symbol').eq(partition) & Key('timestamp').between(start_time, end_time),
+        'ScanIndexForward': not newest_first
+    }
+    
+    items = []
+    while True:
+        if limit:
+            params['Limit'] = limit - len(items)
+        
+        response = target_table.query(**params)
+        items.extend(response.get('Items', []))
+        
+        if 'LastEvaluatedKey' not in response or (limit and len(items) >= limit):
+            return items
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def ohlcv(items):
+    """(timestamp, open, high, low, close, volume, count) de items crudos o rollups"""
+    for item in items:
+        close = item.get('close', item['price'])
+        yield (int(item['timestamp']), item.get('open', close), item.get('high', close), item.get('low', close),
+               close, int(item.get('volume') or 0), int(item.get('count', 1)))
+
+def downsample(points, seconds, offset=0, sum_volume=False):
+    """
+    Agregar puntos ohlcv (ascendentes) en barras OHLCV de seconds segundos
+    
+    volume es acumulado del día en los puntos crudos (máximo por barra) y
+    diario en los rollups (suma por barra).
+    """
+    bars = []
+    
+    for timestamp, point_open, high, low, close, volume, count in points:
+        start = timestamp - (timestamp + offset) % seconds
+        
+        if not bars or bars[-1]['timestamp'] != start:
+            bars.append({
+                'timestamp': start,
+                'date': datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                'open': point_open,
+                'high': high,
+                'low': low,
+                'close': close,
+                'price': close,
+                'volume': volume,
+                'count': count
+            })
+            continue
+        
+        bar = bars[-1]
+        bar['high'] = max(bar['high'], high)
+        bar['low'] = min(bar['low'], low)
+        bar['close'] = bar['price'] = close
+        bar['volume'] = bar['volume'] + volume if sum_volume else max(bar['volume'], volume)
+        bar['count'] += count
+    
+    return bars
+
+def fold_tail(symbol, tail):
+    """
+    Rollups diarios de la cola cruda (ascendente), con las mismas reglas que
+    usa el writer (merge_rollup), para que el último día salga como una barra más
+    """
+    rollups = {}
+    for item in tail:
+        day = trading_day_of(item)
+        merge_rollup(rollups.setdefault(day, new_rollup(symbol, day)), item)
+    return [rollups[day] for day in sorted(rollups)]
+
+def read_packed(target_table, symbol, start_time, end_time):
+    """
+    Columnas ascendentes de los chunks que tocan [start_time, end_time]
+    
+    Returns:
+        tuple: (columns or None, head: items crudos anteriores al primer chunk
+                (más reciente primero), tail_start: desde dónde leer la cola cruda,
+                chunks_read)
+    """
+    chunks = query_chunks(target_table, symbol, start_time, end_time)
+    if not chunks:
+        return None, [], start_time, 0
+    
+    parts = [unpack_chunk(chunk_bytes(chunk['data'])) for chunk in chunks]
+    if numpy is not None:
+        timestamps, prices, volumes = (numpy.concatenate(column) for column in zip(*parts))
+    else:
+        timestamps, prices, volumes = array('q'), array('d'), array('q')
+        for part_timestamps, part_prices, part_volumes in parts:
+            timestamps.extend(part_timestamps)
+            prices.extend(part_prices)
+            volumes.extend(part_volumes)
+    
+    low = bisect.bisect_left(timestamps, start_time)
+    high = bisect.bisect_right(timestamps, end_time)
+    columns = (timestamps[low:high], prices[low:high], volumes[low:high])
+    
+    # Puntos de antes del primer chunk (ventanas todavía sin empaquetar)
+    head = []
+    if int(chunks[0]['timestamp']) > start_time:
+        head = query_partition(target_table, symbol, start_time, int(chunks[0]['timestamp']) - 1, newest_first=True)
+    
+    tail_start = int(chunks[-1]['timestamp']) + int(chunks[-1]['window_seconds'])
+    return columns, head, max(start_time, tail_start), len(chunks)
+
+def read_points(target_table, symbol, start_time, end_time):
+    """
+    Puntos ascendentes de [start_time, end_time]: crudos y, con CHUNK_STORAGE,
+    los de las ventanas empaquetadas (que pueden no tener ya puntos crudos)
+    """
+    if not CHUNK_STORAGE:
+        return query_partition(target_table, symbol, start_time, end_time)
+    
+    columns, head, tail_start, _ = read_packed(target_table, symbol, start_time, end_time)
+    items = query_partition(target_table, symbol, tail_start, end_time)
+    if columns is None:
+        return items
+    return head[::-1] + packed_rows(symbol, columns)[::-1] + items
+
+def packed_ohlcv(columns):
+    """(timestamp, open, high, low, close, volume, count) de columnas empaquetadas"""
+    for timestamp, price, volume in zip(*columns):
+        yield int(timestamp), price, price, price, price, int(volume), 1
+
+def packed_rows(symbol, columns, limit=None):
+    """Filas (más reciente primero) de columnas empaquetadas; solo se arman las que entran en limit"""
+    timestamps, prices, volumes = columns
+    count = len(timestamps) if limit is None else min(limit, len(timestamps))
+    rows = []
+    
+    for index in range(len(timestamps) - 1, len(timestamps) - 1 - count, -1):
+        timestamp = int(timestamps[index])
+        rows.append({
+            'symbol': symbol,
+            'timestamp': timestamp,
+            'date': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+            'price': round(float(prices[index]), 4),
+            'volume': int(volumes[index])
+        })
+    
+    return rows
+
+def query_history(target_table, symbol, start_time, end_time, resolution, limit=None):
+    """
+    Leer el histórico con la resolución del plan (más reciente primero)
+    
+    1d / 1w leen los rollups diarios; la cola cruda desde el último rollup
+    (que puede seguir abierto) se pliega en rollups con merge_rollup antes de
+    agregar, así todas las filas son barras de la misma resolución. Sin
+    rollups en la ventana se vuelve a los puntos crudos.
+    
+    Returns:
+        tuple: (items: list, plan: dict)
+    """
+    seconds, source = RESOLUTIONS[resolution]
+    plan = {'resolution': resolution, 'source': source}
+    
+    if source == 'rollup':
+        # El rollup del día empieza a las 00:00 UTC, antes del primer punto
+        rollups = query_partition(target_table, f'{symbol}{ROLLUP_SUFFIX}', start_time - 86400, end_time)
+        rollups = [item for item in rollups if int(item.get('close_ts', item['timestamp'])) >= start_time]
+        
+        if rollups:
+            tail = read_points(target_table, symbol, int(rollups[-1]['open_ts']), end_time)
+            days = rollups[:-1] + fold_tail(symbol, tail) if tail else rollups
+            bars = downsample(ohlcv(days), seconds, WEEK_OFFSET if resolution == '1w' else 0, sum_volume=True)
+            for bar in bars:
+                bar.update(symbol=symbol, resolution=resolution)
+            plan.update(items_read=len(rollups) + len(tail), tail_points=len(tail))
+            return bars[::-1][:limit], plan
+        
+        print(f"⚠️ No daily rollups for {symbol}, falling back to raw points")
+        resolution, seconds = 'raw', 0
+        plan.update(resolution='raw', source='raw', fallback=True)
+    
+    # Con chunks: ventanas cerradas empaquetadas + cola cruda después del último chunk
+    columns, head, tail_start, chunks_read = None, [], start_time, 0
+    if CHUNK_STORAGE:
+        columns, head, tail_start, chunks_read = read_packed(target_table, symbol, start_time, end_time)
+    
+    items = query_partition(target_table, symbol, tail_start, end_time, newest_first=True,
+                            limit=None if seconds else limit)
+    plan['items_read'] = len(items) + len(head) + chunks_read
+    if columns is not None:
+        plan.update(chunks_read=chunks_read, packed_points=len(columns[0]))
+    
+    if seconds:
+        points = chain(ohlcv(head[::-1]), packed_ohlcv(columns) if columns is not None else (), ohlcv(items[::-1]))
+        bars = downsample(points, seconds)
+        for bar in bars:
+            bar.update(symbol=symbol, resolution=resolution)
+        items = bars[::-1]
+    elif columns is not None:
+        remaining = None if not limit else max(0, limit - len(items))
+        items = items + packed_rows(symbol, columns, remaining) + head
+    return items[:limit], plan
@@ -0,0 +1,93 @@
+"""
+Item '<SYMBOL>#LATEST' (timestamp 0) con la última cotización de cada símbolo
+
+Lleva as_of = timestamp del punto y registry = 'SYMBOLS' (partición del GSI
+disperso SymbolRegistry que lee getPortfolio).
+"""
+
+from botocore.exceptions import ClientError
+
+LATEST_SUFFIX = '#LATEST'
+REGISTRY_KEY = 'SYMBOLS'
+
+# Un LATEST más nuevo nunca se pisa con un punto más viejo (llegadas tardías o fuera de orden)
+LATEST_CONDITION = 'attribute_not_exists(as_of) OR as_of <= :as_of'
+
+def latest_key(symbol):
+    """Key del item LATEST: '<SYMBOL>#LATEST' + timestamp 0"""
+    return {'symbol': f'{symbol}{LATEST_SUFFIX}', 'timestamp': 0}
+
+def latest_item(item):
+    """Item LATEST de un punto crudo: sus mismos atributos + as_of y la partición del registro"""
+    return dict(item, **latest_key(item['symbol']), as_of=int(item['timestamp']), registry=REGISTRY_KEY)
+
+def put_with_latest(target_table, item):
+    """
+    Escribir un punto crudo y su LATEST en una sola transacción
+    
+    Si el LATEST ya es más nuevo la transacción se cancela por su condición y
+    el punto se escribe solo (sigue siendo histórico válido).
+    
+    Returns:
+        bool: True si el LATEST quedó actualizado
+    """
+    try:
+        target_table.meta.client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': target_table.name, 'Item': item}},
+            {'Put': {
+                'TableName': target_table.name,
+                'Item': latest_item(item),
+                'ConditionExpression': LATEST_CONDITION,
+                'ExpressionAttributeValues': {':as_of': int(item['timestamp'])}
+            }}
+        ])
+        return True
+    except ClientError as e:
+        reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+        if e.response['Error']['Code'] != 'TransactionCanceledException' or reasons[1:] != ['ConditionalCheckFailed']:
+            raise
+    
+    print(f"⏪ {item['symbol']} point at {item['timestamp']} is older than LATEST, stored as history only")
+    target_table.put_item(Item=item)
+    return False
+
+def update_latest(target_table, items):
+    """
+    Avanzar los LATEST con los items de un BatchWriteItem ya escrito
+    
+    BatchWriteItem no es transaccional: se hace un PutItem condicional por
+    símbolo con su punto más nuevo, después de que el lote quedó escrito.
+    
+    Returns:
+        dict: {'updated', 'skipped', 'failed'}
+    """
+    stats = {'updated': 0, 'skipped': 0, 'failed': 0}
+    if target_table is None:
+        return stats
+    
+    newest = {}
+    for item in items:
+        if '#' in item['symbol']:
+            continue
+        if item['symbol'] not in newest or int(item['timestamp']) > int(newest[item['symbol']]['timestamp']):
+            newest[item['symbol']] = item
+    
+    for symbol, item in newest.items():
+        try:
+            target_table.put_item(
+                Item=latest_item(item),
+                ConditionExpression=LATEST_CONDITION,
+                ExpressionAttributeValues={':as_of': int(item['timestamp'])}
+            )
+            stats['updated'] += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                stats['skipped'] += 1
+                continue
+            print(f"⚠️ LATEST update failed for {symbol}: {str(e)}")
+            stats['failed'] += 1
+        except Exception as e:
+            print(f"⚠️ LATEST update failed for {symbol}: {str(e)}")
+            stats['failed'] += 1
+    
+    return stats
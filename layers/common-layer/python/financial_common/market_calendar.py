@@ -0,0 +1,195 @@
+"""
+Calendario de mercado de NYSE/Nasdaq
+
+Días de trading, feriados por regla y horario de Nueva York (EST/EDT)
+calculado a mano, sin depender de tzdata en el runtime.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+def nth_weekday(year, month, weekday, n):
+    """n-ésimo día de la semana (0 = lunes) del mes; n = -1 para el último"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def easter_sunday(year):
+    """Domingo de Pascua (algoritmo gregoriano anónimo), para Good Friday"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (b - (b + 8) // 25 + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def observed(day):
+    """Feriado en sábado se observa el viernes; en domingo, el lunes"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+def eastern_offset(moment):
+    """
+    Offset UTC de Nueva York en un instante UTC
+    
+    EDT (-4) desde el 2º domingo de marzo a las 2:00 EST hasta el 1º domingo
+    de noviembre a las 2:00 EDT; EST (-5) el resto. Calculado a mano para no
+    depender de tzdata en el runtime.
+    """
+    year = moment.year
+    dst_start = datetime.combine(nth_weekday(year, 3, 6, 2), datetime.min.time(), timezone.utc) + timedelta(hours=7)
+    dst_end = datetime.combine(nth_weekday(year, 11, 6, 1), datetime.min.time(), timezone.utc) + timedelta(hours=6)
+    return timedelta(hours=-4) if dst_start <= moment < dst_end else timedelta(hours=-5)
+
+class TradingCalendar:
+    """
+    Calendario de NYSE/Nasdaq: sesión regular 9:30-16:00 ET, fines de semana,
+    feriados por regla (con día observado) y cierres anticipados a las 13:00
+    
+    Los cierres extraordinarios (duelo nacional, etc.) se agregan con
+    extra_holidays (fechas ISO).
+    """
+    
+    OPEN = (9, 30)
+    CLOSE = (16, 0)
+    EARLY_CLOSE = (13, 0)
+    
+    def __init__(self, extra_holidays=(), refresh_interval_minutes=60, end_of_day=True):
+        self.extra_holidays = {date.fromisoformat(d) for d in extra_holidays}
+        self.refresh_interval = timedelta(minutes=refresh_interval_minutes)
+        self.end_of_day = end_of_day
+        self.years = {}
+    
+    def _year(self, year):
+        """Feriados y cierres anticipados del año (calculados una vez por contenedor)"""
+        if year in self.years:
+            return self.years[year]
+        
+        rules = {
+            observed(date(year, 1, 1)): "New Year's Day",
+            nth_weekday(year, 1, 0, 3): 'Martin Luther King Jr. Day',
+            nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+            easter_sunday(year) - timedelta(days=2): 'Good Friday',
+            nth_weekday(year, 5, 0, -1): 'Memorial Day',
+            observed(date(year, 7, 4)): 'Independence Day',
+            nth_weekday(year, 9, 0, 1): 'Labor Day',
+            nth_weekday(year, 11, 3, 4): 'Thanksgiving Day',
+            observed(date(year, 12, 25)): 'Christmas Day'
+        }
+        if year >= 2022:
+            rules[observed(date(year, 6, 19))] = 'Juneteenth'
+        
+        # NYSE no cierra el viernes 31 de diciembre por un Año Nuevo en sábado
+        holidays = {day: name for day, name in rules.items() if day.year == year}
+        holidays.update({day: 'Special closure' for day in self.extra_holidays if day.year == year})
+        
+        candidates = [
+            date(year, 7, 3),
+            nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+            date(year, 12, 24)
+        ]
+        early_closes = {
+            day for day in candidates
+            if day.weekday() < 5 and day not in holidays
+            # El 3 de julio solo cierra temprano si el 4 cae en día hábil
+            and not (day.month == 7 and day.weekday() == 4)
+        }
+        
+        self.years[year] = (holidays, early_closes)
+        return self.years[year]
+    
+    def holiday(self, day):
+        return self._year(day.year)[0].get(day)
+    
+    def session(self, day):
+        """
+        Returns:
+            tuple or None: (open, close, early_close) en UTC, None si no hay sesión
+        """
+        if day.weekday() >= 5 or self.holiday(day):
+            return None
+        
+        early = day in self._year(day.year)[1]
+        offset = eastern_offset(datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc))
+        
+        def at(hour_minute):
+            return datetime(day.year, day.month, day.day, *hour_minute, tzinfo=timezone.utc) - offset
+        
+        return at(self.OPEN), at(self.EARLY_CLOSE if early else self.CLOSE), early
+    
+    def status(self, now=None):
+        """
+        Estado del mercado y cuándo se esperan datos nuevos
+        
+        Returns:
+            dict: is_open, reason, sesión de hoy, last_close, next_open,
+                  next_close y next_fresh_data (ISO 8601 UTC)
+        """
+        now = now or datetime.now(timezone.utc)
+        today = (now + eastern_offset(now)).date()
+        today_session = self.session(today)
+        
+        last_session = next_session = None
+        for days in range(0, 15):
+            day = today - timedelta(days=days)
+            session = self.session(day)
+            if session and session[1] <= now:
+                last_session = (day, session)
+                break
+        for days in range(0, 15):
+            day = today + timedelta(days=days)
+            session = self.session(day)
+            if session and session[1] > now:
+                next_session = (day, session)
+                break
+        
+        is_open = today_session is not None and today_session[0] <= now < today_session[1]
+        holiday = self.holiday(today)
+        if is_open:
+            reason = 'open'
+        elif holiday:
+            reason = 'holiday'
+        elif today.weekday() >= 5:
+            reason = 'weekend'
+        elif today_session and now < today_session[0]:
+            reason = 'pre_market'
+        else:
+            reason = 'after_hours'
+        
+        next_open, next_close = next_session[1][0], next_session[1][1]
+        last_close = last_session[1][1]
+        
+        # Abierto: el próximo run; recién cerrado: el refresh de cierre; si no, la apertura
+        if is_open:
+            next_fresh_data = now + self.refresh_interval
+        elif self.end_of_day and now < last_close + self.refresh_interval:
+            next_fresh_data = last_close + self.refresh_interval
+        else:
+            next_fresh_data = next_open
+        
+        return {
+            'exchange': 'XNYS',
+            'now': now.isoformat(),
+            'is_open': is_open,
+            'reason': reason,
+            'holiday': holiday,
+            'early_close': bool(today_session and today_session[2]),
+            'session': {
+                'date': today.isoformat(),
+                'open': today_session[0].isoformat(),
+                'close': today_session[1].isoformat()
+            } if today_session else None,
+            'last_session': last_session[0].isoformat(),
+            'last_close': last_close.isoformat(),
+            'next_open': next_open.isoformat() if not is_open else None,
+            'next_close': next_close.isoformat(),
+            'next_fresh_data': next_fresh_data.isoformat()
+        }
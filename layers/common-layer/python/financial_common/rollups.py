@@ -0,0 +1,133 @@
+"""
+Rollups diarios OHLCV ('<SYMBOL>#1D' + 00:00 UTC del día de trading)
+
+Los mantienen fetchRealTimePrice y saveStockPrice al escribir; los leen
+getHistoricalPrices y getStockHistory.
+"""
+
+from botocore.exceptions import ClientError
+from decimal import Decimal
+from datetime import date, datetime, timezone
+
+from financial_common.market_calendar import eastern_offset
+
+ROLLUP_SUFFIX = '#1D'
+ROLLUP_MAX_RETRIES = 3
+
+def rollup_key(symbol, day):
+    """Key del rollup diario: '<SYMBOL>#1D' + 00:00 UTC del día de trading"""
+    return {
+        'symbol': f'{symbol}{ROLLUP_SUFFIX}',
+        'timestamp': int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    }
+
+def trading_day_of(item):
+    """Día de trading de un punto crudo: latest_trading_day del proveedor o su fecha en Nueva York"""
+    if item.get('latest_trading_day'):
+        try:
+            return date.fromisoformat(str(item['latest_trading_day'])[:10])
+        except ValueError:
+            pass
+    moment = datetime.fromtimestamp(int(item['timestamp']), timezone.utc)
+    return (moment + eastern_offset(moment)).date()
+
+def new_rollup(symbol, day):
+    return dict(rollup_key(symbol, day), date=day.isoformat(), resolution='1D')
+
+def merge_rollup(rollup, item):
+    """
+    Agregar un punto crudo a un rollup diario, sin importar el orden de llegada
+    
+    open/close salen del punto más viejo/más nuevo (open_ts/close_ts), high/low
+    son máximo/mínimo (las velas del backfill aportan su propio open/high/low)
+    y volume es el máximo: GLOBAL_QUOTE y las velas diarias traen el volumen
+    acumulado del día.
+    """
+    close = Decimal(str(item['price']))
+    point_open = Decimal(str(item.get('open', close)))
+    high = Decimal(str(item.get('high', close)))
+    low = Decimal(str(item.get('low', close)))
+    timestamp = int(item['timestamp'])
+    volume = int(item.get('volume') or 0)
+    
+    if not rollup.get('count'):
+        rollup.update(open=point_open, high=high, low=low, close=close, price=close, volume=volume,
+                      count=1, open_ts=timestamp, close_ts=timestamp)
+        return rollup
+    
+    if timestamp < int(rollup['open_ts']):
+        rollup['open'], rollup['open_ts'] = point_open, timestamp
+    if timestamp >= int(rollup['close_ts']):
+        rollup['close'] = rollup['price'] = close
+        rollup['close_ts'] = timestamp
+    rollup['high'] = max(Decimal(str(rollup['high'])), high)
+    rollup['low'] = min(Decimal(str(rollup['low'])), low)
+    rollup['volume'] = max(int(rollup['volume']), volume)
+    rollup['count'] = int(rollup['count']) + 1
+    return rollup
+
+def update_rollups(target_table, items, max_retries=ROLLUP_MAX_RETRIES):
+    """
+    Mantener los rollups diarios de items crudos recién escritos
+    
+    Agrupa por (símbolo, día) y hace un GetItem + PutItem condicional sobre
+    version por grupo; un conflicto con otra escritura concurrente se
+    reintenta releyendo. Best-effort: lo que falle se corrige con
+    {"mode": "rollup_rebuild"} de fetchRealTimePrice.
+    
+    Returns:
+        dict: {'updated', 'conflicts', 'failed'}
+    """
+    stats = {'updated': 0, 'conflicts': 0, 'failed': 0}
+    if target_table is None:
+        return stats
+    
+    groups = {}
+    for item in items:
+        if '#' in item['symbol']:
+            continue
+        groups.setdefault((item['symbol'], trading_day_of(item)), []).append(item)
+    
+    for (symbol, day), points in groups.items():
+        key = rollup_key(symbol, day)
+        for attempt in range(max_retries):
+            try:
+                current = target_table.get_item(Key=key, ConsistentRead=True).get('Item')
+                rollup = dict(current) if current else new_rollup(symbol, day)
+                for point in points:
+                    merge_rollup(rollup, point)
+                
+                version = int(rollup.get('version', 0))
+                rollup['version'] = version + 1
+                rollup['updated_at'] = datetime.now().isoformat()
+                
+                if current:
+                    target_table.put_item(
+                        Item=rollup,
+                        ConditionExpression='version = :version',
+                        ExpressionAttributeValues={':version': version}
+                    )
+                else:
+                    target_table.put_item(
+                        Item=rollup,
+                        ConditionExpression='attribute_not_exists(#symbol)',
+                        ExpressionAttributeNames={'#symbol': 'symbol'}
+                    )
+                stats['updated'] += 1
+                break
+            except ClientError as e:
+                if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                    stats['conflicts'] += 1
+                    continue
+                print(f"⚠️ Rollup update failed for {symbol} {day}: {str(e)}")
+                stats['failed'] += 1
+                break
+            except Exception as e:
+                print(f"⚠️ Rollup update failed for {symbol} {day}: {str(e)}")
+                stats['failed'] += 1
+                break
+        else:
+            print(f"⚠️ Rollup for {symbol} {day} kept conflicting, left for rebuild")
+            stats['failed'] += 1
+    
+    return stats
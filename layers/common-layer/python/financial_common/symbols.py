@@ -0,0 +1,31 @@
+"""
+Formato de símbolos de FinancialData
+
+Los símbolos son 1-5 letras; '#' separa las particiones derivadas
+('AAPL#1D', 'AAPL#LATEST', ...) y nunca puede venir de un request.
+"""
+
+SYMBOL_WIDTH = 5
+
+def validate_symbol_format(symbol):
+    """
+    Validar el formato de un símbolo de acción
+    
+    Returns:
+        tuple: (True, símbolo normalizado) o (False, mensaje de error)
+    """
+    if not symbol:
+        return False, "Symbol is required"
+    
+    if not isinstance(symbol, str):
+        return False, "Symbol must be a string"
+    
+    symbol = symbol.strip().upper()
+    
+    if len(symbol) < 1 or len(symbol) > SYMBOL_WIDTH:
+        return False, f"Symbol must be 1-{SYMBOL_WIDTH} characters"
+    
+    if not symbol.isalpha():
+        return False, "Symbol must contain only letters"
+    
+    return True, symbol
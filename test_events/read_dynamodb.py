@@ -17,6 +17,10 @@ REGION = "us-east-1"
 dynamodb = boto3.resource('dynamodb', region_name=REGION)
 table = dynamodb.Table(TABLE_NAME)
 
+def is_price_item(item):
+    """Solo puntos crudos: fuera los items derivados (#1D, #LATEST, #CHUNK, ...)"""
+    return '#' not in item['symbol']
+
 def decimal_to_float(obj):
     """Convertir Decimal a float para JSON serialization"""
     if isinstance(obj, Decimal):
@@ -28,7 +32,7 @@ def scan_all_items():
     print("🔍 Escaneando toda la tabla...\n")
     
     response = table.scan()
-    items = response['Items']
+    items = [item for item in response['Items'] if is_price_item(item)]
     
     print(f"📊 Total de items encontrados: {len(items)}\n")
     print("=" * 80)
@@ -107,7 +111,7 @@ def get_all_symbols():
         ProjectionExpression='symbol'
     )
     
-    symbols = set(item['symbol'] for item in response['Items'])
+    symbols = set(item['symbol'] for item in response['Items'] if is_price_item(item))
     
     print(f"✅ Símbolos encontrados: {', '.join(sorted(symbols))}")
     print(f"   Total: {len(symbols)} símbolos\n")
@@ -119,7 +123,7 @@ def export_to_json(filename='evidencias/dynamodb_data.json'):
     print(f"\n💾 Exportando datos a {filename}...\n")
     
     response = table.scan()
-    items = response['Items']
+    items = [item for item in response['Items'] if is_price_item(item)]
     
     # Crear directorio si no existe
     import os
@@ -1,12 +1,19 @@
 """
 Test de conexión con Alpha Vantage API
-Ejecutar: python3 tests/test_alpha_vantage.py
+Ejecutar: python3 test_events/test_alpha_vantage.py
+
+Usa el mismo cliente HTTP (pool keep-alive + retries) que fetchRealTimePrice
 """
 
+import os
 import requests
 import json
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'lambda_functions', 'fetchRealTimePrice'))
+from http_client import http_client
+
 # TODO: Reemplazar con tu API Key real de Alpha Vantage
 API_KEY = "8WZM1HVQYVHLQY57"  # Cambiar después de registrarte
 SYMBOL = "IBM"
@@ -30,7 +37,7 @@ def test_alpha_vantage_connection():
     print(f"📦 Params: {params}\n")
     
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params)
         response.raise_for_status()
         
         data = response.json()
@@ -0,0 +1,185 @@
+"""
+Tests unitarios offline (sin AWS ni red): python -m pytest -q
+
+Agrega al path el layer common-layer, como lo hace Lambda con /opt/python, y
+los módulos de fetchRealTimePrice.
+"""
+
+import os
+import sys
+
+import pytest
+from botocore.exceptions import ClientError
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+sys.path.insert(0, os.path.join(ROOT, 'layers', 'common-layer', 'python'))
+sys.path.append(os.path.join(ROOT, 'lambda_functions', 'fetchRealTimePrice'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+# Los módulos de fetchRealTimePrice arman sus limiters al importarse: sin ledger en DynamoDB
+os.environ.setdefault('QUOTA_LEDGER', 'false')
+
+class QueryTable:
+    """
+    Tabla DynamoDB en memoria con put_item (y la condición de los LATEST),
+    get_item, delete_item, batch_write_item, batch_get_item y
+    transact_write_items (via meta.client), query (KeyConditionExpression de
+    boto3, también sobre el GSI SymbolRegistry) y scan; los dos últimos
+    paginan de a page_size items cuando se fija
+    """
+    
+    name = 'FinancialData'
+    
+    def __init__(self):
+        self.items = {}
+        self.queries = []
+        self.page_size = None
+        self.meta = type('Meta', (), {'client': self})()
+    
+    def condition_holds(self, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        if ConditionExpression != 'attribute_not_exists(as_of) OR as_of <= :as_of':
+            return True
+        current = self.items.get((Item['symbol'], int(Item['timestamp'])))
+        return current is None or 'as_of' not in current or current['as_of'] <= ExpressionAttributeValues[':as_of']
+    
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        if not self.condition_holds(Item, ConditionExpression, ExpressionAttributeValues):
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'Condition failed'}}, 'PutItem')
+        self.items[(Item['symbol'], int(Item['timestamp']))] = dict(Item)
+    
+    def transact_write_items(self, TransactItems, **kwargs):
+        puts = [request['Put'] for request in TransactItems]
+        reasons = [{'Code': 'None' if self.condition_holds(put['Item'], put.get('ConditionExpression'),
+                                                           put.get('ExpressionAttributeValues')) else 'ConditionalCheckFailed'}
+                   for put in puts]
+        if any(reason['Code'] != 'None' for reason in reasons):
+            raise ClientError({'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                               'CancellationReasons': reasons}, 'TransactWriteItems')
+        for put in puts:
+            self.put_item(put['Item'])
+    
+    def get_item(self, Key, **kwargs):
+        item = self.items.get((Key['symbol'], int(Key['timestamp'])))
+        return {'Item': item} if item else {}
+    
+    def delete_item(self, Key, **kwargs):
+        self.items.pop((Key['symbol'], int(Key['timestamp'])), None)
+    
+    def batch_write_item(self, RequestItems, **kwargs):
+        for request in RequestItems[self.name]:
+            if 'DeleteRequest' in request:
+                self.delete_item(request['DeleteRequest']['Key'])
+            else:
+                self.put_item(request['PutRequest']['Item'])
+        return {'UnprocessedItems': {}}
+    
+    def batch_get_item(self, RequestItems, **kwargs):
+        found = [self.get_item(key).get('Item') for key in RequestItems[self.name]['Keys']]
+        return {'Responses': {self.name: [item for item in found if item]}, 'UnprocessedKeys': {}}
+    
+    def paginate(self, items, ExclusiveStartKey=None):
+        keys = [(item['symbol'], int(item['timestamp'])) for item in items]
+        start = keys.index((ExclusiveStartKey['symbol'], int(ExclusiveStartKey['timestamp']))) + 1 if ExclusiveStartKey else 0
+        page = items[start:start + self.page_size] if self.page_size else items[start:]
+        response = {'Items': [dict(item) for item in page]}
+        if start + len(page) < len(items):
+            response['LastEvaluatedKey'] = {'symbol': page[-1]['symbol'], 'timestamp': page[-1]['timestamp']}
+        return response
+    
+    def scan(self, ExclusiveStartKey=None, **kwargs):
+        items = sorted(self.items.values(), key=lambda item: (item['symbol'], int(item['timestamp'])))
+        return self.paginate(items, ExclusiveStartKey)
+    
+    def query(self, KeyConditionExpression, ScanIndexForward=True, Limit=None, IndexName=None,
+              ExclusiveStartKey=None, **kwargs):
+        if IndexName == 'SymbolRegistry':
+            # GSI disperso (registry, symbol): solo los items LATEST
+            registry = KeyConditionExpression.get_expression()['values'][1]
+            items = sorted((item for item in self.items.values() if item.get('registry') == registry),
+                           key=lambda item: item['symbol'])
+            return self.paginate(items, ExclusiveStartKey)
+        
+        expression = KeyConditionExpression.get_expression()
+        if expression['operator'] == '=':
+            # Solo la partición
+            partition = expression['values'][1]
+            low, high = float('-inf'), float('inf')
+        else:
+            partition_condition, range_condition = expression['values']
+            partition = partition_condition.get_expression()['values'][1]
+            low, high = self.range_bounds(range_condition.get_expression())
+        self.queries.append((partition, low, high))
+        
+        items = sorted((item for (symbol, timestamp), item in self.items.items()
+                        if symbol == partition and low <= timestamp <= high),
+                       key=lambda item: int(item['timestamp']), reverse=not ScanIndexForward)
+        return {'Items': items[:Limit] if Limit else items}
+    
+    @staticmethod
+    def range_bounds(range_expression):
+        if range_expression['operator'] == 'BETWEEN':
+            return tuple(range_expression['values'][1:])
+        if range_expression['operator'] == '<':
+            return float('-inf'), range_expression['values'][1] - 1
+        return range_expression['values'][1], float('inf')
+
+@pytest.fixture
+def price_table():
+    return QueryTable()
+
+class StateTable:
+    """
+    Tabla de estado (pk, sk) en memoria: get_item, put_item con las condiciones
+    que usa el código (attribute_not_exists(pk) / updated_at = :previous),
+    update_item 'ADD campo :valor [SET a = :b, ...]', delete_item y query por pk
+    """
+    
+    def __init__(self):
+        self.items = {}
+    
+    @staticmethod
+    def key(item):
+        return (item['pk'], item['sk'])
+    
+    @staticmethod
+    def conditional_failure(operation):
+        return ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'Condition failed'}}, operation)
+    
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(self.key(Key))
+        return {'Item': dict(item)} if item else {}
+    
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        current = self.items.get(self.key(Item))
+        if ConditionExpression == 'attribute_not_exists(pk)' and current is not None:
+            raise self.conditional_failure('PutItem')
+        if ConditionExpression == 'updated_at = :previous' and (
+                current is None or current.get('updated_at') != ExpressionAttributeValues[':previous']):
+            raise self.conditional_failure('PutItem')
+        self.items[self.key(Item)] = dict(Item)
+    
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ConditionExpression=None, **kwargs):
+        if ConditionExpression == 'attribute_exists(pk)' and self.key(Key) not in self.items:
+            raise self.conditional_failure('UpdateItem')
+        item = self.items.setdefault(self.key(Key), dict(Key))
+        add, _, assignments = UpdateExpression.partition(' SET ')
+        _, field, placeholder = add.split()[:3]
+        value = ExpressionAttributeValues[placeholder]
+        item[field] = item.get(field, set()) | value if isinstance(value, set) else item.get(field, 0) + value
+        for assignment in filter(None, assignments.split(',')):
+            name, placeholder = [part.strip() for part in assignment.split('=')]
+            item[name] = ExpressionAttributeValues[placeholder]
+        return {'Attributes': dict(item)}
+    
+    def delete_item(self, Key, ReturnValues=None, **kwargs):
+        item = self.items.pop(self.key(Key), None)
+        return {'Attributes': item} if item and ReturnValues == 'ALL_OLD' else {}
+    
+    def query(self, KeyConditionExpression, **kwargs):
+        pk = KeyConditionExpression.get_expression()['values'][1]
+        return {'Items': [dict(item) for (item_pk, _), item in sorted(self.items.items()) if item_pk == pk]}
+
+@pytest.fixture
+def state_table():
+    return StateTable()
@@ -0,0 +1,108 @@
+"""Backfill reanudable de TIME_SERIES_DAILY: checkpoint del rango contiguo escrito"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+import backfill
+import resources
+
+# 10 días corridos (el backfill no filtra feriados: escribe lo que traiga la serie)
+DAYS = [(date(2024, 3, 1) + timedelta(days=offset)).isoformat() for offset in range(10)]
+
+def candles(days):
+    """Velas más reciente primero, como TIME_SERIES_DAILY"""
+    for day in sorted(days, reverse=True):
+        close = 100 + DAYS.index(day)
+        yield {'date': day, 'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close, 'volume': 1000}
+
+class SeriesProvider:
+    name = 'alpha_vantage'
+    
+    def __init__(self, days):
+        self.days = days
+        self.requests = []
+    
+    def get_daily_series(self, symbol, outputsize='full'):
+        self.requests.append(outputsize)
+        return candles(self.days if outputsize == 'full' else self.days[-3:])
+
+class Context:
+    """Contexto de Lambda al que le queda tiempo para `calls` consultas"""
+    
+    def __init__(self, calls):
+        self.calls = calls
+    
+    def get_remaining_time_in_millis(self):
+        self.calls -= 1
+        return 60000 if self.calls >= 0 else 1000
+
+@pytest.fixture
+def tables(monkeypatch, price_table, state_table):
+    monkeypatch.setattr(resources, 'table', price_table)
+    monkeypatch.setattr(resources, 'state_table', state_table)
+    monkeypatch.setattr(backfill, 'provider_rate_limiter', type('Unlimited', (), {'acquire': lambda self: 0})())
+    monkeypatch.setattr(backfill, 'BACKFILL_CHUNK_SIZE', 4)
+    monkeypatch.setattr(backfill, 'after_batch_write', lambda items: None)
+    return price_table
+
+def use_series(monkeypatch, days):
+    provider = SeriesProvider(days)
+    monkeypatch.setattr(backfill, 'provider', provider)
+    return provider
+
+def stored_days(table):
+    return sorted(item['latest_trading_day'] for (symbol, _), item in table.items.items() if symbol == 'AAPL')
+
+def test_full_backfill(monkeypatch, tables):
+    use_series(monkeypatch, DAYS)
+    
+    result = backfill.backfill_symbol('AAPL')
+    
+    assert result['status'] == 'complete' and result['written'] == 10
+    assert stored_days(tables) == DAYS
+    assert backfill.get_backfill_checkpoint('AAPL')['oldest_written'] == DAYS[0]
+    second = next(item for item in tables.items.values() if item['latest_trading_day'] == DAYS[1])
+    assert second['change'] == Decimal(1) and second['change_percent'] == Decimal('1.0000')
+
+def test_interrupted_backfill_resumes_where_it_stopped(monkeypatch, tables):
+    use_series(monkeypatch, DAYS)
+    
+    first = backfill.backfill_symbol('AAPL', context=Context(calls=1))
+    assert first['status'] == 'partial' and first['written'] == 8
+    assert (first['newest_written'], first['oldest_written']) == (DAYS[9], DAYS[2])
+    
+    second = backfill.backfill_symbol('AAPL')
+    assert second['status'] == 'complete'
+    assert second['written'] == 2 and second['skipped'] == 8
+    assert stored_days(tables) == DAYS
+
+def test_completed_backfill_only_adds_new_days(monkeypatch, tables):
+    use_series(monkeypatch, DAYS[:8])
+    backfill.backfill_symbol('AAPL')
+    
+    provider = use_series(monkeypatch, DAYS)
+    result = backfill.backfill_symbol('AAPL')
+    
+    assert provider.requests == ['compact']
+    assert result['status'] == 'complete' and result['written'] == 2 and result['skipped'] == 1
+    assert backfill.get_backfill_checkpoint('AAPL')['newest_written'] == DAYS[9]
+
+def test_gap_before_the_stored_range_needs_a_full_series(monkeypatch, tables):
+    use_series(monkeypatch, DAYS[:3])
+    backfill.backfill_symbol('AAPL')
+    
+    use_series(monkeypatch, DAYS)
+    result = backfill.backfill_symbol('AAPL')
+    
+    assert result['status'] == 'partial' and 'Gap' in result['message']
+    assert backfill.get_backfill_checkpoint('AAPL')['status'] == 'partial'
+
+def test_run_backfill_returns_what_is_left(monkeypatch, tables):
+    use_series(monkeypatch, DAYS)
+    
+    summary = backfill.run_backfill(['AAPL', 'MSFT', 'BAD#1D'], context=Context(calls=2))
+    
+    assert [result['status'] for result in summary['results']] == ['partial']
+    assert summary['remaining'] == ['AAPL', 'MSFT', 'BAD#1D']
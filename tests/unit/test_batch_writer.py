@@ -0,0 +1,88 @@
+"""BatchWriter: lotes de 25, reintento de UnprocessedItems y resultado por item"""
+
+import pytest
+
+from financial_common import batch_writer
+from financial_common.batch_writer import BatchWriter
+
+class FlakyTable:
+    """Tabla cuyo BatchWriteItem devuelve como UnprocessedItems lo que el test indique"""
+    
+    name = 'FinancialData'
+    
+    def __init__(self, unprocessed_rounds):
+        self.unprocessed_rounds = list(unprocessed_rounds)
+        self.calls = []
+        self.written = {}
+        self.meta = type('Meta', (), {'client': self})()
+    
+    def batch_write_item(self, RequestItems):
+        requests = RequestItems[self.name]
+        self.calls.append(len(requests))
+        skip = self.unprocessed_rounds.pop(0) if self.unprocessed_rounds else 0
+        unprocessed, processed = requests[:skip], requests[skip:]
+        for request in processed:
+            item = request['PutRequest']['Item']
+            self.written[(item['symbol'], item['timestamp'])] = item
+        return {'UnprocessedItems': {self.name: unprocessed} if unprocessed else {}}
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+    
+    def write_budget(self):
+        return self.seconds
+
+def point(index):
+    return {'symbol': f'S{index:02d}', 'timestamp': 1710000000, 'price': index}
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(batch_writer.time, 'sleep', lambda seconds: None)
+
+def test_sends_full_batches_of_25():
+    table = FlakyTable([])
+    writer = BatchWriter(table)
+    for index in range(60):
+        writer.add(point(index))
+    results = writer.flush()
+    
+    assert table.calls == [25, 25, 10]
+    assert len(results) == 60 and all(success for success, _ in results.values())
+
+def test_unprocessed_items_are_retried():
+    table = FlakyTable([3, 1])
+    written = []
+    writer = BatchWriter(table, on_written=written.extend)
+    for index in range(5):
+        writer.add(point(index))
+    results = writer.flush()
+    
+    assert table.calls == [5, 3, 1]
+    assert writer.stats == {'items': 5, 'requests': 3, 'retries': 2, 'failed': 0}
+    assert len(table.written) == 5 and len(written) == 5
+    assert all(success for success, _ in results.values())
+
+def test_items_left_unprocessed_are_reported_failed():
+    table = FlakyTable([2] * 10)
+    written = []
+    writer = BatchWriter(table, max_retries=2, on_written=written.extend)
+    for index in range(4):
+        writer.add(point(index))
+    results = writer.flush()
+    
+    assert table.calls == [4, 2, 2]
+    assert results[('S00', 1710000000)] == (False, 'Unprocessed after retries')
+    assert results[('S03', 1710000000)] == (True, None)
+    assert writer.stats['failed'] == 2
+    assert [item['symbol'] for item in written] == ['S02', 'S03']  # LATEST/rollups solo de lo escrito
+
+def test_deadline_stops_the_retries():
+    table = FlakyTable([1] * 10)
+    writer = BatchWriter(table, deadline=Deadline(0))
+    writer.add(point(0))
+    writer.add(point(1))
+    results = writer.flush()
+    
+    assert table.calls == [2]
+    assert results[('S00', 1710000000)] == (False, 'Deadline reached with unprocessed items')
@@ -0,0 +1,83 @@
+"""Circuit breaker del proveedor: closed → open → half_open y símbolos diferidos"""
+
+import pytest
+
+import breaker
+import resources
+from breaker import CircuitBreaker
+
+class Clock:
+    def __init__(self):
+        self.now = 1710000000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker.time, 'time', clock)
+    return clock
+
+@pytest.fixture
+def circuit(clock):
+    return CircuitBreaker(failure_threshold=3, cooldown_seconds=60, max_cooldown_seconds=150)
+
+def test_rate_limit_opens_immediately(circuit):
+    circuit.record({'error': 'rate_limit'})
+    
+    assert circuit.state == CircuitBreaker.OPEN and circuit.is_open()
+    assert not circuit.allow()
+    assert circuit.retry_after() == 60
+
+def test_consecutive_failures_open_at_the_threshold(circuit):
+    circuit.record({'error': 'timeout'})
+    circuit.record({'error': 'http_error'})
+    circuit.record({'error': 'invalid_symbol'})  # el proveedor respondió: se reinicia la cuenta
+    circuit.record({'error': 'timeout'})
+    circuit.record({'error': 'connection_error'})
+    assert circuit.state == CircuitBreaker.CLOSED
+    
+    circuit.record({'error': 'timeout'})
+    assert circuit.state == CircuitBreaker.OPEN
+
+def test_half_open_lets_one_probe_through(circuit, clock):
+    circuit.record({'error': 'rate_limit'})
+    clock.now += 60
+    
+    assert circuit.allow()
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    assert not circuit.allow()  # una sola llamada de prueba
+    
+    circuit.record({'symbol': 'AAPL', 'price': 173.25})
+    assert circuit.state == CircuitBreaker.CLOSED and circuit.allow()
+
+def test_failed_probe_doubles_the_cooldown_up_to_the_max(circuit, clock):
+    circuit.record({'error': 'rate_limit'})
+    for expected in [120, 150]:
+        clock.now = circuit.retry_at
+        assert circuit.allow()
+        circuit.record({'error': 'timeout'})
+        assert circuit.state == CircuitBreaker.OPEN
+        assert circuit.retry_after() == expected
+    assert circuit.snapshot()['trips'] == 3
+
+def test_late_response_does_not_close_an_open_circuit(circuit):
+    circuit.record({'error': 'rate_limit'})
+    circuit.record({'symbol': 'AAPL', 'price': 173.25})
+    assert circuit.state == CircuitBreaker.OPEN
+
+def test_deferred_symbols_wait_for_retry_at(monkeypatch, state_table, clock):
+    circuit = CircuitBreaker()
+    monkeypatch.setattr(resources, 'state_table', state_table)
+    monkeypatch.setattr(breaker, 'provider_breaker', circuit)
+    
+    breaker.save_deferred_symbols(['MSFT', 'AAPL'], clock.now + 300, 'rate_limit')
+    breaker.save_deferred_symbols(['IBM'], clock.now + 300, 'rate_limit')
+    
+    assert breaker.take_deferred_symbols() == []
+    assert circuit.is_open()  # otra instancia sigue con el circuito abierto
+    
+    clock.now += 300
+    assert breaker.take_deferred_symbols() == ['AAPL', 'IBM', 'MSFT']
+    assert breaker.take_deferred_symbols() == []
@@ -0,0 +1,58 @@
+"""Detección de cambios: no reescribir una cotización que no cambió"""
+
+import pytest
+
+import persistence
+import resources
+from ingestion import complete_symbol
+
+QUOTE = {
+    'symbol': 'AAPL', 'price': 173.25, 'volume': 8000, 'latest_trading_day': '2024-03-12',
+    'previous_close': 171.5, 'change': 1.75, 'change_percent': '1.0204', 'source': 'alpha_vantage'
+}
+
+@pytest.fixture(autouse=True)
+def table(monkeypatch, price_table):
+    monkeypatch.setattr(resources, 'table', price_table)
+    monkeypatch.setattr(persistence, 'last_quotes', {})
+    return price_table
+
+def ingest(stock_data):
+    detail, _ = complete_symbol(stock_data['symbol'], stock_data, {}, 0)
+    return detail['status']
+
+def raw_points(table):
+    return [key for key in table.items if key[0] == 'AAPL']
+
+def test_same_quote_is_written_once(table):
+    assert ingest(QUOTE) == 'success'
+    assert ingest(dict(QUOTE)) == 'unchanged'
+    assert len(raw_points(table)) == 1
+
+def test_changed_price_or_volume_is_written(table):
+    ingest(QUOTE)
+    
+    assert ingest(dict(QUOTE, volume=9000)) == 'success'
+    assert persistence.last_quotes['AAPL'] == persistence.quote_fingerprint('2024-03-12', '173.25', 9000)
+
+def test_cold_container_reads_the_latest_item(table):
+    ingest(QUOTE)
+    persistence.last_quotes.clear()
+    table.queries.clear()
+    
+    assert ingest(dict(QUOTE, change_percent='1.02')) == 'unchanged'  # solo cuentan día, precio y volumen
+    assert table.queries == []  # GetItem del LATEST, sin Query
+
+def test_lookup_failure_writes_anyway(table, monkeypatch):
+    def broken(symbol):
+        raise RuntimeError('DynamoDB unavailable')
+    monkeypatch.setattr(persistence, 'get_latest_item', broken)
+    
+    assert ingest(QUOTE) == 'success'
+
+def test_forgotten_quote_is_looked_up_again(table):
+    ingest(QUOTE)
+    persistence.forget_quote('AAPL')
+    
+    assert 'AAPL' not in persistence.last_quotes
+    assert persistence.is_unchanged_quote(QUOTE)
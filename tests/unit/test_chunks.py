@@ -0,0 +1,95 @@
+"""Chunks '<SYMBOL>#CHUNK': formato v1, lectura acotada y borrado verificado de los crudos"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from financial_common import history
+from financial_common.chunks import (CHUNK_HEADER, chunk_points, chunk_window_start, pack_chunk, query_chunks,
+                                     unpack_chunk)
+from financial_common.history import query_history
+from financial_common.rollups import merge_rollup, new_rollup
+
+import compaction
+import resources
+
+SYMBOL = 'AAPL'
+
+# 2024-03-11 (lunes) cerrado; el 2024-03-12 sigue abierto a las 00:00 UTC del 13
+DAY = 1710115200
+POINTS = [(1710163800, '170.10', 1000), (1710172800, '170.1234', None), (1710187200, '171.00', 9000)]
+OPEN_POINT = (1710250200, '171.50', 2000)
+NOW = 1710288000
+
+def point(timestamp, price, volume):
+    return {'symbol': SYMBOL, 'timestamp': timestamp, 'price': Decimal(price), 'volume': volume}
+
+@pytest.fixture
+def packed_table(price_table, monkeypatch):
+    monkeypatch.setattr(resources, 'table', price_table)
+    for values in POINTS + [OPEN_POINT]:
+        price_table.put_item(Item=point(*values))
+    return price_table
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_round_trip(compress):
+    timestamps = [timestamp for timestamp, _, _ in POINTS]
+    blob = pack_chunk(timestamps, [price for _, price, _ in POINTS], [volume for _, _, volume in POINTS], compress)
+    
+    unpacked_timestamps, prices, volumes = unpack_chunk(blob)
+    assert [int(timestamp) for timestamp in unpacked_timestamps] == timestamps
+    assert [round(float(price), 4) for price in prices] == [170.1, 170.1234, 171.0]
+    assert [int(volume) for volume in volumes] == [1000, 0, 9000]
+    
+    # Los precios vuelven exactos con la escala de 4 decimales
+    assert chunk_points(blob)[1710172800] == (Decimal('170.1234'), 0)
+
+def test_unknown_version_is_rejected():
+    blob = bytearray(pack_chunk([DAY], ['1.00'], [0]))
+    blob[0] = 2
+    with pytest.raises(ValueError):
+        unpack_chunk(bytes(blob))
+
+def test_truncated_body_is_rejected():
+    blob = pack_chunk([DAY, DAY + 60], ['1.00', '1.01'], [0, 0], compress=False)
+    with pytest.raises(ValueError):
+        unpack_chunk(blob[:CHUNK_HEADER.size + 20])
+
+def test_query_chunks_is_bounded_by_window(price_table):
+    start, end = DAY + 2 * 86400 + 3600, DAY + 3 * 86400
+    query_chunks(price_table, SYMBOL, start, end)
+    
+    # Desde el lunes de la semana de start (cubre chunks diarios y semanales), no desde el inicio
+    assert price_table.queries == [(f'{SYMBOL}#CHUNK', chunk_window_start(start, 'week'), end)]
+
+def test_compaction_prunes_verified_raw_points(packed_table):
+    stats = compaction.compact_symbol(SYMBOL, now=NOW, prune=True)
+    
+    assert stats['chunks'] == 1 and stats['pruned'] == len(POINTS)
+    assert (f'{SYMBOL}#CHUNK', DAY) in packed_table.items
+    assert not any((SYMBOL, timestamp) in packed_table.items for timestamp, _, _ in POINTS)
+    assert (SYMBOL, OPEN_POINT[0]) in packed_table.items  # ventana abierta: no se toca
+
+def test_repack_keeps_pruned_points(packed_table):
+    compaction.compact_symbol(SYMBOL, now=NOW, prune=True)
+    packed_table.put_item(Item=point(DAY + 75600, '170.50', 5000))  # punto tardío de la ventana cerrada
+    
+    stats = compaction.compact_symbol(SYMBOL, now=NOW, force=True, prune=False)
+    
+    assert stats['chunks'] == 1
+    chunk = packed_table.items[(f'{SYMBOL}#CHUNK', DAY)]
+    assert sorted(chunk_points(chunk['data'])) == sorted([timestamp for timestamp, _, _ in POINTS] + [DAY + 75600])
+
+def test_daily_tail_reads_pruned_chunk(packed_table, monkeypatch):
+    # Rollup del día armado solo con el primer punto; el resto quedó en el chunk
+    rollup = merge_rollup(new_rollup(SYMBOL, date(2024, 3, 11)), point(*POINTS[0]))
+    packed_table.put_item(Item=rollup)
+    compaction.compact_symbol(SYMBOL, now=NOW, prune=True)
+    monkeypatch.setattr(history, 'CHUNK_STORAGE', True)
+    
+    items, plan = query_history(packed_table, SYMBOL, DAY, NOW, '1d')
+    
+    assert plan['tail_points'] == len(POINTS) + 1
+    assert items[-1]['count'] == len(POINTS)
+    assert items[-1]['close'] == Decimal('171.0')
@@ -0,0 +1,117 @@
+"""Deadline de la invocación: cortes de trabajo nuevo y de escrituras, y continuación"""
+
+import pytest
+
+import deadline
+import ingestion
+import persistence
+import resources
+
+from deadline import Deadline, has_time_left, save_continuation, take_continuation
+
+QUOTE = {
+    'price': 173.25, 'volume': 8000, 'latest_trading_day': '2024-03-12',
+    'previous_close': 171.5, 'change': 1.75, 'change_percent': '1.0204', 'source': 'alpha_vantage'
+}
+
+class Clock:
+    """time.monotonic controlado por el test"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+    
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+class Limiter:
+    """Limiter sin espera que registra el max_wait de cada acquire"""
+    
+    rate = 1.0
+    
+    def __init__(self):
+        self.max_waits = []
+    
+    def acquire(self, max_wait=None):
+        self.max_waits.append(max_wait)
+        return 0.0
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(deadline.time, 'monotonic', clock)
+    return clock
+
+@pytest.fixture
+def tables(monkeypatch, state_table, price_table):
+    monkeypatch.setattr(resources, 'state_table', state_table)
+    monkeypatch.setattr(resources, 'table', price_table)
+    monkeypatch.setattr(persistence, 'last_quotes', {})
+    return state_table
+
+def test_two_cutoffs_before_the_timeout(clock):
+    limit = Deadline(10000, safety_ms=5000, reserve_ms=1000)
+    
+    assert limit.remaining() == pytest.approx(5.0)
+    assert limit.write_budget() == pytest.approx(9.0)
+    assert limit.wait_budget(min_ms=500) == pytest.approx(4.5)
+    
+    clock.now += 4.6
+    assert not limit.can_start(min_ms=500)
+    assert limit.write_budget() == pytest.approx(4.4)
+    
+    clock.now += 10
+    assert limit.snapshot() == {'bounded': True, 'remaining_ms': 0, 'write_budget_ms': 0}
+
+def test_http_timeout_fits_the_retries_in_the_remaining_time(clock):
+    limit = Deadline(8000, safety_ms=5000)
+    
+    assert limit.http_timeout(connect=3.05, read=10, retries=2) == (pytest.approx(1.0), pytest.approx(1.0))
+    
+    clock.now += 2.8
+    # Menos de MIN_CALL_BUDGET_MS por intento: el primero se queda con lo que queda
+    assert limit.http_timeout(connect=3.05, read=10, retries=2) == (pytest.approx(0.2), pytest.approx(0.2))
+
+def test_without_context_there_is_no_limit():
+    limit = Deadline.from_context(None)
+    
+    assert limit.remaining() == float('inf')
+    assert limit.can_start()
+    assert limit.wait_budget() is None and limit.http_timeout() is None
+    assert limit.snapshot() == {'bounded': False}
+    assert has_time_left(None)
+
+def test_long_modes_keep_their_margin():
+    assert has_time_left(Context(20000), margin_ms=15000)
+    assert not has_time_left(Context(15000), margin_ms=15000)
+
+def test_continuation_is_merged_and_taken_once(tables):
+    save_continuation(['MSFT', 'AAPL'])
+    save_continuation(['AAPL', 'IBM'])
+    
+    assert take_continuation() == ['AAPL', 'IBM', 'MSFT']
+    assert take_continuation() == []
+
+def test_symbols_past_the_cutoff_go_to_the_continuation(tables, clock, monkeypatch):
+    def fetch(symbol, timeout=None, hedge=False):
+        clock.now += 2
+        if symbol == 'IBM':
+            return {'error': 'timeout', 'message': 'Read timed out', 'http_code': 504}, None
+        return dict(QUOTE, symbol=symbol), None
+    monkeypatch.setattr(ingestion, 'fetch_stock_data', fetch)
+    limiter = Limiter()
+    
+    results = ingestion.ingest_symbols(['AAPL', 'MSFT', 'IBM', 'NVDA'], concurrent=False,
+                                       rate_limiter=limiter, deadline=Deadline(10000, safety_ms=5000))
+    
+    assert results['successful'] == 2
+    # IBM agotó el tiempo recortado por el deadline; NVDA ya no alcanzó a empezar
+    assert results['continuation'] == ['IBM', 'NVDA']
+    assert limiter.max_waits == [pytest.approx(4.5), pytest.approx(2.5), pytest.approx(0.5)]
+    assert take_continuation() == ['IBM', 'NVDA']
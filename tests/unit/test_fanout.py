@@ -0,0 +1,79 @@
+"""Fan-out por shards: presupuesto por worker, despacho sin espera y resumen del último worker"""
+
+import pytest
+
+import fanout
+import resources
+from ingestion import new_results
+from rate_limiter import QuotaLedger, TokenBucket
+
+SYMBOLS = [f'S{index:03d}' for index in range(12)]
+
+@pytest.fixture
+def local_quota(monkeypatch):
+    monkeypatch.setattr(fanout, 'scheduled_quota', TokenBucket(rate=5 / 60.0, capacity=5))
+    monkeypatch.setattr(fanout, 'PROVIDER_CALLS_PER_MINUTE', 5)
+    monkeypatch.setattr(fanout, 'worker_buckets', {})
+
+def summary(symbols, successful):
+    return dict(new_results(), processed=len(symbols), successful=successful, failed=len(symbols) - successful)
+
+def test_shards_are_capped_at_the_budget_without_ledger(local_quota):
+    shard_size = fanout.effective_shard_size(len(SYMBOLS), 1)
+    shards = fanout.split_shards(SYMBOLS, shard_size)
+    
+    assert len(shards) <= 5
+    assert sum(len(shard) for shard in shards) == len(SYMBOLS)
+    assert all(fanout.shard_event('r', index, shard, len(shards))['calls_per_minute'] >= 1
+               for index, shard in enumerate(shards))
+
+def test_shard_size_is_kept_with_ledger(monkeypatch, state_table):
+    monkeypatch.setattr(fanout, 'scheduled_quota', QuotaLedger(state_table, {'pk': 'QUOTA', 'sk': 'x'}, 5 / 60.0, 5))
+    assert fanout.effective_shard_size(len(SYMBOLS), 1) == 1
+
+def test_worker_bucket_survives_warm_invocations(local_quota):
+    bucket = fanout.worker_rate_limiter(1.0)
+    assert bucket.try_acquire() == 0
+    
+    # La siguiente invocación del mismo contenedor no arranca con el bucket lleno
+    assert fanout.worker_rate_limiter(1.0) is bucket
+    assert bucket.try_acquire() > 0
+
+def test_coordinator_returns_after_dispatch(monkeypatch, state_table, local_quota):
+    dispatched = []
+    monkeypatch.setattr(resources, 'state_table', state_table)
+    monkeypatch.setattr(fanout, 'FANOUT_MODE', 'lambda')
+    monkeypatch.setattr(fanout, 'WORKER_FUNCTION_NAME', 'fetchRealTimePrice')
+    monkeypatch.setattr(fanout, 'dispatch_lambda_workers', lambda events: dispatched.extend(events) or {})
+    
+    merged = fanout.run_fanout(SYMBOLS, shard_size=4)
+    
+    assert len(dispatched) == 3
+    assert [shard['status'] for shard in merged['shards']] == ['pending'] * 3
+    assert merged['pending_symbols'] == SYMBOLS
+    assert fanout.get_run_plan(merged['run_id']) == fanout.split_shards(SYMBOLS, 4)
+
+def test_last_worker_merges_the_run_summary(monkeypatch, state_table):
+    monkeypatch.setattr(resources, 'state_table', state_table)
+    shards = fanout.split_shards(SYMBOLS, 6)
+    fanout.save_run_plan('r1', shards)
+    
+    fanout.save_shard_summary('r1', 1, summary(shards[1], 5))
+    assert fanout.complete_shard('r1', 1) is False
+    assert fanout.complete_shard('r1', 1) is False  # reintento del mismo worker: no cuenta dos veces
+    assert fanout.get_run_summary('r1') is None
+    
+    fanout.save_shard_summary('r1', 0, summary(shards[0], 6))
+    assert fanout.complete_shard('r1', 0) is True
+    
+    merged = fanout.get_run_summary('r1')
+    assert merged['successful'] == 11 and merged['failed'] == 1
+    assert [shard['status'] for shard in merged['shards']] == ['complete', 'complete']
+    assert merged['pending_symbols'] == []
+
+def test_dispatch_failures_stay_pending():
+    shards = fanout.split_shards(SYMBOLS, 6)
+    merged = fanout.merge_shard_summaries('r2', shards, {0: summary(shards[0], 6)}, {1: 'Invoke returned 500'})
+    
+    assert merged['shards'][1] == {'shard': 1, 'symbols': 6, 'status': 'dispatch_failed', 'message': 'Invoke returned 500'}
+    assert merged['pending_symbols'] == shards[1]
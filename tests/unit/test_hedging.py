@@ -0,0 +1,103 @@
+"""Hedged requests: el secundario entra solo si el primario tarda o falla"""
+
+import threading
+
+import pytest
+
+import hedging
+from breaker import CircuitBreaker
+from hedging import HedgedQuoteFetcher
+
+class FakeProvider:
+    """Proveedor que responde result, opcionalmente después de que el test suelte gate"""
+    
+    def __init__(self, name, result, gate=None):
+        self.name = name
+        self.result = result
+        self.gate = gate
+        self.calls = 0
+    
+    def get_quote(self, symbol, timeout=None):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return dict(self.result, symbol=symbol)
+
+QUOTE = {'price': 173.25}
+TIMEOUT = {'error': 'timeout', 'message': 'Read timed out', 'http_code': 504}
+
+@pytest.fixture(autouse=True)
+def breaker(monkeypatch):
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(hedging, 'provider_breaker', breaker)
+    return breaker
+
+def fetcher(primary, secondary, **kwargs):
+    options = dict(initial_delay_ms=50, min_delay_ms=10, max_delay_ms=1000, min_samples=3)
+    return HedgedQuoteFetcher(primary, secondary, **dict(options, **kwargs))
+
+def test_fast_primary_is_not_hedged():
+    secondary = FakeProvider('finnhub', QUOTE)
+    hedger = fetcher(FakeProvider('alpha_vantage', QUOTE), secondary)
+    
+    result, info = hedger.get_quote('AAPL')
+    
+    assert result['symbol'] == 'AAPL'
+    assert info == {'hedged': False, 'winner': 'alpha_vantage', 'delay_ms': 50}
+    assert secondary.calls == 0
+
+def test_slow_primary_loses_to_the_secondary(breaker):
+    gate = threading.Event()
+    primary = FakeProvider('alpha_vantage', dict(QUOTE, price=1.0), gate)
+    hedger = fetcher(primary, FakeProvider('finnhub', QUOTE))
+    
+    result, info = hedger.get_quote('AAPL')
+    
+    assert result['price'] == 173.25
+    assert info['hedged'] and info['winner'] == 'finnhub'
+    assert hedger.stats['secondary_wins'] == 1
+    
+    # El request en vuelo del primario termina igual: su latencia se muestrea
+    gate.set()
+    hedger.executor.shutdown(wait=True)
+    assert len(hedger.latencies) == 1
+
+def test_fast_transient_error_asks_the_secondary_right_away(breaker):
+    hedger = fetcher(FakeProvider('alpha_vantage', TIMEOUT), FakeProvider('finnhub', QUOTE), initial_delay_ms=1000)
+    
+    result, info = hedger.get_quote('AAPL')
+    
+    assert info['winner'] == 'finnhub' and result['price'] == 173.25
+    assert breaker.failures == 1  # el error del primario cuenta para el breaker
+
+def test_definitive_error_is_not_hedged():
+    secondary = FakeProvider('finnhub', QUOTE)
+    invalid = {'error': 'invalid_symbol', 'message': 'Invalid API call', 'http_code': 404}
+    hedger = fetcher(FakeProvider('alpha_vantage', invalid), secondary)
+    
+    result, info = hedger.get_quote('APPL')
+    
+    assert result['error'] == 'invalid_symbol' and not info['hedged']
+    assert secondary.calls == 0
+
+def test_both_failing_returns_the_primary_error():
+    hedger = fetcher(FakeProvider('alpha_vantage', TIMEOUT), FakeProvider('finnhub', dict(TIMEOUT, error='http_error')))
+    
+    result, info = hedger.get_quote('AAPL')
+    
+    assert result['error'] == 'timeout' and info['winner'] is None
+    assert hedger.stats['both_failed'] == 1
+
+def test_delay_follows_the_primary_latency_percentile():
+    hedger = fetcher(FakeProvider('alpha_vantage', QUOTE), FakeProvider('finnhub', QUOTE), percentile=50)
+    assert hedger.delay_ms() == 50  # sin muestras suficientes
+    
+    hedger.latencies.extend([100, 200, 300, 400])
+    assert hedger.delay_ms() == 300
+    
+    hedger.latencies.extend([5000] * 10)
+    assert hedger.delay_ms() == 1000  # acotado a max_delay_ms
+    
+    hedger.latencies.clear()
+    hedger.latencies.extend([1, 1, 1])
+    assert hedger.delay_ms() == 10  # y a min_delay_ms
@@ -0,0 +1,73 @@
+"""Histórico por resolución: la cola cruda se pliega en la última barra"""
+
+from datetime import date
+from decimal import Decimal
+
+from financial_common.history import downsample, ohlcv, plan_resolution, query_history
+from financial_common.rollups import merge_rollup, new_rollup
+
+SYMBOL = 'AAPL'
+
+# 2024-03-11 y 2024-03-12 cerrados; el rollup del 2024-03-13 sigue abierto
+CLOSED_DAYS = [
+    (date(2024, 3, 11), [(1710163800, '170.10', 1000), (1710187200, '171.00', 9000)]),
+    (date(2024, 3, 12), [(1710250200, '171.50', 2000), (1710273600, '173.25', 8000)])
+]
+OPEN_DAY = date(2024, 3, 13)
+OPEN_DAY_POINTS = [(1710336600, '173.00', 1500), (1710345600, '175.40', 4000)]
+LATE_POINT = (1710356400, '174.10', 6000)  # todavía no está en el rollup
+END_TIME = 1710360000
+
+def point(timestamp, price, volume):
+    return {'symbol': SYMBOL, 'timestamp': timestamp, 'price': Decimal(price), 'volume': volume}
+
+def seed(target_table):
+    for day, points in CLOSED_DAYS + [(OPEN_DAY, OPEN_DAY_POINTS)]:
+        rollup = new_rollup(SYMBOL, day)
+        for values in points:
+            target_table.put_item(Item=point(*values))
+            merge_rollup(rollup, point(*values))
+        target_table.put_item(Item=rollup)
+    target_table.put_item(Item=point(*LATE_POINT))
+
+def test_daily_rows_are_all_bars(price_table):
+    seed(price_table)
+    items, plan = query_history(price_table, SYMBOL, 1710115200, END_TIME, '1d', limit=10)
+    
+    assert [item['date'][:10] for item in items] == ['2024-03-13', '2024-03-12', '2024-03-11']
+    assert all(item['resolution'] == '1d' and 'close' in item for item in items)
+    assert plan['tail_points'] == 3
+    
+    today = items[0]
+    assert today['open'] == Decimal('173.00')
+    assert today['high'] == Decimal('175.40')
+    assert today['close'] == today['price'] == Decimal('174.10')
+    assert today['volume'] == 6000  # volumen acumulado del día: el máximo
+    assert today['count'] == 3
+
+def test_limit_is_not_filled_with_tail_points(price_table):
+    seed(price_table)
+    items, _ = query_history(price_table, SYMBOL, 1710115200, END_TIME, '1d', limit=2)
+    
+    assert [item['date'][:10] for item in items] == ['2024-03-13', '2024-03-12']
+
+def test_weekly_bar_includes_open_day(price_table):
+    seed(price_table)
+    items, _ = query_history(price_table, SYMBOL, 1710115200, END_TIME, '1w')
+    
+    assert len(items) == 1
+    assert items[0]['date'][:10] == '2024-03-11'  # semana del lunes
+    assert items[0]['close'] == Decimal('174.10')
+    assert items[0]['volume'] == 9000 + 8000 + 6000
+
+def test_downsample_bar_shape():
+    bars = downsample(ohlcv([point(*values) for values in OPEN_DAY_POINTS]), 3600)
+    
+    assert {'open', 'high', 'low', 'close', 'price', 'volume', 'count'} <= set(bars[0])
+    assert bars[-1]['close'] == bars[-1]['price']
+
+def test_plan_resolution():
+    assert plan_resolution(7) == 'raw'
+    assert plan_resolution(365) == '1d'
+    assert plan_resolution(365, max_points=60) == '1w'
+    assert plan_resolution(365, interval='1h') == '1h'
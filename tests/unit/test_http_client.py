@@ -0,0 +1,58 @@
+"""Cliente HTTP keep-alive: una Session con pool y Retry, compartida por los adapters"""
+
+import pytest
+import requests
+
+import http_client
+from http_client import ProviderHttpClient
+from providers import AlphaVantageProvider, FinnhubProvider, StubResponse
+
+class RecordingSession:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = []
+    
+    def get(self, url, params=None, **kwargs):
+        self.calls.append((url, params, kwargs))
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+def test_session_has_a_pool_and_retries():
+    client = ProviderHttpClient(pool_size=12, max_retries=3)
+    adapter = client.session.get_adapter('https://www.alphavantage.co/query')
+    
+    assert adapter._pool_maxsize == 12
+    assert adapter.max_retries.total == 3
+    assert 503 in adapter.max_retries.status_forcelist
+    assert client.session.get_adapter('http://localhost') is adapter
+
+def test_default_timeouts_and_override():
+    client = ProviderHttpClient(connect_timeout=1.5, read_timeout=4)
+    client.session = RecordingSession(StubResponse({}))
+    
+    client.get('https://example.com', params={'a': 1})
+    client.get('https://example.com', timeout=(0.5, 0.5))
+    
+    assert [call[2]['timeout'] for call in client.session.calls] == [(1.5, 4), (0.5, 0.5)]
+    assert client.requests_sent == 2
+
+def test_adapters_share_the_module_client():
+    assert AlphaVantageProvider('demo-key-123').client is http_client.http_client
+    assert FinnhubProvider('demo-key-123').client is http_client.http_client
+
+@pytest.mark.parametrize('outcome, error, http_code', [
+    (requests.exceptions.ReadTimeout('read timed out'), 'timeout', 504),
+    (requests.exceptions.ConnectionError('reset'), 'connection_error', 503),
+    (StubResponse({}, status_code=503), 'http_error', 503)
+])
+def test_transport_errors_are_normalized(outcome, error, http_code):
+    client = ProviderHttpClient()
+    client.session = RecordingSession(outcome)
+    provider = AlphaVantageProvider('demo-key-123', client=client)
+    
+    data, failure = provider._request({'function': 'GLOBAL_QUOTE', 'symbol': 'AAPL'}, 'AAPL')
+    
+    assert data is None
+    assert (failure['error'], failure['http_code']) == (error, http_code)
+    assert client.session.calls[0][1]['apikey'] == 'demo-key-123'
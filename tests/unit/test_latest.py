@@ -0,0 +1,36 @@
+"""Item LATEST: nunca retrocede, ni en la transacción ni en el camino de lotes"""
+
+from financial_common.latest import latest_key, put_with_latest, update_latest
+
+def point(symbol, timestamp, price):
+    return {'symbol': symbol, 'timestamp': timestamp, 'price': price}
+
+def latest(table, symbol):
+    return table.get_item(Key=latest_key(symbol)).get('Item')
+
+def test_transaction_writes_point_and_latest(price_table):
+    assert put_with_latest(price_table, point('AAPL', 1000, 170))
+    
+    assert price_table.get_item(Key={'symbol': 'AAPL', 'timestamp': 1000})['Item']['price'] == 170
+    item = latest(price_table, 'AAPL')
+    assert item['as_of'] == 1000 and item['registry'] == 'SYMBOLS' and item['timestamp'] == 0
+
+def test_late_point_is_stored_as_history_only(price_table):
+    put_with_latest(price_table, point('AAPL', 2000, 175))
+    
+    assert put_with_latest(price_table, point('AAPL', 1000, 170)) is False
+    
+    assert price_table.get_item(Key={'symbol': 'AAPL', 'timestamp': 1000})['Item']['price'] == 170
+    assert latest(price_table, 'AAPL')['as_of'] == 2000
+
+def test_batch_path_advances_to_the_newest_point(price_table):
+    items = [point('AAPL', 1000, 170), point('AAPL', 3000, 176), point('MSFT', 1000, 410), point('AAPL#1D', 0, 1)]
+    
+    assert update_latest(price_table, items) == {'updated': 2, 'skipped': 0, 'failed': 0}
+    assert latest(price_table, 'AAPL')['price'] == 176
+    assert latest(price_table, 'MSFT')['as_of'] == 1000
+    assert latest(price_table, 'AAPL#1D') is None
+    
+    # Un lote viejo que llega tarde no pisa el LATEST
+    assert update_latest(price_table, [point('AAPL', 2000, 171)]) == {'updated': 0, 'skipped': 1, 'failed': 0}
+    assert latest(price_table, 'AAPL')['as_of'] == 3000
@@ -0,0 +1,78 @@
+"""Calendario de NYSE: feriados por regla, día observado, cierres anticipados y DST"""
+
+from datetime import date, datetime, timezone
+
+from financial_common.market_calendar import eastern_offset, TradingCalendar
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+def test_rule_holidays():
+    calendar = TradingCalendar()
+    assert calendar.holiday(date(2024, 3, 29)) == 'Good Friday'
+    assert calendar.holiday(date(2025, 4, 18)) == 'Good Friday'
+    assert calendar.holiday(date(2024, 11, 28)) == 'Thanksgiving Day'
+    assert calendar.holiday(date(2024, 1, 15)) == 'Martin Luther King Jr. Day'
+    assert calendar.session(date(2024, 3, 29)) is None
+
+def test_observed_holidays():
+    calendar = TradingCalendar()
+    # 4 de julio de 2026 en sábado: se observa el viernes 3, sin cierre anticipado
+    assert calendar.holiday(date(2026, 7, 3)) == 'Independence Day'
+    assert calendar.session(date(2026, 7, 2))[2] is False
+    # Juneteenth de 2022 en domingo: se observa el lunes 20
+    assert calendar.holiday(date(2022, 6, 20)) == 'Juneteenth'
+    assert calendar.holiday(date(2021, 6, 18)) is None  # antes de 2022 no es feriado
+    # Año Nuevo de 2022 en sábado: el viernes 31 de diciembre de 2021 se opera
+    assert calendar.holiday(date(2021, 12, 31)) is None
+    assert calendar.session(date(2021, 12, 31)) is not None
+
+def test_early_closes():
+    calendar = TradingCalendar()
+    # Viernes después de Thanksgiving y 24 de diciembre: 13:00 ET (EST, 18:00 UTC)
+    assert calendar.session(date(2024, 11, 29))[1:] == (utc(2024, 11, 29, 18), True)
+    assert calendar.session(date(2024, 12, 24))[1:] == (utc(2024, 12, 24, 18), True)
+    # 3 de julio en jueves (el 4 en viernes): 13:00 EDT
+    assert calendar.session(date(2025, 7, 3))[1:] == (utc(2025, 7, 3, 17), True)
+
+def test_extra_holidays():
+    calendar = TradingCalendar(extra_holidays=['2025-01-09'])
+    assert calendar.holiday(date(2025, 1, 9)) == 'Special closure'
+    assert calendar.session(date(2025, 1, 9)) is None
+
+def test_dst_transitions():
+    # 2º domingo de marzo de 2024: 2:00 EST = 07:00 UTC
+    assert eastern_offset(utc(2024, 3, 10, 6, 59)).total_seconds() == -5 * 3600
+    assert eastern_offset(utc(2024, 3, 10, 7)).total_seconds() == -4 * 3600
+    # 1º domingo de noviembre de 2024: 2:00 EDT = 06:00 UTC
+    assert eastern_offset(utc(2024, 11, 3, 5, 59)).total_seconds() == -4 * 3600
+    assert eastern_offset(utc(2024, 11, 3, 6)).total_seconds() == -5 * 3600
+
+def test_session_hours_follow_dst():
+    calendar = TradingCalendar()
+    assert calendar.session(date(2024, 3, 8))[:2] == (utc(2024, 3, 8, 14, 30), utc(2024, 3, 8, 21))
+    assert calendar.session(date(2024, 3, 11))[:2] == (utc(2024, 3, 11, 13, 30), utc(2024, 3, 11, 20))
+
+def test_status_on_holiday_and_weekend():
+    calendar = TradingCalendar()
+    
+    good_friday = calendar.status(utc(2024, 3, 29, 15))
+    assert good_friday['reason'] == 'holiday' and not good_friday['is_open']
+    assert good_friday['next_open'] == utc(2024, 4, 1, 13, 30).isoformat()
+    
+    saturday = calendar.status(utc(2024, 3, 9, 15))
+    assert saturday['reason'] == 'weekend'
+    assert saturday['last_close'] == utc(2024, 3, 8, 21).isoformat()
+    assert saturday['next_open'] == utc(2024, 3, 11, 13, 30).isoformat()
+
+def test_status_open_and_after_close():
+    calendar = TradingCalendar(refresh_interval_minutes=60)
+    
+    open_now = calendar.status(utc(2024, 3, 11, 15))
+    assert open_now['is_open'] and open_now['reason'] == 'open'
+    assert open_now['next_fresh_data'] == utc(2024, 3, 11, 16).isoformat()
+    
+    # Recién cerrado: el próximo dato nuevo es el refresh de cierre
+    after_close = calendar.status(utc(2024, 3, 11, 20, 30))
+    assert after_close['reason'] == 'after_hours'
+    assert after_close['next_fresh_data'] == utc(2024, 3, 11, 21).isoformat()
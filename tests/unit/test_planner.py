@@ -0,0 +1,91 @@
+"""Planificador de refresco: demanda con decaimiento, reparto del presupuesto y slots"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+import planner
+import resources
+
+from financial_common.demand import demand_bucket_key
+from ingestion import DEFAULT_WATCHLIST
+from planner import allocate_refreshes, assign_slots, get_read_demand, planned_symbols, score_symbols
+
+NOW = datetime(2024, 3, 11, 15, 7, tzinfo=timezone.utc)
+
+@pytest.fixture
+def tables(monkeypatch, state_table, price_table):
+    monkeypatch.setattr(resources, 'state_table', state_table)
+    monkeypatch.setattr(resources, 'table', price_table)
+    return state_table, price_table
+
+def add_reads(state_table, symbol, reads, hours_ago=0):
+    state_table.put_item(Item={'pk': demand_bucket_key(NOW - timedelta(hours=hours_ago)), 'sk': symbol,
+                               'reads': Decimal(reads)})
+
+def entries(**scores):
+    return [{'symbol': symbol, 'score': score} for symbol, score in scores.items()]
+
+def test_older_reads_weigh_less(tables):
+    state_table, _ = tables
+    add_reads(state_table, 'AAPL', 4)
+    add_reads(state_table, 'AAPL', 4, hours_ago=6)
+    add_reads(state_table, 'MSFT', 4, hours_ago=30)  # fuera de la ventana
+    
+    demand = get_read_demand(NOW, window_hours=24, half_life_hours=6)
+    
+    assert demand == {'AAPL': {'demand': pytest.approx(6.0), 'reads': 8}}
+
+def test_scores_are_normalized_to_the_universe():
+    demand = {'AAPL': {'demand': 10.0}, 'MSFT': {'demand': 5.0}}
+    volatility = {'MSFT': 2.0, 'IBM': 1.0}
+    
+    scored = score_symbols(['IBM', 'AAPL', 'MSFT'], demand, volatility, demand_weight=0.6)
+    
+    assert [(e['symbol'], e['score']) for e in scored] == [('MSFT', 0.7), ('AAPL', 0.6), ('IBM', 0.2)]
+
+def test_symbols_past_the_budget_are_deferred():
+    scored = allocate_refreshes(entries(AAPL=0.9, MSFT=0.5, IBM=0.1), budget=2, slots=12)
+    
+    assert [e['refreshes'] for e in scored] == [1, 1, 0]
+
+def test_surplus_follows_the_score_up_to_one_per_slot():
+    scored = allocate_refreshes(entries(AAPL=0.9, MSFT=0.3, IBM=0.0), budget=20, slots=12)
+    refreshes = {e['symbol']: e['refreshes'] for e in scored}
+    
+    assert refreshes['AAPL'] == 12
+    assert refreshes['IBM'] == 1  # score 0: solo el refresco base
+    assert sum(refreshes.values()) <= 20
+    assert refreshes['MSFT'] > 1
+
+def test_slots_spread_refreshes_under_capacity():
+    scored = [dict(e, refreshes=r) for e, r in zip(entries(AAPL=0.9, MSFT=0.5, IBM=0.1), [4, 2, 0])]
+    
+    plan = assign_slots(scored, slots=4, budget=6)
+    
+    assert max(len(slot) for slot in plan) <= 2
+    assert sum(slot.count('AAPL') for slot in plan) == 4
+    assert sum(slot.count('MSFT') for slot in plan) == 2
+    assert not any('IBM' in slot for slot in plan)
+
+def test_plan_is_built_once_and_reused(tables, monkeypatch):
+    state_table, _ = tables
+    add_reads(state_table, 'NFLX', 50)
+    built = []
+    build = planner.build_refresh_plan
+    monkeypatch.setattr(planner, 'build_refresh_plan', lambda now: built.append(now) or build(now))
+    
+    symbols, info = planned_symbols(NOW)
+    
+    assert built == [NOW]
+    assert info['slot'] == planner.current_slot(NOW, info['slots']) == 1
+    assert set(symbols) <= set(DEFAULT_WATCHLIST) | {'NFLX'}
+    stored = planner.get_refresh_plan()
+    assert 'NFLX' in [entry['symbol'] for entry in stored['symbols']]
+    
+    planned_symbols(NOW + timedelta(minutes=30))
+    assert len(built) == 1
+    
+    planned_symbols(NOW + timedelta(minutes=planner.PLAN_MAX_AGE_MINUTES + 1))
+    assert len(built) == 2
@@ -0,0 +1,83 @@
+"""Adapters de proveedor: interfaz abstracta, API key de cada proveedor y stub record/replay"""
+
+import json
+
+import pytest
+
+from providers import (AlphaVantageProvider, FinnhubProvider, HttpQuoteProvider, load_recordings, QuoteProvider,
+                       StubProvider, StubResponse, synthetic_quote, validate_api_key)
+
+def test_get_quote_is_abstract():
+    with pytest.raises(TypeError):
+        QuoteProvider()
+    
+    class NoQuotes(HttpQuoteProvider):
+        pass
+    
+    with pytest.raises(TypeError):
+        NoQuotes('https://example.com')
+
+@pytest.mark.parametrize('quote_provider, expected', [
+    (AlphaVantageProvider(None), (False, 'ALPHA_VANTAGE_API_KEY not configured')),
+    (AlphaVantageProvider('short'), (False, 'Invalid ALPHA_VANTAGE_API_KEY format')),
+    (FinnhubProvider(None), (False, 'FINNHUB_API_KEY not configured')),
+    (FinnhubProvider('cn0abcdefghijklmnop0'), (True, 'cn0abcdefghijklmnop0')),
+    (StubProvider(), (True, None))
+])
+def test_api_key_is_checked_per_provider(quote_provider, expected):
+    assert validate_api_key(quote_provider) == expected
+
+class ReplayClient:
+    """Cliente HTTP que devuelve los payloads dados, en orden"""
+    
+    def __init__(self, payloads):
+        self.payloads = list(payloads)
+    
+    def get(self, url, params=None, **kwargs):
+        return StubResponse(self.payloads.pop(0))
+
+def test_recordings_replay_through_the_same_parser(tmp_path):
+    path = str(tmp_path / 'recordings.json')
+    payloads = [synthetic_quote('AAPL', seed=1), {'Note': 'API call frequency exceeded'}, synthetic_quote('AAPL', seed=2)]
+    recorder = AlphaVantageProvider('demo-key-123', client=ReplayClient(payloads), record_to=path)
+    live = [recorder.get_quote('AAPL') for _ in payloads]
+    
+    stub = StubProvider(recordings=load_recordings(path))
+    replayed = [stub.get_quote('AAPL') for _ in range(4)]
+    
+    assert replayed[:3] == [dict(quote, source='stub') if 'error' not in quote else quote for quote in live]
+    assert replayed[3] == replayed[0]  # la grabación se repite en ciclo
+    assert stub.stats['replayed'] == 4
+
+def test_synthetic_quotes_are_deterministic():
+    first, second = StubProvider(seed=7).get_quote('MSFT'), StubProvider(seed=7).get_quote('MSFT')
+    
+    assert first == second and first['price'] > 0
+    assert StubProvider(seed=8).get_quote('MSFT') != first
+    assert StubProvider(synthesize=False).get_quote('MSFT')['error'] == 'invalid_data'  # Global Quote vacío
+
+def test_stub_rate_limit_and_latency():
+    stub = StubProvider(rate_limit_per_minute=2)
+    assert [stub.get_quote('AAPL').get('error') for _ in range(3)] == [None, None, 'rate_limit']
+    
+    slow = StubProvider(latency_ms=50)
+    assert slow.get_quote('AAPL', timeout=(1, 0.01))['error'] == 'timeout'
+
+def test_lambda_responses_load_as_recordings(tmp_path):
+    body = {'details': [
+        {'symbol': 'AAPL', 'status': 'success', 'price': 173.25, 'change': 1.75, 'change_percent': '1.02',
+         'latest_trading_day': '2024-03-12'},
+        {'symbol': 'APPL', 'status': 'error', 'error': 'invalid_symbol', 'message': 'Invalid API call'}
+    ]}
+    (tmp_path / 'test1.json').write_text(json.dumps({'statusCode': 200, 'body': json.dumps(body)}))
+    
+    stub = StubProvider(recordings=load_recordings(str(tmp_path)), synthesize=False)
+    
+    assert stub.get_quote('AAPL')['price'] == 173.25
+    assert stub.get_quote('APPL')['error'] == 'invalid_symbol'
+
+def test_stub_streams_a_daily_series():
+    candles = list(StubProvider(history_days=5).get_daily_series('AAPL'))
+    
+    assert len(candles) == 5
+    assert [candle['date'] for candle in candles] == sorted((candle['date'] for candle in candles), reverse=True)
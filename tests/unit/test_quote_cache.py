@@ -0,0 +1,165 @@
+"""Caché de cotizaciones de POST /stock/fetch: TTL, niveles, single-flight y stale-while-revalidate"""
+
+import threading
+import time
+
+import pytest
+
+import quote_cache
+from quote_cache import fetch_symbol_cached, QuoteCache
+
+QUOTE = {'symbol': 'AAPL', 'price': 173.25, 'change': 1.75, 'change_percent': '1.0204',
+         'latest_trading_day': '2024-03-12', 'volume': 8000}
+
+class Provider:
+    """process_symbol falso: cuenta los fetches y tarda delay segundos"""
+    
+    def __init__(self, delay=0.0, status='success'):
+        self.delay = delay
+        self.status = status
+        self.calls = 0
+        self.lock = threading.Lock()
+    
+    def __call__(self, symbol, rate_limiter=None, deadline=None, hedge=False):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.status != 'success':
+            return {'symbol': symbol, 'status': 'error'}, {'error': self.status}
+        return {'symbol': symbol, 'status': 'success'}, dict(QUOTE, symbol=symbol)
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = QuoteCache(60)
+    monkeypatch.setattr(quote_cache, 'quote_cache', cache)
+    return cache
+
+def install(monkeypatch, provider):
+    monkeypatch.setattr(quote_cache, 'process_symbol', provider)
+    return provider
+
+def test_fresh_quote_is_served_from_memory(monkeypatch, cache):
+    provider = install(monkeypatch, Provider())
+    
+    assert fetch_symbol_cached('AAPL')[2]['served_from'] == 'provider'
+    detail, stock_data, info = fetch_symbol_cached('AAPL')
+    
+    assert detail['status'] == 'cached' and info['served_from'] == 'memory'
+    assert provider.calls == 1
+
+def test_expired_quote_is_fetched_again(monkeypatch, cache):
+    provider = install(monkeypatch, Provider())
+    cache.put('AAPL', QUOTE, fetched_at=time.time() - 61)
+    
+    assert fetch_symbol_cached('AAPL')[2]['served_from'] == 'provider'
+    assert provider.calls == 1
+
+def test_concurrent_requests_share_one_fetch(monkeypatch, cache):
+    provider = install(monkeypatch, Provider(delay=0.2))
+    served = []
+    threads = [threading.Thread(target=lambda: served.append(fetch_symbol_cached('AAPL')[2]['served_from']))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert provider.calls == 1
+    assert sorted(served) == ['coalesced'] * 7 + ['provider']
+    assert cache.inflight == {}
+
+def test_failed_fetch_is_not_cached(monkeypatch, cache):
+    provider = install(monkeypatch, Provider(status='timeout'))
+    
+    fetch_symbol_cached('AAPL')
+    fetch_symbol_cached('AAPL')
+    
+    assert provider.calls == 2
+    assert cache.get('AAPL') is None
+
+def test_other_containers_read_the_shared_tier(state_table):
+    QuoteCache(60, state_table).put('AAPL', QUOTE)
+    
+    stock_data, age, tier = QuoteCache(60, state_table).get('AAPL')
+    
+    assert tier == 'shared' and float(stock_data['price']) == 173.25
+    assert QuoteCache(60, state_table).get('AAPL', shared=False) is None
+
+def test_lease_holder_elsewhere_is_waited_for(monkeypatch, cache, state_table):
+    provider = install(monkeypatch, Provider())
+    cache.table = state_table
+    monkeypatch.setattr(cache, 'acquire_lease', lambda symbol: False)
+    # El contenedor que tiene el lease publica la cotización mientras este espera
+    threading.Timer(0.15, lambda: QuoteCache(60, state_table).put('AAPL', QUOTE)).start()
+    
+    detail, stock_data, info = fetch_symbol_cached('AAPL')
+    
+    assert info['served_from'] == 'coalesced'
+    assert provider.calls == 0
+
+# 2024-03-11 15:00 UTC: lunes, mercado abierto; 2024-03-09: sábado
+MARKET_OPEN = 1710169200
+SATURDAY = 1709996400
+FRIDAY_CLOSE = 1709931600  # 2024-03-08 21:00 UTC
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {'now': MARKET_OPEN}
+    monkeypatch.setattr(quote_cache, 'time', type('Time', (), {
+        'time': staticmethod(lambda: clock['now']),
+        'perf_counter': staticmethod(time.perf_counter),
+        'monotonic': staticmethod(time.monotonic),
+        'sleep': staticmethod(time.sleep)
+    }))
+    monkeypatch.setattr(quote_cache, 'revalidations', {})
+    return clock
+
+@pytest.fixture
+def stored(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(quote_cache, 'get_latest_stored_quote', lambda symbol: stored.get(symbol))
+    return stored
+
+@pytest.fixture
+def revalidated(monkeypatch):
+    revalidated = []
+    monkeypatch.setattr(quote_cache, 'QUOTE_REVALIDATE_MODE', 'local')
+    monkeypatch.setattr(quote_cache, 'revalidate_symbol', revalidated.append)
+    return revalidated
+
+def test_stale_stored_quote_is_served_and_revalidated(monkeypatch, cache, clock, stored, revalidated):
+    provider = install(monkeypatch, Provider())
+    stored['AAPL'] = (QUOTE, MARKET_OPEN - 300)
+    
+    detail, stock_data, info = quote_cache.fetch_symbol_swr('AAPL')
+    second = quote_cache.fetch_symbol_swr('AAPL')[2]
+    
+    assert detail['status'] == 'cached' and info['served_from'] == 'stored'
+    assert info['stale'] and info['revalidating'] and info['age_seconds'] == 300
+    assert second['stale'] and not second['revalidating']  # un refresh por TTL y contenedor
+    for _ in range(100):
+        if revalidated:
+            break
+        time.sleep(0.01)
+    assert revalidated == ['AAPL']
+    assert provider.calls == 0
+
+def test_quote_within_ttl_is_not_revalidated(cache, clock, stored, revalidated):
+    stored['AAPL'] = (QUOTE, MARKET_OPEN - 30)
+    
+    info = quote_cache.fetch_symbol_swr('AAPL')[2]
+    
+    assert not info['stale'] and not info['revalidating']
+
+def test_quote_stored_after_the_close_is_fresh_all_weekend(cache):
+    assert not quote_cache.is_stale(FRIDAY_CLOSE + 60, SATURDAY)
+    assert quote_cache.is_stale(FRIDAY_CLOSE - 60, SATURDAY)
+
+def test_too_old_or_missing_quote_is_fetched(monkeypatch, cache, clock, stored, revalidated):
+    provider = install(monkeypatch, Provider())
+    stored['AAPL'] = (QUOTE, MARKET_OPEN - quote_cache.QUOTE_STALE_MAX_SECONDS - 1)
+    
+    assert quote_cache.fetch_symbol_swr('AAPL')[2]['served_from'] == 'provider'
+    assert quote_cache.fetch_symbol_swr('MSFT')[2]['served_from'] == 'provider'
+    assert provider.calls == 2
+    assert revalidated == []
@@ -0,0 +1,203 @@
+"""Rate limiting del proveedor: token bucket local, ledger de cuota compartido y lanes de prioridad"""
+
+import threading
+
+import pytest
+
+import rate_limiter
+
+from rate_limiter import LaneScheduler, QuotaLedger, TokenBucket
+
+QUOTA_KEY = {'pk': 'QUOTA', 'sk': 'alphavantage'}
+
+def ledger(table, lane, fallback=None):
+    return QuotaLedger(table, QUOTA_KEY, 5 / 60.0, 5, reserved=1, lane=lane, fallback=fallback)
+
+class RacingTable:
+    """Tabla de estado donde otro contenedor escribe entre el GetItem y el PutItem"""
+    
+    def __init__(self, table, rival):
+        self.table = table
+        self.rival = rival
+    
+    def get_item(self, **kwargs):
+        response = self.table.get_item(**kwargs)
+        self.rival.try_acquire()
+        return response
+    
+    def put_item(self, **kwargs):
+        return self.table.put_item(**kwargs)
+
+class BrokenTable:
+    def get_item(self, **kwargs):
+        raise RuntimeError('DynamoDB unavailable')
+
+class Clock:
+    """time.monotonic controlado por el test"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+def test_bucket_allows_a_burst_then_paces(clock):
+    bucket = TokenBucket(rate=0.5, capacity=3)
+    
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() == pytest.approx(2.0)
+    
+    clock.now += 1
+    assert bucket.try_acquire() == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.try_acquire() == 0
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.try_acquire()
+    bucket.try_acquire()
+    
+    clock.now += 3600
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, pytest.approx(1.0)]
+
+def test_acquire_gives_up_after_max_wait(clock, monkeypatch):
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    bucket.try_acquire()
+    monkeypatch.setattr(rate_limiter.time, 'sleep', lambda seconds: setattr(clock, 'now', clock.now + seconds))
+    
+    assert bucket.acquire(max_wait=5) is None
+    assert bucket.acquire(max_wait=15) == pytest.approx(10.0)
+
+def test_bucket_is_shared_by_threads():
+    bucket = TokenBucket(rate=1e-6, capacity=5)
+    granted = []
+    threads = [threading.Thread(target=lambda: granted.append(bucket.try_acquire() == 0)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sum(granted) == 5
+
+def test_first_acquire_creates_the_ledger(state_table):
+    scheduled = ledger(state_table, 'scheduled')
+    
+    assert scheduled.try_acquire() == 0
+    
+    item = state_table.get_item(Key=QUOTA_KEY)['Item']
+    assert float(item['tokens']) == pytest.approx(4, abs=0.01)
+    assert item['last_lane'] == 'scheduled'
+
+def test_scheduled_lane_leaves_the_reserved_tokens(state_table):
+    scheduled = ledger(state_table, 'scheduled')
+    interactive = ledger(state_table, 'interactive')
+    
+    assert [scheduled.try_acquire() for _ in range(4)] == [0, 0, 0, 0]
+    assert scheduled.try_acquire() > 0  # queda 1 token, reservado para API Gateway
+    assert interactive.try_acquire() == 0
+
+def test_waiting_interactive_call_takes_priority(state_table):
+    scheduled = ledger(state_table, 'scheduled')
+    interactive = ledger(state_table, 'interactive')
+    for _ in range(5):
+        interactive.try_acquire()
+    
+    assert interactive.try_acquire() > 0
+    assert float(state_table.get_item(Key=QUOTA_KEY)['Item']['priority_until']) > 0
+    
+    assert scheduled.try_acquire() > 0
+    assert scheduled.stats['ceded'] == 1
+
+def test_conditional_write_conflict_is_retried(state_table):
+    rival = ledger(state_table, 'scheduled')
+    scheduled = ledger(RacingTable(state_table, rival), 'scheduled')
+    
+    assert 0 < scheduled.try_acquire() < 0.1
+    assert scheduled.stats == dict(scheduled.stats, acquired=0, conflicts=1)
+    assert rival.stats['acquired'] == 1
+    
+    # El reintento parte del item que escribió el rival: no se pierde ningún token
+    scheduled.table = state_table
+    assert scheduled.try_acquire() == 0
+    assert float(state_table.get_item(Key=QUOTA_KEY)['Item']['tokens']) == pytest.approx(3, abs=0.01)
+
+def test_falls_back_to_the_local_bucket():
+    fallback = TokenBucket(rate=5 / 60.0, capacity=1)
+    scheduled = ledger(BrokenTable(), 'scheduled', fallback=fallback)
+    
+    assert scheduled.try_acquire() == 0
+    assert scheduled.try_acquire() > 0
+    assert scheduled.stats['fallbacks'] == 2
+
+class Tokens:
+    """Limiter que entrega los tokens que el test le va dando"""
+    
+    rate = 1.0
+    
+    def __init__(self, shared=None):
+        self.shared = shared if shared is not None else {'tokens': 0}
+        self.lock = threading.Lock()
+    
+    def try_acquire(self, aged=False):
+        with self.lock:
+            if self.shared['tokens'] > 0:
+                self.shared['tokens'] -= 1
+                return 0.0
+            return 0.01
+
+def wait_for(condition, timeout=5):
+    deadline = rate_limiter.time.monotonic() + timeout
+    while not condition():
+        assert rate_limiter.time.monotonic() < deadline
+        rate_limiter.time.sleep(0.005)
+
+def test_interactive_lane_goes_first():
+    shared = {'tokens': 0}
+    scheduler = LaneScheduler({'interactive': Tokens(shared), 'scheduled': Tokens(shared)}, aging_seconds=60)
+    scheduler.POLL_SECONDS = 0.01
+    order = []
+    
+    def fetch(lane):
+        scheduler.acquire(lane, max_wait=5)
+        order.append(lane)
+    
+    threads = [threading.Thread(target=fetch, args=('scheduled',))]
+    threads[0].start()
+    wait_for(lambda: scheduler.depth('scheduled') == 1)
+    threads.append(threading.Thread(target=fetch, args=('interactive',)))
+    threads[1].start()
+    wait_for(lambda: scheduler.depth('interactive') == 1)
+    
+    shared['tokens'] = 1
+    wait_for(lambda: order)
+    shared['tokens'] = 1
+    for thread in threads:
+        thread.join()
+    
+    assert order == ['interactive', 'scheduled']
+    snapshot = scheduler.snapshot()
+    assert snapshot['scheduled']['max_depth'] == 1 and snapshot['interactive']['granted'] == 1
+
+def test_scheduled_lane_ages_past_interactive():
+    scheduler = LaneScheduler({'interactive': Tokens(), 'scheduled': Tokens()}, aging_seconds=30)
+    now = 1000.0
+    
+    fresh_interactive = scheduler._priority(('interactive', now, 2), now)
+    assert scheduler._priority(('scheduled', now - 10, 1), now) > fresh_interactive
+    assert scheduler._priority(('scheduled', now - 45, 1), now) < fresh_interactive
+
+def test_lane_times_out_without_tokens():
+    scheduler = LaneScheduler({'interactive': Tokens(), 'scheduled': Tokens()})
+    scheduler.POLL_SECONDS = 0.01
+    lane = scheduler.lane('scheduled')
+    
+    assert lane.acquire(max_wait=0.05) is None
+    assert lane.rate == 1.0
+    assert scheduler.snapshot()['scheduled']['timeouts'] == 1
+    assert scheduler.waiting == []
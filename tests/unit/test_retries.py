@@ -0,0 +1,76 @@
+"""Cola de reintentos: backoff exponencial con jitter y dead-letter"""
+
+import pytest
+
+import retries
+from retries import RetryQueue
+
+NOW = 1710000000
+
+def failure(symbol, error='timeout'):
+    return {'symbol': symbol, 'status': 'error', 'error': error, 'message': 'Read timed out'}
+
+@pytest.fixture
+def queue():
+    return RetryQueue(base_seconds=300, max_seconds=3600, max_attempts=3, dead_ttl_days=1)
+
+@pytest.mark.parametrize('attempts, cap', [(1, 300), (2, 600), (3, 1200), (4, 2400), (5, 3600), (9, 3600)])
+def test_backoff_is_capped_exponential_with_jitter(queue, monkeypatch, attempts, cap):
+    monkeypatch.setattr(retries.random, 'uniform', lambda low, high: low)
+    assert queue.backoff(attempts) == cap / 2
+    
+    monkeypatch.setattr(retries.random, 'uniform', lambda low, high: high)
+    assert queue.backoff(attempts) == cap
+
+def test_failures_are_scheduled_with_backoff(queue, monkeypatch):
+    monkeypatch.setattr(retries.random, 'uniform', lambda low, high: high)
+    
+    summary = queue.settle([failure('AAPL'), failure('MSFT', 'invalid_symbol')], now=NOW)
+    
+    assert summary == {'scheduled': 1, 'cleared': 0, 'dead': []}
+    item = queue.items()['AAPL']
+    assert item['status'] == 'pending' and item['attempts'] == 1
+    assert item['next_attempt_at'] == NOW + 300
+    assert 'MSFT' not in queue.items()  # error no transitorio: no se reintenta
+    
+    queue.settle([failure('AAPL')], now=NOW + 300)
+    assert queue.items()['AAPL']['next_attempt_at'] == NOW + 300 + 600
+
+def test_due_orders_by_lateness_and_limits(queue):
+    queue.settle([failure('AAPL')], now=NOW)
+    queue.settle([failure('MSFT')], now=NOW - 1000)
+    
+    assert queue.due(now=NOW - 1000) == []
+    assert queue.due(now=NOW + 3600) == ['MSFT', 'AAPL']
+    assert queue.due(now=NOW + 3600, limit=1) == ['MSFT']
+
+def test_success_clears_the_symbol(queue):
+    queue.settle([failure('AAPL')], now=NOW)
+    
+    summary = queue.settle([{'symbol': 'AAPL', 'status': 'unchanged'}], now=NOW + 600)
+    
+    assert summary['cleared'] == 1
+    assert queue.items() == {}
+
+def test_dead_letter_after_max_attempts(queue):
+    for attempt in range(queue.max_attempts - 1):
+        assert queue.settle([failure('AAPL')], now=NOW + attempt)['dead'] == []
+    
+    summary = queue.settle([failure('AAPL')], now=NOW + 10)
+    
+    assert summary['dead'] == ['AAPL']
+    item = queue.items()['AAPL']
+    assert item['status'] == 'dead' and item['attempts'] == queue.max_attempts
+    assert item['expires_at'] == NOW + 10 + 86400
+    assert queue.due(now=NOW + 10 ** 6) == []  # dead no vuelve a la cola sola
+    assert queue.snapshot(now=NOW)['dead'] == ['AAPL']
+
+def test_requeue_resets_attempts(queue):
+    for attempt in range(queue.max_attempts):
+        queue.settle([failure('AAPL')], now=NOW + attempt)
+    
+    queue.requeue(['AAPL'])
+    
+    item = queue.items()['AAPL']
+    assert item['status'] == 'pending' and item['attempts'] == 0
+    assert queue.due() == ['AAPL']
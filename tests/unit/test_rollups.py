@@ -0,0 +1,57 @@
+"""Rollups diarios OHLCV: merge sin importar el orden de llegada"""
+
+from datetime import date
+from decimal import Decimal
+from itertools import permutations
+
+from financial_common.rollups import merge_rollup, new_rollup, rollup_key, trading_day_of
+
+# 2024-03-11 (lunes, EDT): 9:30, 12:00 y 16:00 ET
+POINTS = [
+    {'symbol': 'AAPL', 'timestamp': 1710163800, 'price': Decimal('170.10'), 'volume': 1000},
+    {'symbol': 'AAPL', 'timestamp': 1710172800, 'price': Decimal('172.50'), 'volume': 5000},
+    {'symbol': 'AAPL', 'timestamp': 1710187200, 'price': Decimal('169.80'), 'volume': 9000}
+]
+
+def merged(points):
+    rollup = new_rollup('AAPL', date(2024, 3, 11))
+    for point in points:
+        merge_rollup(rollup, point)
+    return rollup
+
+def test_merge_is_order_independent():
+    expected = merged(POINTS)
+    for order in permutations(POINTS):
+        assert merged(order) == expected
+
+def test_merge_ohlcv():
+    rollup = merged(reversed(POINTS))
+    assert rollup['open'] == Decimal('170.10')
+    assert rollup['high'] == Decimal('172.50')
+    assert rollup['low'] == Decimal('169.80')
+    assert rollup['close'] == rollup['price'] == Decimal('169.80')
+    assert rollup['volume'] == 9000  # volumen acumulado del día: el máximo
+    assert rollup['count'] == 3
+    assert (rollup['open_ts'], rollup['close_ts']) == (1710163800, 1710187200)
+
+def test_late_point_does_not_move_close():
+    rollup = merged(POINTS[1:])
+    merge_rollup(rollup, POINTS[0])
+    assert rollup['open'] == Decimal('170.10')
+    assert rollup['close'] == Decimal('169.80')
+
+def test_backfill_candle_keeps_its_range():
+    rollup = merged(POINTS[1:2])
+    merge_rollup(rollup, {'timestamp': 1710187200, 'price': '171', 'open': '168', 'high': '175', 'low': '167', 'volume': 7000})
+    assert (rollup['open'], rollup['high'], rollup['low'], rollup['close']) == (
+        Decimal('172.50'), Decimal('175'), Decimal('167'), Decimal('171'))
+
+def test_rollup_key_is_utc_midnight_of_trading_day():
+    assert rollup_key('AAPL', date(2024, 3, 11)) == {'symbol': 'AAPL#1D', 'timestamp': 1710115200}
+
+def test_trading_day_uses_new_york_date():
+    # 2024-03-12 02:00 UTC = 22:00 EDT del 11
+    assert trading_day_of({'timestamp': 1710208800}) == date(2024, 3, 11)
+    # 2024-01-10 04:30 UTC = 23:30 EST del 9
+    assert trading_day_of({'timestamp': 1704861000}) == date(2024, 1, 9)
+    assert trading_day_of({'timestamp': 1710208800, 'latest_trading_day': '2024-03-08'}) == date(2024, 3, 8)
@@ -0,0 +1,41 @@
+"""saveStockPrice en modo batch: una key por precio, sin pisadas silenciosas"""
+
+import importlib.util
+import os
+
+import pytest
+
+HANDLER = os.path.join(os.path.dirname(__file__), '..', '..', 'lambda_functions', 'saveStockPrice', 'lambda_function.py')
+
+@pytest.fixture
+def save_stock_price(monkeypatch, price_table):
+    # Todas las Lambdas se llaman lambda_function: se carga por path con otro nombre
+    spec = importlib.util.spec_from_file_location('save_stock_price', HANDLER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'table', price_table)
+    return module
+
+def test_prices_without_timestamp_do_not_collapse(save_stock_price, price_table):
+    result = save_stock_price.save_prices_batch([
+        {'symbol': 'AAPL', 'price': 180.5},
+        {'symbol': 'aapl', 'price': 181.0},
+        {'symbol': 'MSFT', 'price': 410.2}
+    ])
+    
+    assert [detail['status'] for detail in result['details']] == ['success', 'error', 'success']
+    assert result['details'][1]['error'] == 'Duplicate key: same symbol and timestamp as prices[0]'
+    assert result['saved'] == 2 and result['failed'] == 1
+    
+    stored = [item for (symbol, _), item in price_table.items.items() if symbol == 'AAPL']
+    assert [float(item['price']) for item in stored] == [180.5]
+
+def test_distinct_timestamps_are_all_saved(save_stock_price, price_table):
+    result = save_stock_price.save_prices_batch([
+        {'symbol': 'AAPL', 'price': 180.5, 'timestamp': 1706097000},
+        {'symbol': 'AAPL', 'price': 181.0, 'timestamp': 1706097060}
+    ])
+    
+    assert result['saved'] == 2
+    assert (('AAPL', 1706097000) in price_table.items) and (('AAPL', 1706097060) in price_table.items)
+    assert price_table.get_item(Key={'symbol': 'AAPL#LATEST', 'timestamp': 0})['Item']['as_of'] == 1706097060
@@ -0,0 +1,77 @@
+"""Parseo incremental de TIME_SERIES_DAILY: trozos cortados en cualquier byte"""
+
+import json
+
+import pytest
+
+from stream_parser import TimeSeriesStream, TimeSeriesStreamParser
+
+SERIES_KEY = 'Time Series (Daily)'
+SERIES = {
+    '2024-03-13': {'1. open': '173.00', '4. close': '174.10', '5. volume': '6000'},
+    '2024-03-12': {'1. open': '171.50', '4. close': '173.25', '5. volume': '8000'},
+    '2024-03-11': {'1. open': '170.10', '4. close': '171.00', '5. volume': '9000'}
+}
+PAYLOAD = json.dumps({'Meta Data': {'1. Information': 'Daily Prices – ñ', '2. Symbol': 'AAPL'}, SERIES_KEY: SERIES},
+                     indent=2, ensure_ascii=False).encode('utf-8')
+
+def every(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+class ChunkedResponse:
+    """Respuesta HTTP (stream=True) que entrega el body en los trozos dados"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+    
+    def iter_content(self, chunk_size=None):
+        yield from self.chunks
+    
+    def close(self):
+        self.closed = True
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, len(PAYLOAD)])
+def test_any_chunk_boundary(size):
+    response = ChunkedResponse(every(PAYLOAD, size))
+    stream = TimeSeriesStream(response, SERIES_KEY)
+    
+    assert stream.open()
+    assert list(stream.entries()) == list(SERIES.items())
+    assert response.closed
+
+def test_every_split_point():
+    # Dos trozos cortados en cada posición, incluso dentro de un carácter multibyte
+    for split in range(1, len(PAYLOAD)):
+        stream = TimeSeriesStream(ChunkedResponse([PAYLOAD[:split], PAYLOAD[split:]]), SERIES_KEY)
+        assert stream.open()
+        assert dict(stream.entries()) == SERIES, split
+
+def test_parser_waits_for_complete_entries():
+    text = PAYLOAD.decode('utf-8')
+    parser = TimeSeriesStreamParser(SERIES_KEY)
+    cut = text.index('"2024-03-12"') + 20
+    
+    parser.feed(text[:cut])
+    assert parser.seek_series()
+    assert [key for key, _ in parser.entries()] == ['2024-03-13']
+    
+    parser.feed(text[cut:])
+    assert [key for key, _ in parser.entries()] == ['2024-03-12', '2024-03-11']
+    assert parser.done
+
+def test_truncated_payload_raises():
+    stream = TimeSeriesStream(ChunkedResponse(every(PAYLOAD[:-40], 16)), SERIES_KEY)
+    
+    assert stream.open()
+    with pytest.raises(ValueError):
+        list(stream.entries())
+
+def test_error_payload_without_series():
+    error = json.dumps({'Note': 'API call frequency exceeded'}).encode('utf-8')
+    response = ChunkedResponse(every(error, 5))
+    stream = TimeSeriesStream(response, SERIES_KEY)
+    
+    assert not stream.open()
+    assert json.loads(stream.parser.buffer) == {'Note': 'API call frequency exceeded'}
+    assert response.closed
@@ -0,0 +1,106 @@
+"""Registro de símbolos: getPortfolio lee el GSI de los LATEST y latest_rebuild lo completa"""
+
+import importlib.util
+import json
+import os
+from decimal import Decimal
+
+import pytest
+
+import resources
+from financial_common.latest import latest_key, put_with_latest, REGISTRY_KEY
+from persistence import rebuild_latest
+
+HANDLER = os.path.join(os.path.dirname(__file__), '..', '..', 'lambda_functions', 'getPortfolio', 'lambda_function.py')
+
+class Throttled:
+    """meta.client de DynamoDB cuyo primer BatchGetItem deja keys sin procesar"""
+    
+    def __init__(self, table):
+        self.table = table
+        self.calls = 0
+    
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        keys = RequestItems[self.table.name]['Keys']
+        if self.calls > 1 or len(keys) < 2:
+            return self.table.batch_get_item(RequestItems)
+        response = self.table.batch_get_item({self.table.name: {'Keys': keys[:1]}})
+        return dict(response, UnprocessedKeys={self.table.name: {'Keys': keys[1:]}})
+
+def point(symbol, timestamp, price):
+    return {'symbol': symbol, 'timestamp': timestamp, 'price': Decimal(str(price)),
+            'date': f'2024-03-12T{timestamp % 24:02d}:00:00', 'volume': 1000}
+
+@pytest.fixture
+def table(price_table):
+    price_table.page_size = 2
+    return price_table
+
+@pytest.fixture
+def get_portfolio(monkeypatch, table):
+    # Todas las Lambdas se llaman lambda_function: se carga por path con otro nombre
+    spec = importlib.util.spec_from_file_location('get_portfolio', HANDLER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'table', table)
+    monkeypatch.setattr(module, 'dynamodb', Throttled(table))
+    monkeypatch.setattr(module, 'table_name', table.name)
+    monkeypatch.setattr(module.time, 'sleep', lambda seconds: None)
+    return module
+
+def portfolio(get_portfolio, symbols=None):
+    event = {'queryStringParameters': {'symbols': symbols} if symbols else None}
+    response = get_portfolio.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+def test_portfolio_reads_one_item_per_symbol(get_portfolio, table):
+    for symbol in ['MSFT', 'AAPL', 'IBM']:
+        put_with_latest(table, point(symbol, 1710255600, 100))
+        put_with_latest(table, point(symbol, 1710259200, 101))
+    
+    status, body = portfolio(get_portfolio)
+    
+    assert status == 200
+    assert body['statistics']['symbols_list'] == ['AAPL', 'IBM', 'MSFT']  # dos páginas de 2
+    assert {entry['timestamp'] for entry in body['portfolio']} == {1710259200}
+    assert body['statistics']['total_records'] == 3  # los puntos crudos no están en el registro
+
+def test_late_point_does_not_move_the_registry_back(get_portfolio, table):
+    put_with_latest(table, point('AAPL', 1710259200, 101))
+    put_with_latest(table, point('AAPL', 1710255600, 99))
+    
+    _, body = portfolio(get_portfolio)
+    
+    assert body['portfolio'][0]['price'] == 101
+
+def test_requested_symbols_use_batch_get(get_portfolio, table):
+    for symbol in ['AAPL', 'IBM', 'MSFT']:
+        put_with_latest(table, point(symbol, 1710259200, 100))
+    
+    status, body = portfolio(get_portfolio, 'msft, aapl,NFLX')
+    
+    assert status == 200
+    assert body['statistics']['symbols_list'] == ['AAPL', 'MSFT']
+    assert get_portfolio.dynamodb.calls == 2  # reintento de las UnprocessedKeys
+
+def test_empty_registry_is_not_found(get_portfolio):
+    assert portfolio(get_portfolio)[0] == 404
+
+def test_rebuild_creates_the_missing_latest(monkeypatch, get_portfolio, table):
+    monkeypatch.setattr(resources, 'table', table)
+    for timestamp, price in [(1710252000, 98), (1710259200, 101), (1710255600, 99)]:
+        table.put_item(Item=point('AAPL', timestamp, price))
+    table.put_item(Item=point('IBM', 1710255600, 190))
+    # LATEST ya escrito por un ingest más nuevo que la historia escaneada
+    put_with_latest(table, point('IBM', 1710262800, 191))
+    
+    result = rebuild_latest()
+    
+    assert result['scanned'] == 6 and result['symbols'] == 2
+    assert result['last_evaluated_key'] is None
+    assert table.items[('AAPL#LATEST', 0)]['as_of'] == 1710259200
+    assert table.items[('AAPL#LATEST', 0)]['registry'] == REGISTRY_KEY
+    assert table.get_item(Key=latest_key('IBM'))['Item']['as_of'] == 1710262800
+    _, body = portfolio(get_portfolio)
+    assert body['statistics']['symbols_list'] == ['AAPL', 'IBM']
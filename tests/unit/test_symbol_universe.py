@@ -0,0 +1,73 @@
+"""Universo de símbolos y negative cache: qué se cachea y por cuánto"""
+
+import gzip
+
+import pytest
+
+from providers import AlphaVantageProvider
+from symbol_universe import NegativeCache, SymbolUniverse
+
+@pytest.fixture
+def cache():
+    return NegativeCache(ttl_seconds=86400, max_size=3, no_data_ttl_seconds=300)
+
+def test_invalid_symbol_uses_the_full_ttl(cache, monkeypatch):
+    monkeypatch.setattr('symbol_universe.time.monotonic', lambda: 1000.0)
+    cache.record('APPL', {'error': 'invalid_symbol'})
+    
+    assert cache.entries['APPL'] == 1000.0 + 86400
+    assert cache.contains('APPL')
+
+def test_no_data_expires_quickly(cache, monkeypatch):
+    monkeypatch.setattr('symbol_universe.time.monotonic', lambda: 1000.0)
+    cache.record('NEWCO', {'error': 'no_data'})
+    assert cache.contains('NEWCO')
+    
+    monkeypatch.setattr('symbol_universe.time.monotonic', lambda: 1000.0 + 301)
+    assert not cache.contains('NEWCO')
+
+@pytest.mark.parametrize('result', [
+    {'error': 'rate_limit'},
+    {'error': 'timeout'},
+    {'symbol': 'AAPL', 'price': 173.25}
+])
+def test_quota_and_transient_errors_are_not_cached(cache, result):
+    cache.record('AAPL', result)
+    assert not cache.contains('AAPL')
+
+def test_size_is_bounded(cache):
+    for symbol in ['A', 'B', 'C', 'D']:
+        cache.add(symbol)
+    
+    assert len(cache.entries) == 3
+    assert not cache.contains('A')
+
+def test_daily_quota_payload_is_a_rate_limit(monkeypatch, cache):
+    provider = AlphaVantageProvider(api_key='test')
+    information = {'Information': 'Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day.'}
+    monkeypatch.setattr(provider, '_request', lambda params, label, timeout=None: (information, None))
+    
+    quote = provider.get_quote('AAPL')
+    series = provider._series_error(information, 'AAPL')
+    
+    assert quote['error'] == series['error'] == 'rate_limit'
+    assert quote['message'] == information['Information']
+    cache.record('AAPL', quote)
+    assert not cache.contains('AAPL')
+
+def test_universe_filters_inactive_listings(tmp_path):
+    path = tmp_path / 'listing_status.csv.gz'
+    with gzip.open(path, 'wt') as f:
+        f.write('symbol,name,exchange,assetType,ipoDate,delistingDate,status\n')
+        f.write('AAPL,Apple Inc,NASDAQ,Stock,1980-12-12,null,Active\n')
+        f.write('TWTR,Twitter Inc,NYSE,Stock,2013-11-07,2022-11-08,Delisted\n')
+    
+    universe = SymbolUniverse(str(path))
+    
+    assert universe.contains('AAPL') is True
+    assert universe.contains('APPL') is False
+    assert universe.contains('TWTR') is False
+
+def test_missing_file_disables_the_index(tmp_path):
+    universe = SymbolUniverse(str(tmp_path / 'missing.csv'))
+    assert universe.contains('APPL') is None